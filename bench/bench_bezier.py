@@ -0,0 +1,91 @@
+"""Benchmark BezierSpline sampling against the previous recursive sampler.
+
+    python bench/bench_bezier.py [--segments 8 64 512] [--steps 2.0 0.5 0.1]
+"""
+from pathlib import Path
+import argparse
+import sys
+import time
+
+sys.path.insert (0, str (Path (__file__).resolve ().parents[1]))
+
+import numpy as np
+from src.geometry import Vec3D
+from src.bezier import BezierSpline
+
+
+# Previous sampler: per-point evaluation with recursive bisection
+def legacy_curve_points (cps: list[Vec3D], max_step: float) -> list[Vec3D]:
+    def vec_at_t (t):
+        return (cps[0] * (1 - t)**3 +
+                cps[1] * 3 * (1 - t)**2 * t +
+                cps[2] * 3 * (1 - t) * t**2 +
+                cps[3] * t**3)
+
+    def subsample (t0, t1, v0 = None, v1 = None):
+        subsamples = {}
+        if (v0 is None):
+            v0 = vec_at_t (t0)
+            subsamples[t0] = v0
+        if (v1 is None):
+            v1 = vec_at_t (t1)
+            subsamples[t1] = v1
+
+        if (v0.dist_sq (v1) < max_step ** 2):
+            return subsamples
+
+        t_mid = (t0 + t1) / 2
+        v_mid = vec_at_t (t_mid)
+        subsamples[t_mid] = v_mid
+
+        subsamples.update (subsample (t0, t_mid, v0, v_mid))
+        subsamples.update (subsample (t_mid, t1, v_mid, v1))
+        return subsamples
+
+    t_to_vec = subsample (0, 1)
+    return [t_to_vec[t] for t in sorted (t_to_vec)]
+
+def legacy_spline_points (segments: np.ndarray, max_step: float) -> list[Vec3D]:
+    points = []
+    for seg in segments:
+        curve = legacy_curve_points ([Vec3D (*p) for p in seg.tolist ()], max_step)
+        points.extend (curve[1:] if points else curve)
+    return points
+
+
+def random_control_points (segments: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng (seed)
+    steps = rng.normal (scale = 5.0, size = (2 * segments + 2, 3))
+    return np.cumsum (steps, axis = 0)
+
+def best_of (fn, repeat: int) -> float:
+    best = float ('inf')
+    for _ in range (repeat):
+        t = time.perf_counter ()
+        fn ()
+        best = min (best, time.perf_counter () - t)
+    return best
+
+
+def main ():
+    parser = argparse.ArgumentParser (description = __doc__.splitlines ()[0])
+    parser.add_argument ('--segments', type = int, nargs = '+', default = [8, 64, 512])
+    parser.add_argument ('--steps', type = float, nargs = '+', default = [2.0, 0.5, 0.1])
+    parser.add_argument ('--repeat', type = int, default = 3)
+    args = parser.parse_args ()
+
+    print (f"{'segments':>8} {'step':>6} {'legacy pts':>10} {'legacy s':>10} "
+           f"{'new pts':>8} {'new s':>10} {'speedup':>8}")
+    for count in args.segments:
+        cps = random_control_points (count)
+        for step in args.steps:
+            spline = BezierSpline (cps, step)
+            new_t = best_of (lambda: BezierSpline (cps, step), args.repeat)
+            legacy_t = best_of (lambda: legacy_spline_points (spline.segments, step), args.repeat)
+            legacy_n = len (legacy_spline_points (spline.segments, step))
+            print (f"{count:>8} {step:>6} {legacy_n:>10} {legacy_t:>10.4f} "
+                   f"{len (spline.positions):>8} {new_t:>10.4f} {legacy_t / new_t:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main ()
@@ -0,0 +1,248 @@
+"""Headless benchmarks for the planning, sampling, indexing and simulation hot paths.
+
+    python bench/bench_suite.py [--quick] [--only rrt kdtree] [--repeat 5] [--out results.json]
+    python bench/bench_suite.py --compare baseline.json [--threshold 0.15]
+
+Each case times RRT.plan, KDTree, Bezier sampling, obstacle motion or
+Drone.follow_path on the bundled scenes/*.json and on seeded synthetic inputs
+of increasing size; rrt.long_gap compares the planner strategies' time to a
+first solution. With
+--compare, cases whose best time grew by more than --threshold over the
+baseline are flagged and the exit status is 1.
+"""
+from contextlib import redirect_stdout
+from pathlib import Path
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+
+ROOT = Path (__file__).resolve ().parents[1]
+sys.path.insert (0, str (ROOT))
+
+import numpy as np
+from src.geometry import Vec3D, KDTree
+from src.obstacle import Obstacle, ObstacleField, ObstacleTable, MotionTable
+from src.bezier import BezierCurve, BezierSpline
+from src.waypoint import WaypointPath
+from src.drone import Drone
+from src.clock import SimClock
+from src.scene import Scene
+from src.scene_gen import generate_scene
+from src.RRT import RRT, PLANNERS
+
+
+# A case is (name, params, make) where make () does the untimed setup and returns the timed callable
+def bundled_scenes () -> list[tuple[str, Scene]]:
+    return [(p.stem, Scene.from_file (str (p))) for p in sorted ((ROOT / 'scenes').glob ('*.json'))]
+
+def random_spheres (count: int, size: float, rng: np.random.Generator) -> list[Obstacle]:
+    centers = rng.uniform (0, size, (count, 3))
+    radii = rng.uniform (0.2, 1.0, count)
+    return [Obstacle (Vec3D (*c), float (r)) for c, r in zip (centers.tolist (), radii.tolist ())]
+
+def helix (count: int, spacing: float) -> np.ndarray:
+    s = np.arange (count) * spacing
+    return np.stack ([5 * np.cos (s / 5), 5 * np.sin (s / 5), s / 5], axis = 1)
+
+def fly (path: WaypointPath, start, ticks: int, dt: float = 0.01):
+    clock = SimClock (dt)
+    drone = Drone (pos = Vec3D (*start), look_r = path.max_step * 1.5, clock = clock)
+    drone.set_path (path)
+
+    def run ():
+        for _ in range (ticks):
+            drone.follow_path ()
+            clock.advance ()
+    return run
+
+
+def rrt_cases (quick: bool):
+    for name, scene in bundled_scenes ():
+        bl, tr = scene.bounds
+        def make (scene = scene, bl = bl, tr = tr):
+            return lambda: RRT (scene.start, scene.control_points[-1], scene.rrt_step_size, scene.rrt_radius,
+                                bl, tr, scene.obstacle_field, seed = 0).plan ()
+        yield 'rrt.plan', {'scene': name}, make
+
+    # Goal sits outside the bounds so every run spends its whole iteration budget
+    size = 40.0
+    for count in ([10, 100] if quick else [10, 100, 1000]):
+        for iters in ([300] if quick else [500, 2000]):
+            def make (count = count, iters = iters):
+                field = ObstacleField (random_spheres (count, size, np.random.default_rng (0)))
+                goal = Vec3D (2 * size, 2 * size, 2 * size)
+                return lambda: RRT (Vec3D (0, 0, 0), goal, 1.0, 2.0, Vec3D (0, 0, 0), Vec3D (size, size, size),
+                                    field, max_iter = iters, seed = 0).plan ()
+            yield 'rrt.plan', {'obstacles': count, 'iterations': iters}, make
+
+    # Time to a first solution across a long gap, where uniform RRT* often runs out of iterations
+    size = 60.0
+    for planner in PLANNERS:
+        def make (planner = planner):
+            rng = np.random.default_rng (0)
+            field = ObstacleField ([obs for obs in random_spheres (300, size, rng)
+                                    if obs.center.dist (Vec3D (2, 2, 2)) > obs.radius + 1
+                                    and obs.center.dist (Vec3D (size - 2, size - 2, size - 2)) > obs.radius + 1])
+            return lambda: RRT (Vec3D (2, 2, 2), Vec3D (size - 2, size - 2, size - 2), 1.0, 2.0,
+                                Vec3D (0, 0, 0), Vec3D (size, size, size), field,
+                                max_iter = 2000 if quick else 20000, seed = 0,
+                                planner = planner, refine_iter = 0).plan ()
+        yield 'rrt.long_gap', {'planner': planner}, make
+
+def kdtree_cases (quick: bool):
+    for n in ([1000, 10000] if quick else [1000, 10000, 100000]):
+        def points (n = n):
+            return np.random.default_rng (0).uniform (0, 100, (n, 3))
+
+        yield 'kdtree.build', {'points': n}, lambda points = points: (lambda pts = points (): KDTree (pts))
+
+        def make_radius (points = points):
+            tree = KDTree (points ())
+            queries = np.random.default_rng (1).uniform (0, 100, (1000, 3))
+            return lambda: [tree.search_radius (q, 2.0) for q in queries]
+        yield 'kdtree.search_radius', {'points': n, 'queries': 1000}, make_radius
+
+        def make_knn (points = points):
+            tree = KDTree (points ())
+            queries = np.random.default_rng (1).uniform (0, 100, (1000, 3))
+            return lambda: tree.k_nearest_batch (queries, 8)
+        yield 'kdtree.k_nearest_batch', {'points': n, 'queries': 1000, 'k': 8}, make_knn
+
+def bezier_cases (quick: bool):
+    for name, scene in bundled_scenes ():
+        yield 'bezier.spline', {'scene': name}, \
+            lambda scene = scene: (lambda: BezierSpline (scene.control_points, scene.bezier_max_step))
+
+    cps = np.array ([[0, 0, 0], [10, 30, 5], [40, -20, 10], [50, 10, 0]], dtype = float)
+    for step in ([0.1] if quick else [0.1, 0.01]):
+        yield 'bezier.curve', {'max_step': step}, lambda step = step: (lambda: BezierCurve (cps, step))
+
+    for count in ([100] if quick else [100, 1000, 10000]):
+        def make (count = count):
+            pts = np.cumsum (np.random.default_rng (0).normal (scale = 5.0, size = (count, 3)), axis = 0)
+            return lambda: BezierSpline (pts, 0.5).get_waypoint_path ()
+        yield 'bezier.spline', {'control_points': count}, make
+
+def drone_cases (quick: bool):
+    ticks = 200 if quick else 1000
+    for name, scene in bundled_scenes ():
+        def make (scene = scene):
+            with redirect_stdout (io.StringIO ()):
+                path = scene.build_path ()
+            return fly (path, scene.start.to_tuple (), ticks)
+        yield 'drone.follow_path', {'scene': name, 'ticks': ticks}, make
+
+    for count in ([1000] if quick else [100, 1000, 10000]):
+        def make (count = count):
+            pts = helix (count, 0.5)
+            return fly (WaypointPath.from_array (0.5, pts), pts[0], ticks)
+        yield 'drone.follow_path', {'waypoints': count, 'ticks': ticks}, make
+
+def motion_cases (quick: bool):
+    for count in ([1000] if quick else [1000, 10000, 100000]):
+        def scene (count = count):
+            return generate_scene (obstacles = count, seed = 0)
+
+        def make_table (scene = scene):
+            motions = MotionTable (ObstacleTable.from_obstacles (scene ().obstacles))
+            times = np.linspace (0, 10, 100)
+            return lambda: motions.positions (times)
+        yield 'motion.positions', {'obstacles': count, 'times': 100}, make_table
+
+        def make_update (scene = scene):
+            field = scene ().obstacle_field
+            ts = iter (np.linspace (0, 10, 1000).tolist ())
+            return lambda: field.update (next (ts))
+        yield 'motion.field_update', {'obstacles': count}, make_update
+
+GROUPS = {
+    'rrt':    rrt_cases,
+    'kdtree': kdtree_cases,
+    'bezier': bezier_cases,
+    'drone':  drone_cases,
+    'motion': motion_cases,
+}
+
+
+def case_key (name: str, params: dict) -> str:
+    return name + '[' + ','.join (f'{k}={v}' for k, v in params.items ()) + ']'
+
+# Best and median of `repeat` timed runs, each on a fresh setup, after one warm-up run
+def measure (make, repeat: int) -> dict:
+    make () ()
+    times = []
+    for _ in range (repeat):
+        fn = make ()
+        t = time.perf_counter ()
+        fn ()
+        times.append (time.perf_counter () - t)
+    return {'best': min (times), 'median': statistics.median (times), 'runs': times}
+
+def run_suite (groups: list[str], repeat: int, quick: bool) -> dict:
+    results = {}
+    for group in groups:
+        for name, params, make in GROUPS[group] (quick):
+            key = case_key (name, params)
+            results[key] = {'name': name, 'params': params, **measure (make, repeat)}
+            print (f"{key:<60} best {results[key]['best'] * 1e3:>10.3f} ms  "
+                   f"median {results[key]['median'] * 1e3:>10.3f} ms", flush = True)
+
+    return {
+        'meta': {
+            'python':   platform.python_version (),
+            'numpy':    np.__version__,
+            'platform': platform.platform (),
+            'repeat':   repeat,
+            'quick':    quick,
+        },
+        'results': results,
+    }
+
+# Cases present in both runs, flagged when best time grew by more than threshold
+def compare (current: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    print (f"\n{'case':<60} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for key, res in current['results'].items ():
+        base = baseline['results'].get (key)
+        if base is None:
+            continue
+        ratio = res['best'] / base['best']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append (key)
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        print (f"{key:<60} {base['best'] * 1e3:>12.3f} {res['best'] * 1e3:>12.3f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main ():
+    parser = argparse.ArgumentParser (description = __doc__.splitlines ()[0])
+    parser.add_argument ('--only', nargs = '+', choices = list (GROUPS), default = list (GROUPS))
+    parser.add_argument ('--repeat', type = int, default = 5)
+    parser.add_argument ('--quick', action = 'store_true', help = 'smaller synthetic sizes')
+    parser.add_argument ('--out', type = Path, help = 'write results as JSON')
+    parser.add_argument ('--compare', type = Path, help = 'baseline JSON from an earlier --out')
+    parser.add_argument ('--threshold', type = float, default = 0.15,
+                         help = 'allowed slowdown before a case is flagged (0.15 = 15%%)')
+    args = parser.parse_args ()
+
+    results = run_suite (args.only, args.repeat, args.quick)
+
+    if args.out is not None:
+        args.out.write_text (json.dumps (results, indent = 2))
+
+    if args.compare is not None:
+        regressions = compare (results, json.loads (args.compare.read_text ()), args.threshold)
+        if regressions:
+            print (f"\n{len (regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit (1)
+
+
+if __name__ == '__main__':
+    main ()
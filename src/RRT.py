@@ -1,9 +1,12 @@
 from .geometry import *
 from .waypoint import *
 from .obstacle import *
+from .bezier import ArcLengthTable
+from .stats import Stats
 import math
 import numpy as np
 import random
+import time
 
 class RRTNode ():
     def __init__ (self, position: Vec3D):
@@ -11,71 +14,169 @@ class RRTNode ():
         self.parent: RRTNode = None
         self.cost: float = 0.0
 
+# 'rrt*'      grows one tree from the start, sampling uniformly
+# 'goal_bias' RRT* that samples the goal itself with probability goal_bias
+# 'informed'  goal_bias until the goal is reached, then refine_iter more iterations
+#             sampling only the ellipsoid of points that could shorten the path
+# 'connect'   RRT-Connect, trees from both ends that greedily grow into each other
+PLANNERS = ('rrt*', 'goal_bias', 'informed', 'connect')
+
 class RRT ():
+    # start, goal and bounds may be Vec3D or length-3 arrays
+    # obstacles may be a list, or an ObstacleField that must not move during planning
     def __init__ (self, start: Vec3D, goal: Vec3D, step_size: float,
                   radius: float, bl_bound: Vec3D, tr_bound: Vec3D,
-                  obstacles: list[Obstacle], max_iter: int = 1000,
-                  seed: int | None = None):
-        self.start: RRTNode = RRTNode (start)
-        self.goal: RRTNode = RRTNode (goal)
+                  obstacles: list[Obstacle] | ObstacleField, max_iter: int = 1000,
+                  seed: int | None = None, stats: Stats | None = None,
+                  planner: str = 'rrt*', goal_bias: float = 0.1, refine_iter: int = 200):
+        if planner not in PLANNERS:
+            raise ValueError (f"Unknown planner: {planner!r}, expected one of {PLANNERS}")
+
+        self.start: RRTNode = RRTNode (as_vec (start))
+        self.goal: RRTNode = RRTNode (as_vec (goal))
         self.step_size: float = step_size
         self.radius: float = radius
-        self.bl_bound: Vec3D = bl_bound
-        self.tr_bound: Vec3D = tr_bound
-        self.obstacles: list[Obstacle] = obstacles
+        self.bl_bound: Vec3D = as_vec (bl_bound)
+        self.tr_bound: Vec3D = as_vec (tr_bound)
+        self.field: ObstacleField = (obstacles if isinstance (obstacles, ObstacleField)
+                                     else ObstacleField (obstacles))
+        self.obstacles: list[Obstacle] | None = self.field.obstacles
         self.nodes: list[RRTNode] = [self.start]
         self.max_iter: int = max_iter
         self.rng: random.Random = random.Random (seed)
+        self.stats: Stats | None = stats
+
+        self.planner: str = planner
+        self.goal_bias: float = goal_bias if planner in ('goal_bias', 'informed') else 0.0
+        self.refine_iter: int = refine_iter
+
+        # Spatial index over node positions, row i belongs to self.nodes[i]
+        self.index: VoxelGrid = VoxelGrid (max (step_size, radius))
+        self.index.insert (self.start.position)
+
+        # Tree grown from the goal, only used by 'connect'
+        self.goal_nodes: list[RRTNode] = []
+        self.goal_index: VoxelGrid | None = None
+
+        # Set once a path reaches the goal, and the cost the informed ellipsoid is drawn for
+        self.reached: bool = False
+        self.rejected: int = 0
+        self.best_cost: float = math.inf
+        self.refined_by: int = max_iter
+
+        # Children of each node, kept only while refining so rewires can pass cost drops down
+        self.children: dict[RRTNode, list[RRTNode]] | None = None
+
+        # Per-phase seconds and work counts, only kept when stats is set
+        self.elapsed: dict[str, float] = dict.fromkeys (('sample', 'nearest', 'neighbors', 'collision', 'rewire'), 0.0)
+        self.counts: dict[str, int] = {'iterations': 0, 'edge_checks': 0, 'rewires': 0}
 
     # Get random point in world bounds
     def get_random_point (self) -> Vec3D:
+        if self.goal_bias > 0 and not self.reached and self.rng.random () < self.goal_bias:
+            return self.goal.position.get_copy ()
+        if self.best_cost < math.inf:
+            return self.get_informed_point ()
+        return self.get_uniform_point ()
+
+    def get_uniform_point (self) -> Vec3D:
         return Vec3D (self.rng.uniform (self.bl_bound[0], self.tr_bound[0]),
                       self.rng.uniform (self.bl_bound[1], self.tr_bound[1]),
                       self.rng.uniform (self.bl_bound[2], self.tr_bound[2]))
 
-    # Get nearest node to point
-    def get_nearest_node (self, point) -> RRTNode:
-        return min (self.nodes, key = lambda node: node.position.dist_sq (point))
+    # Uniform point in the ellipsoid with foci start and goal where paths can cost less than best_cost,
+    # clipped to the world bounds
+    def get_informed_point (self) -> Vec3D:
+        a, b = self.start.position.to_array (), self.goal.position.to_array ()
+        c_min = float (np.linalg.norm (b - a))
+        if c_min == 0:
+            return self.get_uniform_point ()
+
+        # Orthonormal frame with its first axis along start -> goal
+        axis = (b - a) / c_min
+        ref = np.array ([1.0, 0.0, 0.0]) if abs (axis[0]) < 0.9 else np.array ([0.0, 1.0, 0.0])
+        u = ref - np.dot (ref, axis) * axis
+        u /= np.linalg.norm (u)
+        frame = np.stack ([axis, u, np.cross (axis, u)], axis = 1)
+
+        radii = np.array ([self.best_cost / 2] + [math.sqrt (max (self.best_cost ** 2 - c_min ** 2, 0.0)) / 2] * 2)
+        ball = np.array ([self.rng.gauss (0, 1) for _ in range (3)])
+        ball *= self.rng.random () ** (1 / 3) / (np.linalg.norm (ball) or 1.0)
+
+        point = frame @ (radii * ball) + 0.5 * (a + b)
+        return Vec3D (*np.clip (point, self.bl_bound.to_array (), self.tr_bound.to_array ()).tolist ())
+
+    # Get nearest node to point, in the goal tree if given its (nodes, index)
+    def get_nearest_node (self, point, tree: tuple | None = None) -> RRTNode:
+        if tree is not None:
+            nodes, index = tree
+            return nodes[index.nearest (point)]
+        return self.nodes[self.index.nearest (point)]
 
     # Get neighbourhood for rerouting
     def get_neighbors (self, point) -> list[RRTNode]:
         n = len (self.nodes)
-        # Adaptive radius
-        r = min (self.radius, self.step_size * math.sqrt ((math.log (n + 1)) / (n + 1)))
-        return [node for node in self.nodes if node.position.dist_sq (point) <= r ** 2]
-    
-    # Rewire with new node
-    def rewire (self, new_node: RRTNode, neighbors: list[RRTNode]) -> None:
-        for node in neighbors:
-            if node == new_node.parent:
+        # Adaptive radius, or the full radius while refining so rewiring can still shorten the path
+        if self.reached:
+            r = self.radius
+        else:
+            r = min (self.radius, self.step_size * math.sqrt ((math.log (n + 1)) / (n + 1)))
+        return [self.nodes[i] for i in self.index.within_radius (point, r)]
+
+    def add_node (self, node: RRTNode) -> None:
+        self.nodes.append (node)
+        self.index.insert (node.position)
+        if self.children is not None and node.parent is not None:
+            self.children.setdefault (node.parent, []).append (node)
+
+    # Move node under a new parent, and while refining lower every descendant's cost to match
+    def reparent (self, node: RRTNode, parent: RRTNode, cost: float) -> None:
+        if self.children is not None:
+            if node.parent is not None:
+                self.children[node.parent].remove (node)
+            self.children.setdefault (parent, []).append (node)
+
+            drop = node.cost - cost
+            stack = list (self.children.get (node, ()))
+            while stack:
+                child = stack.pop ()
+                child.cost -= drop
+                stack.extend (self.children.get (child, ()))
+
+        node.parent = parent
+        node.cost = cost
+
+    # Rewire with new node, `blocked[i]` marks the edge to neighbors[i] as obstructed
+    # Returns the number of nodes reparented
+    def rewire (self, new_node: RRTNode, neighbors: list[RRTNode],
+                blocked: np.ndarray | None = None) -> int:
+        if blocked is None:
+            blocked = self.paths_are_obstructed ([n.position for n in neighbors], new_node.position)
+
+        rewired = 0
+        for node, is_blocked in zip (neighbors, blocked):
+            if node == new_node.parent or is_blocked:
                 continue
-            
-            if not self.path_is_obstructed (new_node.position, node.position):
-                new_cost = new_node.cost + new_node.position.dist (node.position)
-                if new_cost < node.cost:
-                    node.parent = new_node
-                    node.cost = new_cost
+
+            new_cost = new_node.cost + new_node.position.dist (node.position)
+            if new_cost < node.cost:
+                self.reparent (node, new_node, new_cost)
+                rewired += 1
+        return rewired
 
     # Return if point is in object
     def point_is_obstructed (self, point: Vec3D) -> bool:
-        for obstacle in self.obstacles:
-            if obstacle.intersects_point (point):
-                return True
-            
-        return False
+        return self.field.point_is_obstructed (point)
     
-    # Return if linear path from a to b is clear
-    def path_is_obstructed (self, a: Vec3D, b: Vec3D, step: float = 0.2) -> bool:
-        dir = b - a
-        len = dir.length ()
-        dir.normalize ()
-
-        for t in np.arange (0, len, step):
-            p = a + t * dir
-            if self.point_is_obstructed (p):
-                return True
-        
-        return self.point_is_obstructed (p)
+    # Return if linear path from a to b hits any obstacle
+    def path_is_obstructed (self, a: Vec3D, b: Vec3D) -> bool:
+        return self.field.segment_is_obstructed (a, b)
+
+    # Batch of edges starts[i] -> ends[i], either side may be a single point
+    def paths_are_obstructed (self, starts, ends) -> np.ndarray:
+        if len (starts) == 0:
+            return np.zeros (0, dtype = bool)
+        return self.field.segments_obstructed (starts, ends)
 
     # Get real sample position from random
     def steer (self, from_node: RRTNode, to_point: Vec3D) -> Vec3D:
@@ -99,25 +200,85 @@ class RRT ():
         # Reverse
         return path[::-1]
 
-    # RRT* Algorithm
+    # Run the configured planner, recording its phases and work into stats if set
     def plan (self) -> list[Vec3D]:
-        for _ in range (self.max_iter):
+        if self.stats is None:
+            return self.plan_connect () if self.planner == 'connect' else self.plan_star ()
+
+        start_nodes = len (self.nodes) + len (self.goal_nodes)
+        start_rejected = self.rejected
+        start_counts, start_elapsed = dict (self.counts), dict (self.elapsed)
+        path = self.plan_connect () if self.planner == 'connect' else self.plan_star ()
+
+        counts = {
+            'iterations':  self.counts['iterations'] - start_counts['iterations'],
+            'rejected':    self.rejected - start_rejected,
+            'edge_checks': self.counts['edge_checks'] - start_counts['edge_checks'],
+            'rewires':     self.counts['rewires'] - start_counts['rewires'],
+            'nodes':       len (self.nodes) + len (self.goal_nodes) - start_nodes,
+        }
+        elapsed = {phase: self.elapsed[phase] - start_elapsed[phase] for phase in self.elapsed}
+        for name, n in counts.items ():
+            self.stats.count ('rrt.' + name, n)
+        for phase, seconds in elapsed.items ():
+            self.stats.add_time ('rrt.' + phase, seconds)
+        self.stats.count ('rrt.plans')
+        self.stats.event ('rrt.plan', reached = self.reached, **counts,
+                          **{phase + '_s': seconds for phase, seconds in elapsed.items ()})
+        return path
+
+    # Charge the time since t to a phase, returns the time now
+    def lap (self, phase: str, t: float) -> float:
+        now = time.perf_counter ()
+        self.elapsed[phase] += now - t
+        return now
+
+    # RRT* Algorithm
+    def plan_star (self) -> list[Vec3D]:
+        timed = self.stats is not None
+        for i in range (self.max_iter):
+            # Informed refinement stops after its budget, keeping the shortest path found
+            if self.reached and i >= self.refined_by:
+                break
+
+            if timed:
+                t = time.perf_counter ()
+                self.counts['iterations'] += 1
             sample = self.get_random_point ()
+            if timed:
+                t = self.lap ('sample', t)
             nearest_node = self.get_nearest_node (sample)
+            if timed:
+                t = self.lap ('nearest', t)
             new_pos = self.steer (nearest_node, sample)
+            if timed:
+                t = self.lap ('sample', t)
 
-            if self.path_is_obstructed (nearest_node.position, new_pos):
+            obstructed = self.path_is_obstructed (nearest_node.position, new_pos)
+            if timed:
+                t = self.lap ('collision', t)
+                self.counts['edge_checks'] += 1
+            if obstructed:
+                self.rejected += 1
                 continue
 
             new_node = RRTNode (new_pos)
             neighbor_nodes = self.get_neighbors (new_pos)
+            if timed:
+                t = self.lap ('neighbors', t)
+
+            # Edges to neighbors are checked once and reused for rewiring
+            blocked = self.paths_are_obstructed ([n.position for n in neighbor_nodes], new_pos)
+            if timed:
+                t = self.lap ('collision', t)
+                self.counts['edge_checks'] += len (neighbor_nodes)
 
             # Choose parent with lowest cost
             best_parent = nearest_node
             min_cost = nearest_node.cost + nearest_node.position.dist (new_pos)
 
-            for node in neighbor_nodes:
-                if not self.path_is_obstructed (node.position, new_pos):
+            for node, is_blocked in zip (neighbor_nodes, blocked):
+                if not is_blocked:
                     cost = node.cost + node.position.dist (new_pos)
                     if cost < min_cost:
                         best_parent = node
@@ -125,36 +286,197 @@ class RRT ():
 
             new_node.parent = best_parent
             new_node.cost = min_cost
-            self.nodes.append (new_node)
+            self.add_node (new_node)
 
-            self.rewire (new_node, neighbor_nodes)
+            rewired = self.rewire (new_node, neighbor_nodes, blocked)
+            if timed:
+                t = self.lap ('rewire', t)
+                self.counts['rewires'] += rewired
+
+            # Connect goal if close and collision-free, or reconnect it while refining if that is cheaper
+            goal_dist = new_node.position.dist (self.goal.position)
+            if goal_dist < self.step_size and (not self.reached or new_node.cost + goal_dist < self.goal.cost):
+                obstructed = self.path_is_obstructed (new_node.position, self.goal.position)
+                if timed:
+                    t = self.lap ('collision', t)
+                    self.counts['edge_checks'] += 1
+                if not obstructed:
+                    if self.reached:
+                        self.reparent (self.goal, new_node, new_node.cost + goal_dist)
+                        self.best_cost = self.goal.cost
+                        continue
 
-            # Connect goal if close and collision-free
-            if new_node.position.dist (self.goal.position) < self.step_size:
-                if not self.path_is_obstructed (new_node.position, self.goal.position):
                     self.goal.parent = new_node
-                    self.goal.cost = new_node.cost + new_node.position.dist (self.goal.position)
-                    self.nodes.append (self.goal)
-                    return self.get_path (self.goal)
+                    self.goal.cost = new_node.cost + goal_dist
+
+                    self.add_node (self.goal)
+                    self.reached = True
+                    if self.planner != 'informed' or self.refine_iter <= 0:
+                        return self.get_path (self.goal)
+                    self.refined_by = i + 1 + self.refine_iter
+                    self.best_cost = self.goal.cost
+                    self.children = {}
+                    for node in self.nodes:
+                        if node.parent is not None:
+                            self.children.setdefault (node.parent, []).append (node)
+
+            # The goal is rewired like any node, so its cost only falls
+            if self.reached:
+                self.best_cost = self.goal.cost
+
+        if self.reached:
+            return self.get_path (self.goal)
 
         # If goal not connected, return path to nearest
         closest = self.get_nearest_node (self.goal.position)
         return self.get_path (closest)
+
+    # Add a step from the nearest node in a tree towards point, None if the step is blocked
+    def extend (self, point: Vec3D, tree: tuple | None = None) -> RRTNode | None:
+        timed = self.stats is not None
+        if timed:
+            t = time.perf_counter ()
+        nearest_node = self.get_nearest_node (point, tree)
+        if timed:
+            t = self.lap ('nearest', t)
+        new_pos = self.steer (nearest_node, point)
+        if timed:
+            t = self.lap ('sample', t)
+        obstructed = self.path_is_obstructed (nearest_node.position, new_pos)
+        if timed:
+            self.lap ('collision', t)
+            self.counts['edge_checks'] += 1
+        if obstructed:
+            return None
+
+        new_node = RRTNode (new_pos)
+        new_node.parent = nearest_node
+        new_node.cost = nearest_node.cost + nearest_node.position.dist (new_pos)
+        if tree is None:
+            self.add_node (new_node)
+        else:
+            tree[0].append (new_node)
+            tree[1].insert (new_pos)
+        return new_node
+
+    # RRT-Connect: extend one tree towards a sample, then step the other tree all the way to the new node
+    def plan_connect (self) -> list[Vec3D]:
+        self.goal_nodes = [self.goal]
+        self.goal_index = VoxelGrid (max (self.step_size, self.radius))
+        self.goal_index.insert (self.goal.position)
+        trees = [None, (self.goal_nodes, self.goal_index)]      # None is the start tree
+
+        timed = self.stats is not None
+        for _ in range (self.max_iter):
+            if timed:
+                t = time.perf_counter ()
+                self.counts['iterations'] += 1
+            sample = self.get_random_point ()
+            if timed:
+                self.lap ('sample', t)
+            new_node = self.extend (sample, trees[0])
+            if new_node is None:
+                self.rejected += 1
+            else:
+                # Steer lands exactly on the target once it is within one step
+                while True:
+                    node = self.extend (new_node.position, trees[1])
+                    if node is None:
+                        break
+                    if node.position.dist_sq (new_node.position) == 0:
+                        start_side, goal_side = (new_node, node) if trees[0] is None else (node, new_node)
+                        self.reached = True
+                        return self.get_path (start_side) + self.get_path (goal_side)[::-1][1:]
+
+            trees.reverse ()
+
+        # If the trees never met, return the start tree's path to the node nearest the goal
+        closest = self.get_nearest_node (self.goal.position)
+        return self.get_path (closest)
         
-    # Convert RRT path to waypoints
-    def get_waypoint_path (self, max_step: float) -> WaypointPath:
-        vec_path = self.plan ()
-        waypoints: list[Waypoint] = []
-        index = 0
-
-        for i in range (len (vec_path) - 1):
-            a, b  = vec_path[i], vec_path[i + 1]
-            steps = max (1, math.ceil (a.dist (b) / max_step))
-
-            for j in range (steps):
-                t = j / steps
-                waypoints.append (Waypoint (a + (b - a) * t, index))
-                index += 1
-
-        waypoints.append (Waypoint (vec_path[-1], index))
-        return WaypointPath (max_step, waypoints)
\ No newline at end of file
+    # Convert RRT path to waypoints, shortcut and refit as a smooth curve if smooth is set
+    def get_waypoint_path (self, max_step: float, smooth: bool = False) -> WaypointPath:
+        if smooth:
+            return WaypointPath.from_array (max_step, smooth_path (self.plan (), self.field, max_step))
+        return WaypointPath.from_array (max_step, interpolate_polyline (self.plan (), max_step))
+
+
+# Resample a polyline so consecutive points are at most max_step apart, keeping the vertices
+def interpolate_polyline (vertices, max_step: float) -> np.ndarray:
+    verts = as_points (vertices)
+    if len (verts) < 2:
+        return verts.copy ()
+
+    a, b = verts[:-1], verts[1:]
+    steps = np.maximum (1, np.ceil (np.linalg.norm (b - a, axis = 1) / max_step)).astype (np.intp)
+
+    # Segment id and fractional position of every output sample
+    seg = np.repeat (np.arange (len (steps)), steps)
+    starts = np.cumsum (steps) - steps
+    t = (np.arange (steps.sum ()) - starts[seg]) / steps[seg]
+
+    out = np.empty ((len (seg) + 1, 3))
+    out[:-1] = a[seg] + (b[seg] - a[seg]) * t[:, None]
+    out[-1] = verts[-1]
+    return out
+
+
+# Greedily skip to the farthest later vertex in line of sight, keeping both ends
+def shortcut_vertices (vertices, field: ObstacleField) -> np.ndarray:
+    verts = as_points (vertices)
+    keep = [0]
+    while keep[-1] < len (verts) - 1:
+        i = keep[-1]
+        free = np.flatnonzero (~field.segments_obstructed (verts[i], verts[i + 1:]))
+        # Tree edges are free, but fall back to the next vertex if the field disagrees
+        keep.append (i + 1 + (int (free[-1]) if len (free) else 0))
+    return verts[keep]
+
+# Cubic segments through every vertex, shape (len (vertices) - 1, 4, 3)
+# Interior handles point along the neighbouring chord, mirrored like BezierSpline's, and
+# are scale[i] times a third of the shorter adjacent edge; end handles are zero
+def fit_c1_segments (verts: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    handles = np.zeros_like (verts)
+    if len (verts) > 2:
+        chord = verts[2:] - verts[:-2]
+        norm = np.linalg.norm (chord, axis = 1, keepdims = True)
+        edges = np.linalg.norm (np.diff (verts, axis = 0), axis = 1)
+        reach = np.minimum (edges[:-1], edges[1:])[:, None] / 3
+        handles[1:-1] = np.divide (chord, norm, out = np.zeros_like (chord), where = norm > 0) * reach
+
+    handles *= scale[:, None]
+    return np.stack ([verts[:-1], verts[:-1] + handles[:-1], verts[1:] - handles[1:], verts[1:]], axis = 1)
+
+# Evenly spaced positions along each segment on its own, so every vertex is kept as a waypoint
+# Returns the positions and, for each chord between them, the segment it lies on
+def resample_segments (segments: np.ndarray, max_step: float) -> tuple[np.ndarray, np.ndarray]:
+    pieces, owner = [], []
+    for i in range (len (segments)):
+        segment = segments[i:i + 1]
+        positions = ArcLengthTable (segment, ArcLengthTable.resolution_for (segment, max_step)).even_samples (max_step)
+        pieces.append (positions if i == 0 else positions[1:])
+        owner.append (np.full (len (positions) - 1, i))
+    return np.concatenate (pieces), np.concatenate (owner)
+
+def smooth_path (vertices, field: ObstacleField, max_step: float, attempts: int = 4) -> np.ndarray:
+    """Shortcut an RRT path, fit C1 cubic segments to what remains and resample at max_step.
+
+    Line of sight between the shortcut vertices is collision checked, and so
+    is every chord of the resampled curve. Handles next to a blocked chord
+    are halved up to `attempts` times and then dropped, which leaves those
+    segments on the free straight shortcut, so the result is always as clear
+    as the shortcut polyline.
+    """
+    verts = shortcut_vertices (vertices, field)
+    if len (verts) < 2:
+        return verts.copy ()
+
+    scale = np.ones (len (verts))
+    while True:
+        positions, owner = resample_segments (fit_c1_segments (verts, scale), max_step)
+        blocked = np.unique (owner[field.segments_obstructed (positions[:-1], positions[1:])])
+        around = np.concatenate ((blocked, blocked + 1))
+        if not scale[around].any ():
+            # Clear, or blocked only where the shortcut itself is
+            return positions
+        scale[around] = np.where (scale[around] > 0.5 ** attempts, scale[around] / 2, 0.0)
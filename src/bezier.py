@@ -1,130 +1,187 @@
-from .geometry import Vec3D, Locatable
+from .geometry import Vec3D, Locatable, as_points
 from .waypoint import *
 from .obstacle import *
+import math
+import numpy as np
+
+# Cubic Bernstein basis for a batch of parameters, shape (len (ts), 4)
+def bernstein_basis (ts) -> np.ndarray:
+    t = np.asarray (ts, dtype = np.float64)
+    s = 1 - t
+    return np.stack ((s**3, 3 * s**2 * t, 3 * s * t**2, t**3), axis = -1)
+
+# Arc-length lookup table over one or more cubic segments, shape (S, 4, 3)
+# Segments are chained, so the table parameter u = segment index + local t
+class ArcLengthTable:
+    def __init__ (self, segments: np.ndarray, resolution: int):
+        self.segments: np.ndarray = segments
+        count = len (segments)
+
+        # Sample every segment on the same t grid through one shared basis matrix
+        ts = np.linspace (0, 1, resolution + 1)
+        samples = np.einsum ('kj,sjd->skd', bernstein_basis (ts), segments)
+        chords = np.linalg.norm (np.diff (samples, axis = 1), axis = 2)
+
+        # Cumulative length at u = 0, then at every (segment, t > 0) sample
+        self.u: np.ndarray = np.concatenate (([0.0], (np.arange (count)[:, None] + ts[1:]).ravel ()))
+        self.cum_length: np.ndarray = np.concatenate (([0.0], np.cumsum (chords.ravel ())))
+        self.length: float = float (self.cum_length[-1])
+
+    # Sample count per segment so chords stay well below max_step
+    @staticmethod
+    def resolution_for (segments: np.ndarray, max_step: float) -> int:
+        polygon = np.linalg.norm (np.diff (segments, axis = 1), axis = 2).sum (axis = 1).max ()
+        return int (min (max (32, 4 * math.ceil (polygon / max_step)), 4096))
+
+    def params_at_lengths (self, lengths) -> np.ndarray:
+        return np.interp (lengths, self.cum_length, self.u)
+
+    # Positions at table parameters u, shape (len (u), 3)
+    def evaluate (self, u) -> np.ndarray:
+        u = np.asarray (u, dtype = np.float64)
+        seg = np.minimum (u.astype (np.intp), len (self.segments) - 1)
+        return np.einsum ('mj,mjd->md', bernstein_basis (u - seg), self.segments[seg])
+
+    # Evenly spaced positions along the whole table, consecutive points < max_step apart
+    def even_samples (self, max_step: float) -> np.ndarray:
+        count = int (self.length // max_step) + 1
+        lengths = np.linspace (0, self.length, count + 1)
+        return self.evaluate (self.params_at_lengths (lengths))
+
 
 # Cubic Bezier curve
 class BezierCurve:
-    def __init__ (self, control_points: list[Vec3D], max_step: float, index_offset: int = 0):
+    # control_points may be a list of 4 Vec3D or a (4, 3) array
+    def __init__ (self, control_points: list[Vec3D] | np.ndarray, max_step: float, index_offset: int = 0):
         self.control_points = control_points
+        self.cps: np.ndarray = as_points (control_points)
         self.max_step = max_step
+
+        segments = self.cps[None]
+        self.arc_table = ArcLengthTable (segments, ArcLengthTable.resolution_for (segments, max_step))
+        self.length: float = self.arc_table.length
         self.points = self.build_points (index_offset)
 
     # t in [0, 1]
     def vec_at_t (self, t: float) -> Vec3D:
-        cps = self.control_points
-        return (cps[0] * (1 - t)**3 +
-                cps[1] * 3 * (1 - t)**2 * t +
-                cps[2] * 3 * (1 - t) * t**2 +
-                cps[3] * t**3)
-
-    def build_points (self, index_offset: int) -> list[Waypoint]:
-        # Recursively subsamples between two ts
-        def subsample (t0, t1, v0 = None, v1 = None):
-            subsamples = {}
-            # Calculate vectors if needed
-            if (v0 is None):
-                v0 = self.vec_at_t (t0)
-                subsamples[t0] = v0
-            if (v1 is None):
-                v1 = self.vec_at_t (t1)
-                subsamples[t1] = v1
-
-            # Base case, dist is good
-            if (v0.dist_sq (v1) < self.max_step ** 2):
-                return subsamples
-            
-            # Recurse
-            t_mid = (t0 + t1) / 2
-            v_mid = self.vec_at_t (t_mid);         
-            subsamples[t_mid] = v_mid
-
-            subsamples.update (subsample (t0, t_mid, v0, v_mid))
-            subsamples.update (subsample (t_mid, t1, v_mid, v1))
+        return Vec3D.from_array (self.evaluate ((t,))[0])
 
-            return subsamples            
+    # Positions for an array of ts, shape (len (ts), 3)
+    def evaluate (self, ts) -> np.ndarray:
+        return bernstein_basis (ts) @ self.cps
 
-        t_to_vec = subsample (0, 1)
-        sorted_ts = sorted (t_to_vec.keys ())
-
-        # Build final waypoints
-        points = []
-        for i, t in enumerate (sorted_ts):
-            points.append (Waypoint (t_to_vec[t], index_offset + i))
-
-        return points
+    def build_points (self, index_offset: int) -> list[Waypoint]:
+        positions = self.arc_table.even_samples (self.max_step)
+        return WaypointPath.from_array (self.max_step, positions, index_offset).points
 
 # C1 continuous Bezier spline
 class BezierSpline:
-    def __init__ (self, control_points: list[Vec3D], max_step: float):
+    # With lazy set nothing is sampled until positions are read, for streaming through iter_positions
+    def __init__ (self, control_points: list[Vec3D] | np.ndarray, max_step: float, lazy: bool = False):
         # Format: [p0, c1, c2, p1, c2, p2, c2, p3...]
         # p will be intersected, c2 will always be mirrored over pNext as c1Next
         self.control_points: list[Vec3D] = control_points 
         self.max_step: float = max_step
-        self.points: list[Waypoint] = self.build_spline ()
+        self.segments: np.ndarray = self.segment_control_points ()
+        self._arc_table: ArcLengthTable | None = None
+        self._positions: np.ndarray | None = None if lazy else self.build_spline ()
         self.waypoint_path: WaypointPath = None
 
-    def build_spline (self) -> list[Waypoint]:
-        cps = self.control_points
+    @property
+    def arc_table (self) -> ArcLengthTable:
+        if self._arc_table is None:
+            self._arc_table = ArcLengthTable (
+                self.segments, ArcLengthTable.resolution_for (self.segments, self.max_step))
+        return self._arc_table
+
+    @property
+    def length (self) -> float:
+        return self.arc_table.length
+
+    @property
+    def positions (self) -> np.ndarray:
+        if self._positions is None:
+            self._positions = self.build_spline ()
+        return self._positions
+
+    @property
+    def points (self) -> list[Waypoint]:
+        return self.get_waypoint_path ().points
+
+    # Per-segment control points with C1 mirroring applied, shape (S, 4, 3)
+    def segment_control_points (self) -> np.ndarray:
+        cps = as_points (self.control_points)
         assert len (cps) > 4 and (len (cps) % 2 == 0), "CP count must be 2n and > 4"
 
-        points: list[Vec3D] = []
-        segment_count: int = len (cps) // 3
-
-        for i in range (segment_count):
-            # C1 Mirroring
-            if (i == 0):
-                p0 = cps[0]
-                c1 = cps[1]
-                c2 = cps[2]
-                p1 = cps[3]
-            else:
-                p0 = cps[i * 2 + 1]
-                c2 = cps[i * 2 + 2]
-                p1 = cps[i * 2 + 3]
-
-                prev_c2 = cps[i * 2]
-                c1 = p0 + (p0 - prev_c2)
-
-            curve = BezierCurve ([p0, c1, c2, p1], self.max_step, len (points))
-
-            if points:
-                # Drop the first point to avoid duplication at joins
-                points.extend (curve.points[1:])
-            else:
-                points.extend (curve.points)
-
-        return points
+        segment_count: int = (len (cps) - 2) // 2
+        segments = np.empty ((segment_count, 4, 3))
+        segments[0] = cps[0:4]
+
+        # Segment i >= 1: p0 = cps[2i + 1], c2 = cps[2i + 2], p1 = cps[2i + 3]
+        # and c1 is the previous c2 mirrored over p0
+        p0 = cps[3:-2:2]
+        segments[1:, 0] = p0
+        segments[1:, 1] = 2 * p0 - cps[2:-3:2]
+        segments[1:, 2] = cps[4:-1:2]
+        segments[1:, 3] = cps[5::2]
+        return segments
+
+    # Evenly spaced positions along the spline from one arc-length interpolation pass
+    def build_spline (self) -> np.ndarray:
+        return self.arc_table.even_samples (self.max_step)
+
+    # Evenly spaced positions along segment i alone
+    def segment_positions (self, i: int) -> np.ndarray:
+        segment = self.segments[i:i + 1]
+        table = ArcLengthTable (segment, ArcLengthTable.resolution_for (segment, self.max_step))
+        return table.even_samples (self.max_step)
+
+    # Evenly spaced positions one segment at a time, each chunk continuing where the last ended
+    def iter_positions (self):
+        for i in range (len (self.segments)):
+            positions = self.segment_positions (i)
+            yield positions if i == 0 else positions[1:]
+
+    # Control points of segment i, the same row segment_control_points builds
+    def segment_at (self, i: int) -> np.ndarray:
+        if i == 0:
+            return as_points (self.control_points[0:4])
+        c2_prev, p0, c2, p1 = as_points (self.control_points[2 * i:2 * i + 4])
+        return np.array ([p0, 2 * p0 - c2_prev, c2, p1])
+
+    # Move control point k and reshape the one or two segments it feeds, returns their indices
+    # control_points must be a list or array this spline may modify
+    def move_control_point (self, k: int, point: Vec3D) -> range:
+        # Negative indices would move a point but resample the wrong segments
+        if not 0 <= k < len (self.control_points):
+            raise IndexError (f"Control point must be in range [0, {len (self.control_points) - 1}], got {k}")
+        self.control_points[k] = point
+        affected = range (max (0, (k - 2) // 2), min (len (self.segments) - 1, k // 2) + 1)
+        for i in affected:
+            self.segments[i] = self.segment_at (i)
+
+        self._arc_table = None
+        self._positions = None
+        self.waypoint_path = None
+        return affected
     
     # Split list by obstacles
     # Disjoint path is separated into list of lists regardless of distance between
     # distances between end and start of lists (may be < self.max_step)
-    def split_by_obstacles (self, obstacles: list[Obstacle]) -> list[WaypointPath]:
-        if self.waypoint_path is None:
-            self.get_waypoint_path ()
-        
-        paths: list[WaypointPath] = []
-        cur_path = WaypointPath (self.max_step, [])
-        
-        for waypoint in self.waypoint_path.points:
-            obstructed = False
-            for obstacle in obstacles:
-                # if obstacle intersects and cur path isn't empty, add it to list
-                if (obstacle.intersects_point (waypoint.pos)):
-                    if (len (cur_path.points) > 0):
-                      paths.append (cur_path)
-                      cur_path = WaypointPath (self.max_step, [])
-                    obstructed = True
-                    break
-            if not obstructed:
-              cur_path.points.append (waypoint)
-
-        if len (cur_path.points) > 0:
-            paths.append (cur_path)
-
-        return paths
+    def split_by_obstacles (self, obstacles: list[Obstacle] | ObstacleField) -> list[WaypointPath]:
+        if not isinstance (obstacles, ObstacleField):
+            obstacles = ObstacleField (obstacles)
+
+        path = self.get_waypoint_path ()
+        free = ~obstacles.points_obstructed (path.positions)
+
+        # Runs of consecutive free waypoints, as [start, end) pairs
+        edges = np.flatnonzero (np.diff (np.concatenate (([False], free, [False])).astype (np.int8)))
+        return [WaypointPath.from_array (self.max_step, path.positions[start:end], int (start))
+                for start, end in zip (edges[::2], edges[1::2])]
 
     def get_waypoint_path (self) -> WaypointPath:
         if self.waypoint_path is None:
-            self.waypoint_path = WaypointPath (self.max_step, self.points)
+            self.waypoint_path = WaypointPath.from_array (self.max_step, self.positions)
             
         return self.waypoint_path
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""Plan, simulate, benchmark or view a scene.
+
+    python main.py plan default.json [--out path.npy] [--move K X Y Z]
+    python main.py simulate motion.json [--duration 30] [--trace trace.jsonl]
+    python main.py bench [--quick] [--compare baseline.json]
+    python main.py view [motion.json] [--stats]
+
+A bare scene name, or no arguments at all, opens the viewer. Scenes are
+looked up as given and then under scenes/. Each command imports only what it
+needs, so nothing but `view` loads matplotlib or starts a replan process.
+"""
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+import numpy as np
+
+ROOT = Path (__file__).resolve ().parents[1]
+COMMANDS = ('plan', 'simulate', 'bench', 'view')
+
+
+def resolve_scene (name: str) -> str:
+    if Path (name).exists ():
+        return name
+    return str (ROOT / 'scenes' / name)
+
+def load_scene (name: str, planner: str | None = None):
+    from .scene import Scene
+    scene = Scene.from_file (resolve_scene (name))
+    if planner is not None:
+        scene.rrt_planner = planner
+    return scene
+
+def plan_cache (args):
+    if args.no_cache:
+        return None
+    from .plan_cache import PlanCache
+    return PlanCache (directory = args.cache_dir)
+
+
+def plan (args):
+    scene = load_scene (args.scene, args.planner)
+    if args.move:
+        positions = edit_plan (scene, args)
+    else:
+        t = time.perf_counter ()
+        positions = scene.build_path (plan_cache (args), seed = args.seed).positions
+        elapsed = time.perf_counter () - t
+        print (f"{len (positions)} waypoints, length {path_length (positions):.2f}, built in {elapsed * 1e3:.1f} ms")
+
+    if args.out is not None:
+        np.save (args.out, positions)
+
+# Build the path as an EditablePath and apply each --move to it in turn
+def edit_plan (scene, args) -> np.ndarray:
+    from .editable import EditablePath
+    from .geometry import Vec3D
+
+    last = len (scene.control_points) - 1
+    for k, *_ in args.move:
+        if k != int (k) or not 0 <= k <= last:
+            sys.exit (f"--move: control point must be an integer in [0, {last}], got {k:g}")
+
+    t = time.perf_counter ()
+    editable = EditablePath (scene, plan_cache (args), seed = args.seed)
+    elapsed = time.perf_counter () - t
+    print (f"{len (editable.positions)} waypoints, length {path_length (editable.positions):.2f}, "
+           f"built in {elapsed * 1e3:.1f} ms")
+
+    for k, x, y, z in args.move:
+        t = time.perf_counter ()
+        edit = editable.move_control_point (int (k), Vec3D (x, y, z))
+        elapsed = time.perf_counter () - t
+        print (f"moved control point {int (k)}: rows {edit.start}..{edit.old_stop} -> {edit.start}..{edit.new_stop}, "
+               f"length {path_length (editable.positions):.2f}, edited in {elapsed * 1e3:.1f} ms")
+    return editable.positions
+
+def path_length (positions: np.ndarray) -> float:
+    return float (np.linalg.norm (np.diff (positions, axis = 0), axis = 1).sum ())
+
+def simulate (args):
+    from .sim import run_headless
+    from .stats import Stats
+
+    scene = load_scene (args.scene, args.planner)
+    stats = Stats (trace = args.trace) if args.trace or args.stats else None
+
+    t = time.perf_counter ()
+    result = run_headless (scene, args.duration, dt = args.dt, seed = args.seed, stats = stats,
+                           stream = args.stream)
+    elapsed = time.perf_counter () - t
+
+    end = result.positions[-1]
+    goal = scene.control_points[-1].to_array ()
+    print (f"{len (result.times)} ticks of {args.dt} s in {elapsed:.2f} s wall, {len (result.replans)} replans")
+    print (f"final position ({end[0]:.2f}, {end[1]:.2f}, {end[2]:.2f}), "
+           f"{float (np.linalg.norm (end - goal)):.2f} from goal")
+
+    if args.out is not None:
+        np.savez (args.out, times = result.times, positions = result.positions, targets = result.targets,
+                  target_indices = result.target_indices, replans = np.asarray (result.replans))
+
+    if stats is not None:
+        if args.stats:
+            print (json.dumps (stats.snapshot (), indent = 2))
+        stats.close ()
+
+def bench (args):
+    import runpy
+    sys.argv = ['bench_suite.py', *args.rest]
+    runpy.run_path (str (ROOT / 'bench' / 'bench_suite.py'), run_name = '__main__')
+
+def view (args):
+    from .viewer import Viewer
+    from .stats import Stats
+
+    stats = Stats (trace = args.trace) if args.trace or args.stats else None
+    Viewer (load_scene (args.scene), plan_cache (args), stats).show ()
+
+    if stats is not None:
+        if args.stats:
+            print (json.dumps (stats.snapshot (), indent = 2))
+        stats.close ()
+
+
+def parser () -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser (prog = 'main.py', description = __doc__.splitlines ()[0])
+    commands = p.add_subparsers (dest = 'command', required = True)
+
+    # Names from RRT.PLANNERS, listed here so building the parser doesn't import the planner
+    def add_planner (sub):
+        sub.add_argument ('--planner', choices = ['rrt*', 'goal_bias', 'informed', 'connect'],
+                          help = 'override the scene rrt_planner')
+
+    def add_cache (sub):
+        sub.add_argument ('--no-cache', action = 'store_true', help = "don't read or write planned paths")
+        sub.add_argument ('--cache-dir', default = '.plan_cache')
+
+    sub = commands.add_parser ('plan', help = 'build the scene path and report it')
+    sub.add_argument ('scene')
+    sub.add_argument ('--seed', type = int, help = 'override the scene rrt_seed')
+    sub.add_argument ('--out', help = 'save waypoint positions as .npy')
+    sub.add_argument ('--move', nargs = 4, type = float, action = 'append', metavar = ('K', 'X', 'Y', 'Z'),
+                      help = 'move control point K after building, repeatable; gaps are seeded per segment '
+                             'so routes differ from a plain plan')
+    add_planner (sub)
+    add_cache (sub)
+    sub.set_defaults (run = plan)
+
+    sub = commands.add_parser ('simulate', help = 'fly the scene headless on a fixed timestep')
+    sub.add_argument ('scene')
+    sub.add_argument ('--duration', type = float, default = 30.0, help = 'sim seconds')
+    sub.add_argument ('--dt', type = float, default = 0.01)
+    sub.add_argument ('--seed', type = int, help = 'override the scene rrt_seed')
+    sub.add_argument ('--trace', help = 'write a JSONL event trace')
+    sub.add_argument ('--stats', action = 'store_true', help = 'print counters, timers and histograms')
+    sub.add_argument ('--stream', type = int, metavar = 'WAYPOINTS',
+                      help = 'plan the path as it comes into view, with this much look-ahead')
+    sub.add_argument ('--out', help = 'save the trajectory as .npz')
+    add_planner (sub)
+    sub.set_defaults (run = simulate)
+
+    # Everything after `bench` is left for bench_suite to parse
+    sub = commands.add_parser ('bench', help = 'run bench/bench_suite.py, remaining arguments go to it',
+                               add_help = False)
+    sub.set_defaults (run = bench)
+
+    sub = commands.add_parser ('view', help = 'fly the scene in an interactive window')
+    sub.add_argument ('scene', nargs = '?', default = 'default.json')
+    sub.add_argument ('--trace', help = 'write a JSONL event trace')
+    sub.add_argument ('--stats', action = 'store_true', help = 'print counters, timers and histograms on close')
+    add_cache (sub)
+    sub.set_defaults (run = view)
+
+    return p
+
+
+def main (argv: list[str] | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or (argv[0] not in COMMANDS and not argv[0].startswith ('-')):
+        argv = ['view', *argv]
+
+    p = parser ()
+    args, args.rest = p.parse_known_args (argv)
+    if args.rest and args.command != 'bench':
+        p.error ('unrecognized arguments: ' + ' '.join (args.rest))
+    args.run (args)
+
+
+if __name__ == '__main__':
+    main ()
@@ -0,0 +1,37 @@
+from abc import ABC, abstractmethod
+import time
+
+
+class Clock (ABC):
+    @abstractmethod
+    def now (self) -> float: ...
+
+
+class WallClock (Clock):
+    """Seconds since the epoch, as read by time.time ()."""
+
+    def now (self) -> float:
+        return time.time ()
+
+
+class SimClock (Clock):
+    """Fixed-timestep clock that only moves when advanced.
+
+    Time is start + ticks * dt rather than a running sum, so long runs do not
+    accumulate rounding drift and a given tick always reads the same time.
+    """
+
+    def __init__ (self, dt: float, start: float = 0.0):
+        self.dt    = dt
+        self.start = start
+        self.ticks = 0
+
+    def now (self) -> float:
+        return self.start + self.ticks * self.dt
+
+    def advance (self, ticks: int = 1) -> float:
+        self.ticks += ticks
+        return self.now ()
+
+    def reset (self) -> None:
+        self.ticks = 0
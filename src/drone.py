@@ -1,6 +1,9 @@
 from .geometry import Vec3D, KDTree, Locatable
 from .bezier import BezierSpline
 from .waypoint import *
+from .clock import Clock, WallClock
+from .stats import Stats
+import numpy as np
 import time
 
 class PID:
@@ -74,13 +77,17 @@ class ChainedPID3D:
 
 class Drone (Locatable):
     def __init__ (self, pos, min_vel = (-2, -2, -1), max_vel = (2, 2, 1),
-                  min_accel = (-2, -2, -1), max_accel = (2, 2, 1), look_r = 1.5):
+                  min_accel = (-2, -2, -1), max_accel = (2, 2, 1), look_r = 1.5,
+                  target_window = 32, clock: Clock | None = None, stats: Stats | None = None):
         self.pos = pos                  # type Vec3D
         self.min_vel = min_vel          # type tuple(3)
         self.max_vel = max_vel          # type tuple(3)
         self.min_accel = min_accel      # type tuple(3)
         self.max_accel = max_accel      # type tuple(3)
         self.look_r = look_r            # type num
+        self.target_window = target_window  # type int | None, None searches the whole tree every tick
+        self.clock = clock if clock is not None else WallClock ()
+        self.stats = stats              # type Stats | None, records tick latency when set
 
         self.vel = Vec3D (0, 0, 0)
         self.accel = Vec3D (0, 0, 0)
@@ -92,15 +99,13 @@ class Drone (Locatable):
 
     def set_path (self, waypoint_path, pos_gains = (2, 0, 0.5), vel_gains = (4, 0, 0.2),
                   pos_limits = None, vel_limits = (-10, 10)):
-        waypoints = waypoint_path.points
         assert self.look_r >= waypoint_path.max_step, "Lookahead radius must be greater than path max step"
 
         if pos_limits is None:
             pos_limits = (-self.look_r, self.look_r)
 
         # Build KDTree
-        self.waypoint_tree = KDTree (waypoints)
-        self.prev_waypoint = waypoints [0]
+        self.set_waypoints (waypoint_path)
 
         self.pid_3d = ChainedPID3D (
             pos_gains = pos_gains,
@@ -112,31 +117,113 @@ class Drone (Locatable):
     # Swap waypoint tree without resetting PID (safe to call mid-flight)
     def update_path (self, waypoint_path: WaypointPath) -> None:
         assert self.look_r >= waypoint_path.max_step
-        self.waypoint_tree = KDTree (waypoint_path.points)
-        self.prev_waypoint = waypoint_path.points[0]
+        self.set_waypoints (waypoint_path)
+
+    # A StreamingPath is followed through its look-ahead window, which is re-indexed as it slides
+    def set_waypoints (self, waypoint_path: WaypointPath | StreamingPath) -> None:
+        self.stream = waypoint_path if isinstance (waypoint_path, StreamingPath) else None
+        self.index_waypoints (waypoint_path.window () if self.stream is not None else waypoint_path)
+        self.prev_waypoint = self.waypoint_at (0)
+
+        # Row of prev_waypoint once targeting has locked on, None forces a tree search
+        self.progress = None
+
+    # Index waypoint positions as a raw array so queries return row indices
+    # The KDTree is only built once a full search needs it
+    def index_waypoints (self, waypoint_path: WaypointPath) -> None:
+        self.waypoint_indices = waypoint_path.indices
+        self.waypoint_positions = waypoint_path.positions
+        self._waypoint_tree = None
+
+    @property
+    def waypoint_tree (self) -> KDTree:
+        if self._waypoint_tree is None:
+            self._waypoint_tree = KDTree (self.waypoint_positions)
+        return self._waypoint_tree
+
+    # Waypoint object for one row, built on demand so paths never need their full points list
+    def waypoint_at (self, row: int) -> Waypoint:
+        return Waypoint (Vec3D (*self.waypoint_positions[row].tolist ()), int (self.waypoint_indices[row]))
+
+    # Swap in an edited path, see EditablePath: rows past the edit keep their progress, shifted by its delta
+    def apply_edit (self, waypoint_path: WaypointPath, edit) -> None:
+        assert self.stream is None, "Streaming paths can't be edited"
+        self.index_waypoints (waypoint_path)
+
+        if self.progress is None:
+            return
+        if self.progress >= edit.old_stop:
+            self.progress += edit.delta
+            self.prev_waypoint = self.waypoint_at (self.progress)
+        elif self.progress >= edit.start:
+            # The waypoint being tracked moved, so search again from the current position
+            self.progress = None
+
+    # Pull the next stretch of a streaming path once progress is past the middle of its window
+    def advance_stream (self) -> None:
+        index = int (self.waypoint_indices[self.progress])
+        if self.stream.advance (index):
+            self.index_waypoints (self.stream.window ())
+            self.progress = index - self.stream.offset
+
+    # Largest waypoint row within look_r in a window starting at the current progress
+    # The window grows while hits reach its far end, None if nothing is in range
+    def window_target (self) -> int | None:
+        pos = self.pos.to_array ()
+        lo = self.progress
+        hi = min (len (self.waypoint_positions), lo + self.target_window)
+
+        while True:
+            d = self.waypoint_positions[lo:hi] - pos
+            hits = np.flatnonzero (np.einsum ('ij,ij->i', d, d) <= self.look_r ** 2)
+            if len (hits) == 0:
+                return None
+
+            last = lo + int (hits[-1])
+            if last < hi - 1 or hi == len (self.waypoint_positions):
+                return last
+            hi = min (len (self.waypoint_positions), lo + 2 * (hi - lo))
+
+    # Row of the waypoint to steer towards, None if nothing is in range
+    def find_target (self) -> int | None:
+        if self.target_window is not None and self.progress is not None:
+            row = self.window_target ()
+            if row is not None:
+                return row
+
+        # Large deviation or fresh path: search the whole tree
+        hits = self.waypoint_tree.search_radius (self.pos, self.look_r)
+        if (len (hits) > 0):
+            return int (hits[np.argmax (self.waypoint_indices[hits])])
+        return None
 
     # Must call set_path beforehand, returns the target point
     def follow_path (self) -> Vec3D:
         if (self.pid_3d is None):
             raise ValueError ("Path not set")
+        tick_start = time.perf_counter () if self.stats is not None else 0.0
       
-        # Search waypoint_tree for largest intersected waypoint index
+        # Find the largest intersected waypoint index near current progress
         # PID to that
         # If no target found, go to prev known waypoint (defaults to cp0)
-        targets = self.waypoint_tree.search_radius (self.pos, self.look_r)
-        targets.sort (reverse = True)
-        if (len (targets) > 0):
-            target = targets[0]
+        row = self.find_target ()
+        if (row is not None):
+            target = self.waypoint_at (row)
             self.prev_waypoint = target
+            self.progress = row
+            if self.stream is not None:
+                self.advance_stream ()
         else:
             target = self.prev_waypoint
 
-        current_time = time.time ()
+        current_time = self.clock.now ()
         accel_cmd = self.pid_3d.update (self.pos.to_tuple (), self.vel.to_tuple (),
                                         target.pos.to_tuple(), current_time)
 
         self.kinematics (Vec3D (*accel_cmd), current_time)
 
+        if self.stats is not None:
+            self.stats.observe ('drone.tick', time.perf_counter () - tick_start)
         return target
 
     def kinematics (self, accel, current_time):
@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+import numpy as np
+from .bezier import BezierSpline
+from .geometry import Vec3D
+from .plan_cache import PlanCache
+from .scene import Scene, gap_key, plan_gap
+from .waypoint import WaypointPath
+
+
+@dataclass
+class PathEdit:
+    start:    int   # first waypoint row that changed
+    old_stop: int   # end of the changed rows before the edit
+    new_stop: int   # end of the changed rows after it
+
+    @property
+    def delta (self) -> int:
+        return self.new_stop - self.old_stop
+
+
+class EditablePath:
+    """Scene path that can be reshaped one control point at a time.
+
+    Each spline segment keeps its samples, its free-space mask and the
+    waypoints it contributes: its free runs, each after the RRT patch leading
+    into it. Moving a control point resamples only the one or two segments
+    whose shape it sets, plus any later segment whose incoming gap changed,
+    and splices their waypoints into `positions`. Segments are split against
+    the obstacle field as it stands when they are computed.
+
+    Gaps are seeded by the segment and run they lead into, not by their order
+    along the route as in Scene.build_path, so an edit that opens or closes a
+    gap never reseeds the gaps after it. The seeds, and so the RRT patches,
+    differ from build_path's for the same scene and seed: the two share no
+    cache entries, though EditablePaths of one scene share theirs.
+
+    Pass the returned PathEdit to Drone.apply_edit to keep a drone's progress.
+    """
+
+    # `seed` overrides rrt_seed, as in Scene.build_path
+    def __init__ (self, scene: Scene, cache: PlanCache | None = None, seed: int | None = None):
+        self.scene = scene
+        self.seed = scene.run_seed (seed)
+        self.cache = cache if self.seed is not None else None
+        self.spline = BezierSpline (list (scene.control_points), scene.bezier_max_step, lazy = True)
+
+        count = len (self.spline.segments)
+        self.samples: list[np.ndarray] = [None] * count
+        self.free: list[np.ndarray] = [None] * count
+        self.pieces: list[np.ndarray] = [None] * count
+        # (last free waypoint, whether the route was blocked) going into each segment
+        self.incoming: list[tuple] = [None] * count
+
+        for i in range (count):
+            self.sample (i)
+        self.incoming[0] = (None, False)
+        self.rebuild (0, count - 1)
+
+        self.positions: np.ndarray = np.concatenate (self.pieces)
+        self.starts: np.ndarray = np.concatenate (([0], np.cumsum ([len (p) for p in self.pieces])))
+
+    @property
+    def control_points (self) -> list[Vec3D]:
+        return self.spline.control_points
+
+    @property
+    def path (self) -> WaypointPath:
+        return WaypointPath.from_array (self.scene.bezier_max_step, self.positions)
+
+    # Segments after the first drop their first sample, the previous segment's last
+    def sample (self, i: int) -> None:
+        positions = self.spline.segment_positions (i)
+        self.samples[i] = positions if i == 0 else positions[1:]
+        self.free[i] = ~self.scene.obstacle_field.points_obstructed (self.samples[i])
+
+    # Waypoints of segment i given the state going into it, and the state coming out
+    def assemble (self, i: int, state: tuple) -> tuple[np.ndarray, tuple]:
+        last_free, blocked = state
+        positions, free = self.samples[i], self.free[i]
+        edges = np.flatnonzero (np.diff (np.concatenate (([False], free, [False])).astype (np.int8)))
+
+        pieces = []
+        for j, (start, end) in enumerate (zip (edges[::2], edges[1::2])):
+            if (start > 0 or blocked) and last_free is not None:
+                gap = self.scene.gap (last_free, positions[start], self.scene.obstacle_field,
+                                      self.scene.gap_seed (i, j, seed = self.seed))
+                key = gap_key (gap) if self.cache is not None else None
+                patch = self.cache.get (key) if self.cache is not None else None
+                if patch is None:
+                    patch = plan_gap (gap).positions
+                    if self.cache is not None:
+                        self.cache.put (key, patch)
+                pieces.append (patch)
+
+            pieces.append (positions[start:end])
+            last_free = positions[end - 1]
+
+        if len (free):
+            blocked = not free[-1]
+        return (np.concatenate (pieces) if pieces else np.empty ((0, 3))), (last_free, blocked)
+
+    # Reassemble segments from `first` on, past `last` until the state going into one is unchanged
+    # Returns one past the last segment reassembled
+    def rebuild (self, first: int, last: int) -> int:
+        state = self.incoming[first]
+        i = first
+        while i < len (self.pieces):
+            if i > last and same_state (state, self.incoming[i]):
+                break
+            self.incoming[i] = state
+            self.pieces[i], state = self.assemble (i, state)
+            i += 1
+        return i
+
+    def move_control_point (self, k: int, point: Vec3D) -> PathEdit:
+        affected = self.spline.move_control_point (k, point)
+        for i in affected:
+            self.sample (i)
+
+        first = affected[0]
+        stop = self.rebuild (first, affected[-1])
+
+        start, old_stop = int (self.starts[first]), int (self.starts[stop])
+        changed = np.concatenate (self.pieces[first:stop])
+        self.positions = np.concatenate ((self.positions[:start], changed, self.positions[old_stop:]))
+
+        edit = PathEdit (start, old_stop, start + len (changed))
+        self.starts[first + 1:stop + 1] = start + np.cumsum ([len (p) for p in self.pieces[first:stop]])
+        self.starts[stop + 1:] += edit.delta
+        return edit
+
+
+def same_state (a: tuple, b: tuple) -> bool:
+    if a[1] != b[1] or (a[0] is None) != (b[0] is None):
+        return False
+    return a[0] is None or np.array_equal (a[0], b[0])
@@ -0,0 +1,241 @@
+from .geometry import KDTree, as_points
+from .waypoint import WaypointPath
+import numpy as np
+
+
+class PIDBank:
+    """N x 3 independent PID controllers sharing gains and output limits.
+
+    Matches PID.update element-wise: the first update after a reset has no
+    integral or derivative term.
+    """
+
+    def __init__ (self, count: int, gains, output_limits = (0, 1)):
+        self.kp, self.ki, self.kd = gains
+        self.output_limits = output_limits
+
+        self.integral = np.zeros ((count, 3))
+        self.prev_error = np.zeros ((count, 3))
+        self.prev_time = None
+
+    def reset (self):
+        self.integral[:] = 0
+        self.prev_error[:] = 0
+        self.prev_time = None
+
+    def update (self, error: np.ndarray, current_time: float) -> np.ndarray:
+        dt = current_time - self.prev_time if self.prev_time is not None else 0
+
+        if dt > 0:
+            self.integral += error * dt
+            derivative = (error - self.prev_error) / dt
+        else:
+            derivative = 0
+
+        output = self.kp * error + self.ki * self.integral + self.kd * derivative
+
+        min_out, max_out = self.output_limits
+        if min_out is not None:
+            output = np.maximum (min_out, output)
+        if max_out is not None:
+            output = np.minimum (max_out, output)
+
+        self.prev_error = error
+        self.prev_time = current_time
+
+        return output
+
+
+class Fleet:
+    """N drones simulated together with state held in (N, 3) arrays.
+
+    Each step runs the same progress-windowed targeting, cascaded position ->
+    velocity PID and kinematics as Drone, vectorized across the fleet. Paths
+    are stored once per distinct WaypointPath, so drones sharing a path share
+    its positions and fallback KD tree. Swapping one drone's path appends the
+    new path's rows and frees the old slot once no drone uses it; the rows
+    are only repacked when freed rows outnumber live ones.
+    """
+
+    def __init__ (self, positions, look_r = 1.5, pos_gains = (2, 0, 0.5), vel_gains = (4, 0, 0.2),
+                  pos_limits = None, vel_limits = (-10, 10), target_window = 32):
+        self.pos = as_points (positions).copy ()
+        self.vel = np.zeros_like (self.pos)
+        self.accel = np.zeros_like (self.pos)
+        self.look_r = look_r
+        self.target_window = target_window
+        self.prev_time = None
+
+        if pos_limits is None:
+            pos_limits = (-look_r, look_r)
+
+        self.pid_pos = PIDBank (len (self), pos_gains, pos_limits)
+        self.pid_vel = PIDBank (len (self), vel_gains, vel_limits)
+
+        self.paths: list[WaypointPath | None] = []     # None for freed slots
+        self.path_of = np.zeros (len (self), dtype = np.intp)
+        self.trees: dict[int, tuple[KDTree, np.ndarray]] = {}
+
+    def __len__ (self) -> int:
+        return len (self.pos)
+
+    # Assign one path per drone and reset the controllers, like Drone.set_path
+    def set_paths (self, paths: list[WaypointPath]) -> None:
+        assert len (paths) == len (self), "Need one path per drone"
+        assert all (self.look_r >= p.max_step for p in paths), "Lookahead radius must be greater than path max step"
+
+        self.drone_paths: list[WaypointPath] = list (paths)
+        self._pack_paths ()
+        self.progress = np.zeros (len (self), dtype = np.intp)
+        self.locked = np.zeros (len (self), dtype = bool)
+        self.pid_pos.reset ()
+        self.pid_vel.reset ()
+
+    # Swap one drone's path without resetting its controllers, like Drone.update_path
+    def update_path (self, drone: int, path: WaypointPath) -> None:
+        assert self.look_r >= path.max_step
+        old = int (self.path_of[drone])
+        self.drone_paths[drone] = path
+        self.path_of[drone] = self._slot (path)
+        self.progress[drone] = 0
+        self.locked[drone] = False
+        self._release (old)
+
+    # Store each distinct path once and point drones at their slot
+    def _pack_paths (self) -> None:
+        # Trees belong to path objects, so they carry over to the new slots
+        trees = {id (self.paths[slot]): tree for slot, tree in self.trees.items ()}
+
+        self.slot_of: dict[int, int] = {}          # id of each stored path -> slot
+        self.users: list[int] = []
+        self.paths = []
+        for i, path in enumerate (self.drone_paths):
+            if id (path) not in self.slot_of:
+                self.slot_of[id (path)] = len (self.paths)
+                self.paths.append (path)
+                self.users.append (0)
+            self.path_of[i] = self.slot_of[id (path)]
+            self.users[self.path_of[i]] += 1
+
+        lengths = np.array ([len (p) for p in self.paths], dtype = np.intp)
+        self.path_start = np.cumsum (lengths) - lengths
+        self.path_end = self.path_start + lengths
+        self.positions = np.concatenate ([p.positions for p in self.paths])
+        self.used = len (self.positions)    # rows filled, the buffer may be longer
+        self.freed = 0                      # rows of freed slots
+        self.trees = {slot: trees[id (path)] for slot, path in enumerate (self.paths) if id (path) in trees}
+
+    # Slot of path, appending its rows in a new slot if it isn't stored yet
+    def _slot (self, path: WaypointPath) -> int:
+        slot = self.slot_of.get (id (path))
+        if slot is None:
+            start, n = self.used, len (path)
+            if start + n > len (self.positions):
+                grown = np.empty ((max (2 * len (self.positions), start + n), 3))
+                grown[:start] = self.positions[:start]
+                self.positions = grown
+            self.positions[start:start + n] = path.positions
+            self.used += n
+
+            slot = len (self.paths)
+            self.slot_of[id (path)] = slot
+            self.paths.append (path)
+            self.users.append (0)
+            self.path_start = np.append (self.path_start, start)
+            self.path_end = np.append (self.path_end, start + n)
+        self.users[slot] += 1
+        return slot
+
+    # Drop a drone's use of a slot, freeing it and its tree once unused
+    def _release (self, slot: int) -> None:
+        self.users[slot] -= 1
+        if self.users[slot] > 0:
+            return
+        path = self.paths[slot]
+        del self.slot_of[id (path)]
+        self.paths[slot] = None
+        self.trees.pop (slot, None)
+        self.freed += len (path)
+        if self.freed > self.used - self.freed:
+            self._pack_paths ()
+
+    # Row (within its own path) of each drone's target
+    def find_targets (self) -> np.ndarray:
+        start = self.path_start[self.path_of]
+        count = self.path_end[self.path_of] - start
+        r_sq = self.look_r ** 2
+
+        search = ~self.locked
+        if self.target_window is None:
+            search[:] = True
+        else:
+            # Window of target_window rows from each drone's progress, clipped to its path
+            offs = np.arange (self.target_window)
+            rows = np.minimum (self.progress[:, None] + offs, count[:, None] - 1)
+            d = self.positions[start[:, None] + rows] - self.pos[:, None, :]
+            hit = (np.einsum ('nwj,nwj->nw', d, d) <= r_sq) & (self.progress[:, None] + offs < count[:, None])
+
+            any_hit = hit.any (axis = 1)
+            last = self.target_window - 1 - np.argmax (hit[:, ::-1], axis = 1)
+            found = self.locked & any_hit
+            search |= self.locked & ~any_hit
+
+            # Hits reaching the window edge may continue past it
+            edge = found & (last == self.target_window - 1) & (self.progress + last < count - 1)
+            for i in np.flatnonzero (edge):
+                last[i] = self._extend_window (i, start[i], count[i]) - self.progress[i]
+            self.progress[found] += last[found]
+
+        for i in np.flatnonzero (search):
+            row = self._tree_target (i, r_sq)
+            if row is not None:
+                self.progress[i] = row
+                self.locked[i] = True
+
+        return self.progress
+
+    # Continue a window hit forwards, doubling the window like Drone.window_target
+    def _extend_window (self, i: int, start: int, count: int) -> int:
+        lo = int (self.progress[i])
+        hi = min (count, lo + 2 * self.target_window)
+        while True:
+            d = self.positions[start + lo:start + hi] - self.pos[i]
+            hits = np.flatnonzero (np.einsum ('ij,ij->i', d, d) <= self.look_r ** 2)
+            last = lo + int (hits[-1])
+            if last < hi - 1 or hi == count:
+                return last
+            hi = min (count, lo + 2 * (hi - lo))
+
+    def _tree_target (self, i: int, r_sq: float) -> int | None:
+        slot = int (self.path_of[i])
+        if slot not in self.trees:
+            path = self.paths[slot]
+            self.trees[slot] = (KDTree (path.positions), path.indices)
+
+        tree, indices = self.trees[slot]
+        hits = tree.search_radius (self.pos[i], r_sq ** 0.5)
+        if len (hits) == 0:
+            return None
+        return int (hits[np.argmax (indices[hits])])
+
+    # Advance every drone one control tick, returns (N, 3) target positions
+    def step (self, current_time: float) -> np.ndarray:
+        rows = self.find_targets ()
+        target = self.positions[self.path_start[self.path_of] + rows]
+
+        v_cmd = self.pid_pos.update (target - self.pos, current_time)
+        a_cmd = self.pid_vel.update (v_cmd - self.vel, current_time)
+        self.kinematics (a_cmd, current_time)
+
+        return target
+
+    def kinematics (self, accel: np.ndarray, current_time: float) -> None:
+        if (self.prev_time is None):
+            self.prev_time = current_time
+
+        dt = current_time - self.prev_time
+        self.pos += self.vel * dt + 0.5 * self.accel * dt ** 2
+        self.vel += self.accel * dt
+        self.accel = accel
+
+        self.prev_time = current_time
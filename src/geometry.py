@@ -1,13 +1,20 @@
 from abc import ABC, abstractmethod
 from typing import TypeVar, Generic
+import math
+import numpy as np
 
 
 class Locatable (ABC):
+    __slots__ = ()
+
     @abstractmethod
     def get_pos (self) -> 'Vec3D':
       pass
 
+# Scalar 3D vector, kept for API compatibility; bulk work should use PointSet
 class Vec3D (Locatable):
+    __slots__ = ('x', 'y', 'z')
+
     def __init__ (self, x, y, z):
         self.x = x
         self.y = y
@@ -59,6 +66,9 @@ class Vec3D (Locatable):
 
     def to_tuple(self):
         return (self.x, self.y, self.z)
+
+    def to_array (self) -> np.ndarray:
+        return np.array ((self.x, self.y, self.z), dtype = np.float64)
     
     def __str__(self):
         return f"({self.x}, {self.y}, {self.z})"
@@ -69,86 +79,580 @@ class Vec3D (Locatable):
             raise ValueError (f"Tuple must have exactly 3 elements, got {len(t)}")
         return cls (t[0], t[1], t[2])
 
+    @classmethod
+    def from_array (cls, a) -> 'Vec3D':
+        return cls (float (a[0]), float (a[1]), float (a[2]))
+
+
+# Coerce a single point (Vec3D, Locatable, tuple or array) to a float64 array of shape (3,)
+def as_array (point) -> np.ndarray:
+    if isinstance (point, Vec3D):
+        return np.array ((point.x, point.y, point.z), dtype = np.float64)
+    if isinstance (point, Locatable):
+        return as_array (point.get_pos ())
+    return np.asarray (point, dtype = np.float64).reshape (3)
+
+# Coerce a single point to a Vec3D
+def as_vec (point) -> Vec3D:
+    if isinstance (point, Vec3D):
+        return point
+    if isinstance (point, Locatable):
+        return point.get_pos ()
+    return Vec3D.from_array (point)
+
+# Coerce a point collection (PointSet, (N, 3) array, or list of Vec3D / Locatable)
+# to a contiguous (N, 3) float64 array. Arrays are passed through without copying.
+def as_points (points) -> np.ndarray:
+    if isinstance (points, PointSet):
+        return points.data
+    if isinstance (points, np.ndarray):
+        return np.ascontiguousarray (points, dtype = np.float64).reshape (-1, 3)
+
+    points = list (points)
+    if not points:
+        return np.empty ((0, 3), dtype = np.float64)
+    if isinstance (points[0], Locatable):
+        out = np.empty ((len (points), 3), dtype = np.float64)
+        for i, p in enumerate (points):
+            v = p.get_pos ()
+            out[i, 0] = v.x
+            out[i, 1] = v.y
+            out[i, 2] = v.z
+        return out
+    return np.asarray (points, dtype = np.float64).reshape (-1, 3)
+
+# For runs (starts[i], counts[i]) returns the run id and flat position of every element
+def expand_runs (starts: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    owner = np.repeat (np.arange (len (counts)), counts)
+    first = np.cumsum (counts) - counts
+    return owner, np.repeat (starts - first, counts) + np.arange (len (owner))
+
+
+class PointSet:
+    """Contiguous (N, 3) float64 point storage with vectorized queries.
+
+    Appends are amortized O(1); `data` is a view of the first N rows of the
+    backing buffer, so it is invalidated by the next append that grows it.
+    """
+
+    def __init__ (self, points = None, capacity: int = 16):
+        data = as_points (points) if points is not None else np.empty ((0, 3))
+        self._n: int = len (data)
+        self._buf: np.ndarray = np.empty ((max (capacity, self._n), 3), dtype = np.float64)
+        self._buf[:self._n] = data
+
+    @property
+    def data (self) -> np.ndarray:
+        return self._buf[:self._n]
+
+    def __len__ (self) -> int:
+        return self._n
+
+    def __array__ (self, dtype = None, copy = None):
+        return self.data if dtype is None else self.data.astype (dtype)
+
+    # Integer index returns a Vec3D copy, slices and index arrays return a PointSet
+    def __getitem__ (self, index):
+        if isinstance (index, (int, np.integer)):
+            return Vec3D.from_array (self.data[index])
+        return PointSet (self.data[index])
+
+    def __iter__ (self):
+        for row in self.data:
+            yield Vec3D.from_array (row)
+
+    def append (self, point) -> int:
+        if self._n == len (self._buf):
+            grown = np.empty ((max (16, 2 * len (self._buf)), 3), dtype = np.float64)
+            grown[:self._n] = self._buf[:self._n]
+            self._buf = grown
+        self._buf[self._n] = as_array (point)
+        self._n += 1
+        return self._n - 1
+
+    def extend (self, points) -> None:
+        data = as_points (points)
+        need = self._n + len (data)
+        if need > len (self._buf):
+            grown = np.empty ((max (need, 2 * len (self._buf)), 3), dtype = np.float64)
+            grown[:self._n] = self._buf[:self._n]
+            self._buf = grown
+        self._buf[self._n:need] = data
+        self._n = need
+
+    def copy (self) -> 'PointSet':
+        return PointSet (self.data.copy ())
+
+    def to_vecs (self) -> list[Vec3D]:
+        return [Vec3D (x, y, z) for x, y, z in self.data.tolist ()]
+
+    # Squared distance from every point to `point`
+    def dist_sq (self, point) -> np.ndarray:
+        d = self.data - as_array (point)
+        return np.einsum ('ij,ij->i', d, d)
+
+    def dist (self, point) -> np.ndarray:
+        return np.sqrt (self.dist_sq (point))
+
+    # Index of the point closest to `point`
+    def nearest (self, point) -> int:
+        if self._n == 0:
+            raise ValueError ("PointSet is empty")
+        return int (np.argmin (self.dist_sq (point)))
+
+    # Indices of points within `radius` of `point`
+    def within_radius (self, point, radius: float) -> np.ndarray:
+        return np.flatnonzero (self.dist_sq (point) <= radius ** 2)
+
+    # Lengths of the segments joining consecutive points
+    def segment_lengths (self) -> np.ndarray:
+        return np.linalg.norm (np.diff (self.data, axis = 0), axis = 1)
+
+    def translate (self, offset) -> 'PointSet':
+        return PointSet (self.data + as_array (offset))
+
+    def scale (self, factor) -> 'PointSet':
+        return PointSet (self.data * factor)
+
+    # Affine transform p' = M p + offset, with M a 3x3 matrix
+    def transform (self, matrix, offset = None) -> 'PointSet':
+        out = self.data @ np.asarray (matrix, dtype = np.float64).T
+        if offset is not None:
+            out += as_array (offset)
+        return PointSet (out)
+
+
+class VoxelGrid:
+    """Incremental uniform hash grid over a growing point set.
+
+    Inserts are amortized O(1); cells are halved when their mean occupancy
+    exceeds `max_occupancy`, at most `max_halvings` times, and halving backs
+    off until the point count doubles whenever it fails to spread points
+    over more cells (duplicates and tight clusters never do). Radius queries
+    only visit the cells overlapping the query ball, and nearest queries scan
+    shells of cells outwards from the query until no unvisited cell can beat
+    the best hit, falling back to a vectorized scan once that would visit
+    more cells than are occupied. Removed points keep their index but are
+    never returned again.
+    """
+
+    def __init__ (self, cell_size: float, points = None, max_occupancy: int = 8, max_halvings: int = 8):
+        self.cell_size: float = cell_size
+        self.min_cell_size: float = cell_size / 2 ** max_halvings
+        self.max_occupancy: int = max_occupancy
+        self._resize_at: int = 256      # no resize is tried below this many points
+        self.points: PointSet = PointSet ()
+        self.cells: dict[tuple[int, int, int], list[int]] = {}
+        self.removed: list[int] = []
+        self._shells: list[list[tuple[int, int, int]]] = []
+
+        if points is not None:
+            for p in as_points (points):
+                self.insert (p)
+
+    def __len__ (self) -> int:
+        return len (self.points)
+
+    def key (self, p) -> tuple[int, int, int]:
+        s = self.cell_size
+        return (math.floor (p[0] / s), math.floor (p[1] / s), math.floor (p[2] / s))
+
+    def insert (self, point) -> int:
+        p = as_array (point)
+        i = self.points.append (p)
+        self.cells.setdefault (self.key (p), []).append (i)
+
+        # Halve the cells once they get crowded, like a hash table resize
+        n = len (self.points) - len (self.removed)
+        if n > self._resize_at and n > self.max_occupancy * len (self.cells) and \
+           self.cell_size / 2 >= self.min_cell_size:
+            before = len (self.cells)
+            self.rebuild (self.cell_size / 2)
+            if len (self.cells) <= before:
+                self._resize_at = 2 * n
+        return i
+
+    # Drop point i from every later query, its index is not reused
+    def remove (self, i: int) -> None:
+        key = self.key (self.points.data[i])
+        cell = self.cells[key]
+        cell.remove (i)
+        if not cell:
+            del self.cells[key]
+        self.removed.append (i)
+
+    # Rehash every point still present into cells of a new size
+    def rebuild (self, cell_size: float) -> None:
+        self.cell_size = cell_size
+        self.cells = {}
+        keys = np.floor (self.points.data / cell_size).astype (np.int64)
+        gone = set (self.removed)
+        for i, key in enumerate (map (tuple, keys.tolist ())):
+            if i not in gone:
+                self.cells.setdefault (key, []).append (i)
+
+    # Squared distance to every point, inf for removed points and any outside `mask`
+    def _scan (self, p: np.ndarray, mask: np.ndarray | None = None) -> np.ndarray:
+        d2 = self.points.dist_sq (p)
+        if self.removed:
+            d2[self.removed] = math.inf
+        if mask is not None:
+            d2[~mask[:len (d2)]] = math.inf
+        return d2
+
+    # Cell offsets at Chebyshev distance k from the origin cell
+    def shell (self, k: int) -> list[tuple[int, int, int]]:
+        while len (self._shells) <= k:
+            n = len (self._shells)
+            r = np.arange (-n, n + 1)
+            grid = np.stack (np.meshgrid (r, r, r, indexing = 'ij'), axis = -1).reshape (-1, 3)
+            ring = grid[np.abs (grid).max (axis = 1) == n]
+            self._shells.append ([tuple (o) for o in ring.tolist ()])
+        return self._shells[k]
+
+    # Index of the point closest to `point`, among those where `mask` is set if given
+    def nearest (self, point, mask: np.ndarray | None = None) -> int:
+        if len (self.points) == len (self.removed):
+            raise ValueError ("VoxelGrid is empty")
+
+        p = as_array (point)
+        if len (self.points) <= 64:
+            return self._scan_nearest (p, mask)
+
+        kx, ky, kz = self.key (p)
+        data = self.points.data
+        best_i, best_d2 = -1, math.inf
+        visited = 0
+        k = 0
+
+        while True:
+            idx = []
+            for dx, dy, dz in self.shell (k):
+                cell = self.cells.get ((kx + dx, ky + dy, kz + dz))
+                if cell is not None:
+                    idx.extend (cell)
+
+            if idx and mask is not None:
+                idx = [i for i, ok in zip (idx, mask[idx].tolist ()) if ok]
+            if idx:
+                d = data[idx] - p
+                d2 = np.einsum ('ij,ij->i', d, d)
+                j = int (d2.argmin ())
+                if d2[j] < best_d2:
+                    best_i, best_d2 = idx[j], float (d2[j])
+
+            # Every point outside shells 0..k is at least k cells away
+            if best_i >= 0 and best_d2 <= (k * self.cell_size) ** 2:
+                return best_i
+
+            visited += len (self.shell (k))
+            k += 1
+            if visited + len (self.shell (k)) > len (self.cells):
+                return self._scan_nearest (p, mask)
+
+    def _scan_nearest (self, p: np.ndarray, mask: np.ndarray | None) -> int:
+        if not self.removed and mask is None:
+            return self.points.nearest (p)
+        d2 = self._scan (p, mask)
+        i = int (np.argmin (d2))
+        if d2[i] == math.inf:
+            raise ValueError ("No point in the VoxelGrid matches the mask")
+        return i
+
+    # Indices of points within `radius` of `point`
+    def within_radius (self, point, radius: float) -> np.ndarray:
+        p = as_array (point)
+        lo = self.key (p - radius)
+        hi = self.key (p + radius)
+
+        span = (hi[0] - lo[0] + 1) * (hi[1] - lo[1] + 1) * (hi[2] - lo[2] + 1)
+        if span > len (self.cells):
+            if self.removed:
+                return np.flatnonzero (self._scan (p) <= radius ** 2)
+            return self.points.within_radius (p, radius)
+
+        idx = []
+        for x in range (lo[0], hi[0] + 1):
+            for y in range (lo[1], hi[1] + 1):
+                for z in range (lo[2], hi[2] + 1):
+                    cell = self.cells.get ((x, y, z))
+                    if cell is not None:
+                        idx.extend (cell)
+
+        if not idx:
+            return np.empty (0, dtype = np.intp)
+        idx = np.array (idx, dtype = np.intp)
+        d = self.points.data[idx] - p
+        return idx[np.einsum ('ij,ij->i', d, d) <= radius ** 2]
+
+
+class ArrayKDTree:
+    """Static k-d tree over an (N, 3) point array, stored as flat node arrays.
+
+    Nodes split at the median of their widest axis, found with argpartition,
+    so left children hold values <= split and right children >= split. Points
+    are stored permuted so every node owns a contiguous slice. Single queries
+    walk the tree with an explicit stack; batch queries advance all
+    (query, node) pairs one level at a time in vectorized steps. Queries
+    return row indices into `points`.
+    """
+
+    def __init__ (self, points, leaf_size: int = 16):
+        self.points: np.ndarray = as_points (points)
+        self.leaf_size: int = max (1, leaf_size)
+        self.build ()
+
+    def __len__ (self) -> int:
+        return len (self.points)
+
+    def build (self) -> None:
+        n = len (self.points)
+        perm = np.arange (n)
+        start, end, axis, split, left, right = [0], [n], [-1], [0.0], [-1], [-1]
+
+        stack = [0] if n > self.leaf_size else []
+        while stack:
+            node = stack.pop ()
+            s, e = start[node], end[node]
+            idx = perm[s:e]
+            pts = self.points[idx]
+
+            ax = int (np.ptp (pts, axis = 0).argmax ())
+            mid = (e - s) // 2
+            part = np.argpartition (pts[:, ax], mid)
+            perm[s:e] = idx[part]
+            axis[node] = ax
+            split[node] = float (pts[part[mid], ax])
+
+            for child_start, child_end in ((s, s + mid), (s + mid, e)):
+                start.append (child_start)
+                end.append (child_end)
+                axis.append (-1)
+                split.append (0.0)
+                left.append (-1)
+                right.append (-1)
+                if child_end - child_start > self.leaf_size:
+                    stack.append (len (start) - 1)
+            left[node], right[node] = len (start) - 2, len (start) - 1
+
+        self.perm: np.ndarray = perm
+        self.sorted_points: np.ndarray = self.points[perm]
+
+        # Lists for the scalar query loops, arrays for the batch ones
+        self._nodes = (start, end, axis, split, left, right)
+        self.node_start, self.node_end, self.node_axis = (np.array (start), np.array (end),
+                                                          np.array (axis))
+        self.node_split = np.array (split)
+        self.node_left, self.node_right = np.array (left), np.array (right)
+
+    def query_radius (self, center, radius: float) -> np.ndarray:
+        if len (self) == 0:
+            return np.empty (0, dtype = np.intp)
+
+        q = as_array (center)
+        qs = q.tolist ()
+        r_sq = radius ** 2
+        start, end, axis, split, left, right = self._nodes
+        found = []
+
+        stack = [0]
+        while stack:
+            node = stack.pop ()
+            ax = axis[node]
+            if ax < 0:
+                s, e = start[node], end[node]
+                d = self.sorted_points[s:e] - q
+                hit = np.einsum ('ij,ij->i', d, d) <= r_sq
+                if hit.any ():
+                    found.append (self.perm[s:e][hit])
+                continue
+
+            if qs[ax] - radius <= split[node]:
+                stack.append (left[node])
+            if qs[ax] + radius >= split[node]:
+                stack.append (right[node])
+
+        return np.concatenate (found) if found else np.empty (0, dtype = np.intp)
+
+    # Indices and distances of the k nearest points, nearest first
+    def query_knn (self, point, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        k = min (k, len (self))
+        if k <= 0:
+            return np.empty (0, dtype = np.intp), np.empty (0)
+
+        q = as_array (point)
+        qs = q.tolist ()
+        start, end, axis, split, left, right = self._nodes
+        best_i = np.full (k, -1, dtype = np.intp)
+        best_d2 = np.full (k, np.inf)
+        bound = math.inf
+
+        # Entries are (node, lower bound on squared distance to anything in it)
+        stack = [(0, 0.0)]
+        while stack:
+            node, lower = stack.pop ()
+            if lower > bound:
+                continue
+
+            ax = axis[node]
+            if ax < 0:
+                s, e = start[node], end[node]
+                d = self.sorted_points[s:e] - q
+                cand_d2 = np.concatenate ((best_d2, np.einsum ('ij,ij->i', d, d)))
+                cand_i = np.concatenate ((best_i, self.perm[s:e]))
+                keep = np.argpartition (cand_d2, k - 1)[:k]
+                best_d2, best_i = cand_d2[keep], cand_i[keep]
+                bound = float (best_d2.max ())
+                continue
+
+            diff = qs[ax] - split[node]
+            near, far = (left[node], right[node]) if diff <= 0 else (right[node], left[node])
+            stack.append ((far, max (lower, diff * diff)))
+            stack.append ((near, lower))
+
+        order = np.argsort (best_d2, kind = 'stable')
+        return best_i[order], np.sqrt (best_d2[order])
+
+    def query_nearest (self, point) -> int:
+        if len (self) == 0:
+            raise ValueError ("KDTree is empty")
+        return int (self.query_knn (point, 1)[0][0])
+
+    # All (query id, point index, squared distance) pairs within per-query radii
+    def _radius_pairs (self, queries: np.ndarray, radii: np.ndarray):
+        q_id = np.arange (len (queries))
+        node = np.zeros (len (queries), dtype = np.intp)
+        leaf_q, leaf_node = [], []
+
+        while len (q_id):
+            ax = self.node_axis[node]
+            is_leaf = ax < 0
+            leaf_q.append (q_id[is_leaf])
+            leaf_node.append (node[is_leaf])
+
+            q_id, node, ax = q_id[~is_leaf], node[~is_leaf], ax[~is_leaf]
+            v = queries[q_id, ax]
+            sp = self.node_split[node]
+            go_left = v - radii[q_id] <= sp
+            go_right = v + radii[q_id] >= sp
+            q_id = np.concatenate ((q_id[go_left], q_id[go_right]))
+            node = np.concatenate ((self.node_left[node[go_left]], self.node_right[node[go_right]]))
+
+        leaf_q, leaf_node = np.concatenate (leaf_q), np.concatenate (leaf_node)
+        s = self.node_start[leaf_node]
+        run, flat = expand_runs (s, self.node_end[leaf_node] - s)
+
+        qq = leaf_q[run]
+        d = self.sorted_points[flat] - queries[qq]
+        d2 = np.einsum ('ij,ij->i', d, d)
+        hit = d2 <= radii[qq] ** 2
+        return qq[hit], self.perm[flat[hit]], d2[hit]
+
+    # Flat (query, point) index pairs within radius, radius may be a scalar or one value per query
+    def query_radius_pairs (self, centers, radius) -> tuple[np.ndarray, np.ndarray]:
+        queries = as_points (centers)
+        if len (self) == 0 or len (queries) == 0:
+            return np.empty (0, dtype = np.intp), np.empty (0, dtype = np.intp)
+
+        radii = np.broadcast_to (np.asarray (radius, dtype = np.float64), (len (queries),))
+        qq, idx, _ = self._radius_pairs (queries, radii)
+        return qq, idx
+
+    # One index array per query, radius may be a scalar or one value per query
+    def query_radius_batch (self, centers, radius) -> list[np.ndarray]:
+        queries = as_points (centers)
+        if len (self) == 0 or len (queries) == 0:
+            return [np.empty (0, dtype = np.intp) for _ in range (len (queries))]
+
+        radii = np.broadcast_to (np.asarray (radius, dtype = np.float64), (len (queries),))
+        qq, idx, _ = self._radius_pairs (queries, radii)
+        order = np.argsort (qq, kind = 'stable')
+        counts = np.bincount (qq, minlength = len (queries))
+        return np.split (idx[order], np.cumsum (counts)[:-1])
+
+    # (Q, k) indices and distances of the k nearest points to every query, nearest first
+    def query_knn_batch (self, points, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        queries = as_points (points)
+        k = min (k, len (self))
+        if k <= 0 or len (queries) == 0:
+            return (np.empty ((len (queries), 0), dtype = np.intp), np.empty ((len (queries), 0)))
+
+        # Descend each query to the smallest node on its side still holding >= k points
+        node = np.zeros (len (queries), dtype = np.intp)
+        active = np.flatnonzero (self.node_axis[node] >= 0)
+        while len (active):
+            n = node[active]
+            go_left = queries[active, self.node_axis[n]] <= self.node_split[n]
+            child = np.where (go_left, self.node_left[n], self.node_right[n])
+            deeper = self.node_end[child] - self.node_start[child] >= k
+            node[active[deeper]] = child[deeper]
+            active = active[deeper]
+            active = active[self.node_axis[node[active]] >= 0]
+
+        # The k-th distance inside that node bounds the k-th nearest distance
+        s = self.node_start[node]
+        run, flat = expand_runs (s, self.node_end[node] - s)
+        d = self.sorted_points[flat] - queries[run]
+        d2 = np.einsum ('ij,ij->i', d, d)
+        order = np.lexsort ((d2, run))
+        group_start = np.searchsorted (run[order], np.arange (len (queries)))
+        bound = np.sqrt (d2[order][group_start + k - 1]) * (1 + 1e-9)
+
+        # Everything inside the bound, sorted per query, first k kept
+        qq, idx, d2 = self._radius_pairs (queries, bound)
+        order = np.lexsort ((d2, qq))
+        qq, idx, d2 = qq[order], idx[order], d2[order]
+        take = np.searchsorted (qq, np.arange (len (queries)))[:, None] + np.arange (k)
+        return idx[take], np.sqrt (d2[take])
+
 
 T = TypeVar ('T', bound = Locatable)
 class KDTree (Generic[T]):
-    class Node:
-        def __init__ (self, items: list[T], axis = None, left = None, right = None):
-            self.items = items
-            self.axis = axis
-            self.left = left
-            self.right = right
-
-    def __init__ (self, items: list[T], leaf_size = 5, max_depth = 10):
-        self.items = items
-        self.root = self.build_tree (items, 0, leaf_size, max_depth)
-    
-    # Build KDTree
-    def build_tree (self, items, depth, leaf_size, max_depth):
-        if (len (items) < leaf_size or depth > max_depth):
-            return self.Node (items)
-          
-        axis = depth % 3
-        items.sort (key = lambda item: item.get_pos ()[axis])
-        median_val = items[len (items) // 2].get_pos ()[axis]
-
-        # Split all items into children or cur
-        left = []
-        mid = []
-        right = []
-
-        for item in items:
-            val = item.get_pos ()[axis]
-            if val < median_val:
-                left.append (item)
-            elif val > median_val:
-                right.append (item)
-            else:
-                mid.append (item)
-
-        return self.Node (
-            items = mid,
-            axis = axis,
-            left = self.build_tree (left, depth + 1, leaf_size, max_depth),
-            right = self.build_tree (right, depth + 1, leaf_size, max_depth)
-        )
+    """KD tree over Locatable items or a raw point array.
+
+    Wraps an ArrayKDTree. Built from a list of Locatables, queries return the
+    items. Built from a PointSet or (N, 3) array, queries return integer row
+    indices and no per-point objects are created.
+    """
+
+    # max_depth is accepted for older callers and ignored, median splits keep the depth at log2 (N / leaf_size)
+    def __init__ (self, items, leaf_size = 16, max_depth = None):
+        self.is_array: bool = isinstance (items, (np.ndarray, PointSet))
+        self.items = None if self.is_array else items
+        self.tree: ArrayKDTree = ArrayKDTree (as_points (items), leaf_size)
+        self.points: np.ndarray = self.tree.points
+
+    def _wrap (self, idx: np.ndarray):
+        if self.is_array:
+            return idx
+        return [self.items[i] for i in idx]
 
     def search_radius (self, center, radius):
-        found = []
-        r_sq = radius ** 2
+        return self._wrap (self.tree.query_radius (center, radius))
 
-        def recurse (node):
-            if node is None:
-                return
-            
-            # If current split items are in, return
-            for item in node.items:
-                if (item.get_pos ().dist_sq (center) <= r_sq):
-                    found.append (item)
-
-            # Exit if leaf node
-            if node.axis is None:
-                return
-
-            split_val = node.items[0].get_pos() [node.axis]
-            
-            if (center[node.axis] - radius < split_val):
-                recurse (node.left)
-            if (center[node.axis] + radius > split_val):
-                recurse (node.right)
-        
-        recurse (self.root)
-        return found
-    
-    def print_tree (self, node=None, depth=0):
-        if node is None:
-            node = self.root
+    # One result per center, radius may be a scalar or one value per center
+    def search_radius_batch (self, centers, radius) -> list:
+        return [self._wrap (idx) for idx in self.tree.query_radius_batch (centers, radius)]
 
-        print(f"Node (depth = {depth}, size = {len (node.items)})")
+    def nearest (self, point):
+        i = self.tree.query_nearest (point)
+        return i if self.is_array else self.items[i]
 
-        if node.left:
-            self.print_tree (node.left, depth + 1)
+    # k nearest, nearest first
+    def k_nearest (self, point, k: int):
+        return self._wrap (self.tree.query_knn (point, k)[0])
 
-        if node.right:
-            self.print_tree (node.right, depth + 1)
+    # (Q, k) index array, or a list of item lists when built from Locatables
+    def k_nearest_batch (self, points, k: int):
+        idx, _ = self.tree.query_knn_batch (points, k)
+        return idx if self.is_array else [self._wrap (row) for row in idx]
 
+    def print_tree (self):
+        start, end, axis, _, left, right = self.tree._nodes
+        stack = [(0, 0)]
+        while stack:
+            node, depth = stack.pop ()
+            print(f"Node (depth = {depth}, size = {end[node] - start[node]})")
+            if axis[node] >= 0:
+                stack.append ((right[node], depth + 1))
+                stack.append ((left[node], depth + 1))
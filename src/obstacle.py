@@ -1,5 +1,8 @@
-from .geometry import Vec3D, Locatable
+from .geometry import Vec3D, Locatable, as_array, as_points, expand_runs
 from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Sequence
+from itertools import accumulate
 import math
 import numpy as np
 
@@ -8,6 +11,19 @@ class Motion (ABC):
     @abstractmethod
     def position (self, t: float) -> Vec3D: ...
 
+    # (T, 3) positions at every time in `times`
+    def positions (self, times) -> np.ndarray:
+        return as_points ([self.position (t) for t in np.ravel (times).tolist ()])
+
+    # Bounding sphere (center, radius) of every position the motion can reach
+    @abstractmethod
+    def sweep (self) -> tuple[np.ndarray, float]: ...
+
+    # Upper bound on speed, for how far the center can drift in a time window
+    @property
+    @abstractmethod
+    def max_speed (self) -> float: ...
+
 
 class LinearMotion (Motion):
     """Moves along a polyline at a fixed speed, bouncing or cycling."""
@@ -21,22 +37,53 @@ class LinearMotion (Motion):
         self.lengths  = [a.dist (b) for a, b in self.segments]
         self.total    = sum (self.lengths)
 
-    def position (self, t: float) -> Vec3D:
+        # Distance along the polyline to each point
+        self.cumulative = list (accumulate (self.lengths, initial = 0.0))
+
+    # Distance along the polyline at time t, as a float or an array matching t
+    def distance (self, t):
         if self.loop == 'bounce':
             period = 2 * self.total / self.speed
             d = (t % period) * self.speed
-            if d > self.total:
-                d = 2 * self.total - d
-        else:  # cycle
-            d = (t * self.speed) % self.total
+            if np.ndim (d):
+                return np.where (d > self.total, 2 * self.total - d, d)
+            return 2 * self.total - d if d > self.total else d
+        return (t * self.speed) % self.total  # cycle
 
-        for (a, b), length in zip (self.segments, self.lengths):
-            if d <= length:
-                alpha = d / length if length > 0 else 0
-                return a + (b - a) * alpha
-            d -= length
+    def position (self, t: float) -> Vec3D:
+        d = self.distance (t)
+        if len (self.segments) == 0 or d > self.total:
+            return self.points[-1]
 
-        return self.points[-1]
+        # First segment whose end is at least d along
+        j = bisect_left (self.cumulative, d, 1, len (self.points) - 1)
+        a, b = self.segments[j - 1]
+        length = self.lengths[j - 1]
+        alpha = (d - self.cumulative[j - 1]) / length if length > 0 else 0
+        return a + (b - a) * alpha
+
+    def positions (self, times) -> np.ndarray:
+        pts = as_points (self.points)
+        d = self.distance (np.asarray (times, dtype = np.float64).ravel ())
+        if len (self.segments) == 0:
+            return np.repeat (pts[-1:], len (d), axis = 0)
+
+        cum = np.asarray (self.cumulative)
+        j = np.clip (np.searchsorted (cum, d, side = 'left'), 1, len (pts) - 1)
+        length = cum[j] - cum[j - 1]
+        alpha = np.where (length > 0, (d - cum[j - 1]) / np.where (length > 0, length, 1.0), 0.0)
+        out = pts[j - 1] + (pts[j] - pts[j - 1]) * alpha[:, None]
+        out[d > self.total] = pts[-1]
+        return out
+
+    def sweep (self) -> tuple[np.ndarray, float]:
+        pts = as_points (self.points)
+        center = 0.5 * (pts.min (axis = 0) + pts.max (axis = 0))
+        return center, float (np.sqrt (((pts - center) ** 2).sum (axis = 1).max ()))
+
+    @property
+    def max_speed (self) -> float:
+        return abs (self.speed)
 
 
 class CircularMotion (Motion):
@@ -46,6 +93,7 @@ class CircularMotion (Motion):
                   axis: list[float], speed: float = 1.0, phase: float = 0.0):
         self.orbit_center  = orbit_center
         self.orbit_radius  = orbit_radius
+        self.axis          = list (axis)
         self.speed         = speed
         self.phase         = phase
 
@@ -58,14 +106,35 @@ class CircularMotion (Motion):
         self.u = u
         self.v = np.cross (ax, u)
 
+        # Plain floats, so single positions need no NumPy temporaries
+        self._center = self.orbit_center.to_tuple ()
+        self._u, self._v = self.u.tolist (), self.v.tolist ()
+
     def position (self, t: float) -> Vec3D:
-        angle  = t * self.speed + self.phase
-        offset = self.orbit_radius * (math.cos (angle) * self.u + math.sin (angle) * self.v)
-        return Vec3D (
-            self.orbit_center.x + float (offset[0]),
-            self.orbit_center.y + float (offset[1]),
-            self.orbit_center.z + float (offset[2]),
-        )
+        angle = t * self.speed + self.phase
+        c, s, r = math.cos (angle), math.sin (angle), self.orbit_radius
+        return Vec3D (*(o + r * (c * u + s * v) for o, u, v in zip (self._center, self._u, self._v)))
+
+    def positions (self, times) -> np.ndarray:
+        angle = np.asarray (times, dtype = np.float64).ravel () * self.speed + self.phase
+        offset = self.orbit_radius * (np.cos (angle)[:, None] * self.u + np.sin (angle)[:, None] * self.v)
+        return as_array (self.orbit_center) + offset
+
+    def sweep (self) -> tuple[np.ndarray, float]:
+        return as_array (self.orbit_center), self.orbit_radius
+
+    @property
+    def max_speed (self) -> float:
+        return abs (self.speed) * self.orbit_radius
+
+
+# CircularMotion's rotation plane basis (u, v) for each of (K, 3) axes
+def orbit_basis (axes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    ax  = axes / np.linalg.norm (axes, axis = 1, keepdims = True)
+    ref = np.where ((np.abs (ax[:, 0]) < 0.9)[:, None], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0])
+    u   = ref - np.einsum ('ij,ij->i', ref, ax)[:, None] * ax
+    u  /= np.linalg.norm (u, axis = 1, keepdims = True)
+    return u, np.cross (ax, u)
 
 
 class Obstacle (Locatable):
@@ -82,5 +151,582 @@ class Obstacle (Locatable):
     def intersects_point (self, point: Vec3D) -> bool:
         return self.center.dist_sq (point) <= self.radius_sq
 
+    def intersects_segment (self, a: Vec3D, b: Vec3D) -> bool:
+        return segment_intersects_spheres (a, b, as_points ([self.center]), np.array ([self.radius]))
+
     def get_pos (self) -> Vec3D:
         return self.center
+
+
+# Packs obstacle centers and radii into (K, 3) and (K,) arrays
+def obstacle_arrays (obstacles: list[Obstacle]) -> tuple[np.ndarray, np.ndarray]:
+    if isinstance (obstacles, ObstacleTable):
+        return obstacles.centers.copy (), np.array (obstacles.radii, dtype = np.float64)
+    centers = as_points ([obs.center for obs in obstacles])
+    radii   = np.array ([obs.radius for obs in obstacles], dtype = np.float64)
+    return centers, radii
+
+
+class ObstacleTable (Sequence):
+    """Obstacles stored as flat arrays, built into Obstacle objects only when indexed.
+
+    Row i is static (kind 0), a LinearMotion (kind 1) over
+    line_points[line_start[i]:line_start[i] + line_count[i]], or a
+    CircularMotion (kind 2). The arrays may be read-only views into a
+    memory-mapped file, so a table opens without touching every obstacle.
+    `grid` optionally carries a prebuilt ObstacleField broadphase for the
+    stored centers.
+    """
+
+    KINDS = {None: 0, LinearMotion: 1, CircularMotion: 2}
+    LOOPS = ['bounce', 'cycle']
+
+    def __init__ (self, arrays: dict[str, np.ndarray], grid: dict | None = None):
+        self.arrays = arrays
+        self.grid = grid
+        self.centers: np.ndarray = arrays['centers']
+        self.radii: np.ndarray = arrays['radii']
+        self.kind: np.ndarray = arrays['kind']
+        self._built: dict[int, Obstacle] = {}
+
+    @classmethod
+    def from_obstacles (cls, obstacles: list[Obstacle]) -> 'ObstacleTable':
+        k = len (obstacles)
+        centers, radii = obstacle_arrays (obstacles)
+        arrays = {
+            'centers':      centers,
+            'radii':        radii,
+            'kind':         np.zeros (k, dtype = np.int8),
+            'speed':        np.zeros (k),
+            'loop':         np.zeros (k, dtype = np.int8),
+            'line_start':   np.zeros (k, dtype = np.int64),
+            'line_count':   np.zeros (k, dtype = np.int64),
+            'orbit_center': np.zeros ((k, 3)),
+            'orbit_radius': np.zeros (k),
+            'axis':         np.zeros ((k, 3)),
+            'phase':        np.zeros (k),
+        }
+        line_points = []
+        for i, obs in enumerate (obstacles):
+            m = obs.motion
+            arrays['kind'][i] = cls.KINDS[type (m) if m is not None else None]
+            if isinstance (m, LinearMotion):
+                arrays['speed'][i] = m.speed
+                arrays['loop'][i] = cls.LOOPS.index (m.loop)
+                arrays['line_start'][i] = len (line_points)
+                arrays['line_count'][i] = len (m.points)
+                line_points.extend (m.points)
+            elif isinstance (m, CircularMotion):
+                arrays['speed'][i] = m.speed
+                arrays['orbit_center'][i] = as_array (m.orbit_center)
+                arrays['orbit_radius'][i] = m.orbit_radius
+                arrays['axis'][i] = m.axis
+                arrays['phase'][i] = m.phase
+        arrays['line_points'] = as_points (line_points) if line_points else np.empty ((0, 3))
+        return cls (arrays)
+
+    def __len__ (self) -> int:
+        return len (self.radii)
+
+    def __getitem__ (self, i):
+        if isinstance (i, slice):
+            return [self[j] for j in range (*i.indices (len (self)))]
+        i = int (i)
+        if i < 0:
+            i += len (self)
+        if i not in self._built:
+            self._built[i] = self._build (i)
+        return self._built[i]
+
+    def _build (self, i: int) -> Obstacle:
+        a = self.arrays
+        kind = int (self.kind[i])
+        if kind == 1:
+            s, n = int (a['line_start'][i]), int (a['line_count'][i])
+            motion = LinearMotion ([Vec3D (*p) for p in a['line_points'][s:s + n].tolist ()],
+                                   speed = float (a['speed'][i]), loop = self.LOOPS[int (a['loop'][i])])
+        elif kind == 2:
+            motion = CircularMotion (Vec3D (*a['orbit_center'][i].tolist ()), float (a['orbit_radius'][i]),
+                                     a['axis'][i].tolist (), speed = float (a['speed'][i]),
+                                     phase = float (a['phase'][i]))
+        else:
+            motion = None
+        return Obstacle (Vec3D (*self.centers[i].tolist ()), float (self.radii[i]), motion)
+
+    # Rows with a motion
+    @property
+    def moving (self) -> np.ndarray:
+        return np.flatnonzero (self.kind != 0)
+
+
+class MotionTable:
+    """Motions of many obstacles evaluated together, straight from ObstacleTable arrays.
+
+    Row i follows table row `rows[i]`, every moving row by default. A batch of
+    (row, time) queries costs a few array passes: linear rows find their
+    segment by a binary search over each polyline's cumulative lengths, run
+    for all queries in lockstep, and circular rows use vectorized trig.
+    Static rows stay at their stored center.
+    """
+
+    def __init__ (self, table: ObstacleTable, rows: np.ndarray | None = None):
+        a = table.arrays
+        self.rows: np.ndarray = table.moving if rows is None else np.asarray (rows, dtype = np.intp)
+        r = self.rows
+
+        self.kind: np.ndarray = np.asarray (table.kind[r])
+        self.centers: np.ndarray = np.array (table.centers[r], dtype = np.float64)
+        self.speed: np.ndarray = np.array (a['speed'][r], dtype = np.float64)
+
+        # Linear rows
+        self.bounce: np.ndarray = a['loop'][r] == ObstacleTable.LOOPS.index ('bounce')
+        self.line_start: np.ndarray = a['line_start'][r].astype (np.intp)
+        self.line_count: np.ndarray = a['line_count'][r].astype (np.intp)
+        self.line_points: np.ndarray = np.asarray (a['line_points'], dtype = np.float64)
+
+        # Distance along its own polyline to each point, summed in order like LinearMotion.cumulative
+        lin = self.kind == 1
+        s, n = self.line_start[lin], self.line_count[lin]
+        self.line_cum: np.ndarray = np.zeros (len (self.line_points))
+        for k in range (1, int (n.max (initial = 1))):
+            i = s[n > k] + k
+            self.line_cum[i] = self.line_cum[i - 1] + np.linalg.norm (self.line_points[i] - self.line_points[i - 1],
+                                                                       axis = 1)
+        self.total: np.ndarray = np.zeros (len (r))
+        self.total[lin] = np.where (n > 0, self.line_cum[s + np.maximum (n, 1) - 1], 0.0)
+
+        # Circular rows
+        circ = self.kind == 2
+        self.orbit_center: np.ndarray = np.array (a['orbit_center'][r], dtype = np.float64)
+        self.orbit_radius: np.ndarray = np.array (a['orbit_radius'][r], dtype = np.float64)
+        self.phase: np.ndarray = np.array (a['phase'][r], dtype = np.float64)
+        self.u, self.v = np.zeros ((len (r), 3)), np.zeros ((len (r), 3))
+        if circ.any ():
+            self.u[circ], self.v[circ] = orbit_basis (np.asarray (a['axis'][r][circ], dtype = np.float64))
+
+        self.linear_rows: np.ndarray = np.flatnonzero (lin)
+        self.circular_rows: np.ndarray = np.flatnonzero (circ)
+
+        # Same bounds as Motion.max_speed
+        self.max_speed: np.ndarray = np.where (circ, np.abs (self.speed) * self.orbit_radius,
+                                               np.where (lin, np.abs (self.speed), 0.0))
+
+    def __len__ (self) -> int:
+        return len (self.rows)
+
+    def locate (self, ids, times) -> np.ndarray:
+        """Positions of rows `ids` at `times`, broadcast against each other, as (..., 3)."""
+        ids, times = np.broadcast_arrays (np.asarray (ids, dtype = np.intp), np.asarray (times, dtype = np.float64))
+        shape = ids.shape
+        ids, times = ids.ravel (), times.ravel ()
+
+        out = self.centers[ids]
+        kind = self.kind[ids]
+        lin = np.flatnonzero (kind == 1)
+        if len (lin):
+            out[lin] = self._linear (ids[lin], times[lin])
+        circ = np.flatnonzero (kind == 2)
+        if len (circ):
+            out[circ] = self._circular (ids[circ], times[circ])
+        return out.reshape (*shape, 3)
+
+    # (M, 3) position of every row at time t
+    def at (self, t: float) -> np.ndarray:
+        out = self.centers.copy ()
+        if len (self.linear_rows):
+            out[self.linear_rows] = self._linear (self.linear_rows, np.full (len (self.linear_rows), float (t)))
+        if len (self.circular_rows):
+            out[self.circular_rows] = self._circular (self.circular_rows,
+                                                      np.full (len (self.circular_rows), float (t)))
+        return out
+
+    # (T, M, 3) position of every row at every time
+    def positions (self, times) -> np.ndarray:
+        times = np.asarray (times, dtype = np.float64).ravel ()
+        return self.locate (np.arange (len (self))[None, :], times[:, None])
+
+    # Positions sampled every dt from t0 through t0 + horizon
+    def trajectory (self, horizon: float, dt: float, t0: float = 0.0) -> 'Trajectory':
+        times = t0 + dt * np.arange (math.ceil (horizon / dt - 1e-9) + 1)
+        return Trajectory (times, self.positions (times))
+
+    # Bounding spheres (centers (M, 3), radii (M,)) of every position each row can reach, like Motion.sweep
+    def sweep (self) -> tuple[np.ndarray, np.ndarray]:
+        centers, radii = self.centers.copy (), np.zeros (len (self))
+
+        lin = np.flatnonzero ((self.kind == 1) & (self.line_count > 0))
+        if len (lin):
+            run, flat = expand_runs (self.line_start[lin], self.line_count[lin])
+            pts = self.line_points[flat]
+            lo = np.full ((len (lin), 3), np.inf)
+            hi = np.full ((len (lin), 3), -np.inf)
+            np.minimum.at (lo, run, pts)
+            np.maximum.at (hi, run, pts)
+            centers[lin] = 0.5 * (lo + hi)
+            far = np.zeros (len (lin))
+            np.maximum.at (far, run, ((pts - centers[lin][run]) ** 2).sum (axis = 1))
+            radii[lin] = np.sqrt (far)
+
+        circ = self.kind == 2
+        centers[circ] = self.orbit_center[circ]
+        radii[circ] = self.orbit_radius[circ]
+        return centers, radii
+
+    def _linear (self, ids: np.ndarray, t: np.ndarray) -> np.ndarray:
+        total, speed = self.total[ids], self.speed[ids]
+        with np.errstate (divide = 'ignore', invalid = 'ignore'):
+            back = (t % (2 * total / speed)) * speed
+            d = np.where (self.bounce[ids], np.where (back > total, 2 * total - back, back), (t * speed) % total)
+        d = np.where (total > 0, d, 0.0)
+
+        # First point k in [1, n - 1] at least d along its polyline
+        s, n = self.line_start[ids], self.line_count[ids]
+        cum, pts, last = self.line_cum, self.line_points, len (self.line_points) - 1
+        lo, hi = np.ones_like (s), np.maximum (n - 1, 1)
+        for _ in range (int (self.line_count.max (initial = 1)).bit_length ()):
+            mid = (lo + hi) // 2
+            go = cum[np.minimum (s + mid, last)] >= d
+            active = lo < hi
+            hi = np.where (active & go, mid, hi)
+            lo = np.where (active & ~go, mid + 1, lo)
+
+        j = np.minimum (s + lo, last)
+        length = cum[j] - cum[j - 1]
+        alpha = np.where (length > 0, (d - cum[j - 1]) / np.where (length > 0, length, 1.0), 0.0)
+        out = pts[j - 1] + (pts[j] - pts[j - 1]) * alpha[:, None]
+
+        # Past the end, or a single point, sits on the last point
+        end = (n <= 1) | (d > total)
+        out[end] = pts[(s + np.maximum (n, 1) - 1)[end]]
+        return out
+
+    def _circular (self, ids: np.ndarray, t: np.ndarray) -> np.ndarray:
+        angle = t * self.speed[ids] + self.phase[ids]
+        offset = self.orbit_radius[ids, None] * (np.cos (angle)[:, None] * self.u[ids] +
+                                                 np.sin (angle)[:, None] * self.v[ids])
+        return self.orbit_center[ids] + offset
+
+
+class Trajectory:
+    """MotionTable positions precomputed on a fixed time grid.
+
+    positions[i, k] is row k at times[i]. Lookups interpolate linearly between
+    samples, which stays within max_speed * dt of the exact position, and
+    clamp to the ends of the sampled horizon.
+    """
+
+    def __init__ (self, times: np.ndarray, positions: np.ndarray):
+        self.times: np.ndarray = times
+        self.positions: np.ndarray = positions
+        self.dt: float = float (times[1] - times[0]) if len (times) > 1 else 1.0
+
+    def __len__ (self) -> int:
+        return self.positions.shape[1]
+
+    def locate (self, ids, times) -> np.ndarray:
+        """Interpolated positions of rows `ids` at `times`, broadcast against each other, as (..., 3)."""
+        ids, times = np.broadcast_arrays (np.asarray (ids, dtype = np.intp), np.asarray (times, dtype = np.float64))
+        f = np.clip ((times - self.times[0]) / self.dt, 0, len (self.times) - 1)
+        i = np.minimum (f.astype (np.intp), max (len (self.times) - 2, 0))
+        w = (f - i)[..., None]
+        j = np.minimum (i + 1, len (self.times) - 1)
+        return (1 - w) * self.positions[i, ids] + w * self.positions[j, ids]
+
+    def at (self, t: float) -> np.ndarray:
+        return self.locate (np.arange (len (self)), t)
+
+# Exact test of M segments against K spheres, returns (M,) bool
+# Either end may be a single point, which is broadcast against the other
+def segments_intersect_spheres (starts, ends, centers: np.ndarray, radii: np.ndarray,
+                                chunk: int = 1 << 20) -> np.ndarray:
+    a, b = np.broadcast_arrays (as_points (starts), as_points (ends))
+    if len (centers) == 0:
+        return np.zeros (len (a), dtype = bool)
+
+    # Bound the (M, K, 3) temporaries
+    rows = max (1, chunk // len (centers))
+    if len (a) > rows:
+        return np.concatenate ([segments_intersect_spheres (a[i:i + rows], b[i:i + rows], centers, radii, chunk)
+                                for i in range (0, len (a), rows)])
+
+    # Closest point on each segment to each center, clamped to the segment
+    d  = b - a
+    dd = np.einsum ('ij,ij->i', d, d)
+    f  = centers[None, :, :] - a[:, None, :]
+    t  = np.einsum ('mkj,mj->mk', f, d) / np.where (dd > 0, dd, 1.0)[:, None]
+    np.clip (t, 0.0, 1.0, out = t)
+
+    gap = f - t[..., None] * d[:, None, :]
+    return (np.einsum ('mkj,mkj->mk', gap, gap) <= radii ** 2).any (axis = 1)
+
+# Exact test of one segment against K spheres
+def segment_intersects_spheres (a, b, centers: np.ndarray, radii: np.ndarray) -> bool:
+    if len (centers) == 0:
+        return False
+
+    a = as_array (a)
+    d = as_array (b) - a
+    dd = d @ d
+    f = centers - a
+    t = np.clip (f @ d / dd, 0.0, 1.0) if dd > 0 else np.zeros (len (centers))
+
+    gap = f - t[:, None] * d
+    return bool ((np.einsum ('kj,kj->k', gap, gap) <= radii ** 2).any ())
+
+
+# Pairwise test of segments a[i] -> b[i] against spheres (centers[i], radii[i]), returns (M,) bool
+def segment_sphere_pairs (a: np.ndarray, b: np.ndarray, centers: np.ndarray, radii: np.ndarray) -> np.ndarray:
+    d  = b - a
+    dd = np.einsum ('ij,ij->i', d, d)
+    f  = centers - a
+    t  = np.clip (np.einsum ('ij,ij->i', f, d) / np.where (dd > 0, dd, 1.0), 0.0, 1.0)
+
+    gap = f - t[:, None] * d
+    return np.einsum ('ij,ij->i', gap, gap) <= radii ** 2
+
+
+# Cell coordinates are packed 21 bits per axis into one int64 hash
+_KEY_OFFSET = 1 << 20
+
+def _pack_cells (cells: np.ndarray) -> np.ndarray:
+    c = np.clip (cells, -_KEY_OFFSET, _KEY_OFFSET - 1) + _KEY_OFFSET
+    return (c[..., 0] << 42) | (c[..., 1] << 21) | c[..., 2]
+
+def _pack_cell (x: int, y: int, z: int) -> int:
+    x, y, z = (min (max (v, -_KEY_OFFSET), _KEY_OFFSET - 1) + _KEY_OFFSET for v in (x, y, z))
+    return (x << 42) | (y << 21) | z
+
+# Packed keys of every cell in the boxes [lo[i], hi[i]], with the owning box id
+def _box_cells (lo: np.ndarray, hi: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    ext = hi - lo + 1
+    owner, local = expand_runs (np.zeros (len (ext), dtype = np.intp), ext.prod (axis = 1))
+    ey, ez = ext[owner, 1], ext[owner, 2]
+    offset = np.stack ((local // (ey * ez), (local // ez) % ey, local % ez), axis = 1)
+    return _pack_cells (lo[owner] + offset), owner
+
+
+class ObstacleField:
+    """Uniform-grid broadphase over spherical obstacles.
+
+    Each sphere is binned into every cell its bounding box overlaps, stored as
+    a sorted key array (CSR layout) so batches of point and segment queries
+    are resolved with searchsorted and only test nearby spheres. `update`
+    moves every obstacle in one MotionTable pass and `refit` re-reads the
+    centers of moving obstacles; both only rebuild the grid when one of them
+    has crossed into a different range of cells.
+    """
+
+    # Below this many obstacles a brute force test beats the grid lookup
+    brute_force_below: int = 32
+
+    # Below this many moving obstacles, updating each Obstacle beats one MotionTable pass
+    per_object_below: int = 32
+
+    def __init__ (self, obstacles: list[Obstacle], cell_size: float | None = None):
+        self.obstacles: list[Obstacle] | None = obstacles
+        centers, radii = obstacle_arrays (obstacles)
+
+        if isinstance (obstacles, ObstacleTable):
+            self.moving: np.ndarray = obstacles.moving
+            self.motions: MotionTable | None = MotionTable (obstacles, self.moving)
+            # Rows built after an update start where the field has moved them
+            obstacles.centers = centers
+            grid = obstacles.grid
+            if grid is not None and cell_size in (None, grid['cell_size']):
+                # Reuse the table's broadphase instead of building it again
+                self.centers, self.radii = centers, radii
+                self.cell_size = grid['cell_size']
+                self.lo, self.hi = grid['lo'], grid['hi']
+                self.items, self.cell_keys = grid['items'], grid['cell_keys']
+                self.cell_start, self.cell_end = grid['cell_start'], grid['cell_end']
+                return
+        else:
+            self.moving = np.array ([i for i, obs in enumerate (obstacles)
+                                     if obs.motion is not None], dtype = np.intp)
+            # Motions the table can't hold are moved one object at a time
+            known = all (type (obstacles[i].motion) in ObstacleTable.KINDS for i in self.moving.tolist ())
+            self.motions = (MotionTable (ObstacleTable.from_obstacles ([obstacles[i] for i in self.moving]))
+                            if known and len (self.moving) else None)
+        self._init_arrays (centers, radii, cell_size)
+
+    @classmethod
+    def from_arrays (cls, centers, radii, cell_size: float | None = None) -> 'ObstacleField':
+        field = cls.__new__ (cls)
+        field.obstacles = None
+        field.moving = np.empty (0, dtype = np.intp)
+        field.motions = None
+        field._init_arrays (as_points (centers).copy (),
+                            np.asarray (radii, dtype = np.float64).copy (), cell_size)
+        return field
+
+    def _init_arrays (self, centers: np.ndarray, radii: np.ndarray, cell_size: float | None) -> None:
+        self.centers: np.ndarray = centers
+        self.radii:   np.ndarray = radii
+        if cell_size is None:
+            cell_size = 2 * float (np.median (radii)) if len (radii) else 1.0
+        self.cell_size: float = max (cell_size, 1e-9)
+        self.rebuild ()
+
+    def __len__ (self) -> int:
+        return len (self.radii)
+
+    # Broadphase arrays, enough to restore the grid through ObstacleTable.grid
+    def grid_arrays (self) -> dict:
+        return {'cell_size': self.cell_size, 'lo': self.lo, 'hi': self.hi, 'items': self.items,
+                'cell_keys': self.cell_keys, 'cell_start': self.cell_start, 'cell_end': self.cell_end}
+
+    # Static copy of the current state, safe to hand to a planner while obstacles keep moving
+    def snapshot (self) -> 'ObstacleField':
+        return ObstacleField.from_arrays (self.centers, self.radii, self.cell_size)
+
+    def cell_range (self, centers: np.ndarray, radii) -> tuple[np.ndarray, np.ndarray]:
+        r  = np.asarray (radii, dtype = np.float64).reshape (-1, 1)
+        lo = np.floor ((centers - r) / self.cell_size).astype (np.int64)
+        hi = np.floor ((centers + r) / self.cell_size).astype (np.int64)
+        return lo, hi
+
+    def rebuild (self) -> None:
+        self.lo, self.hi = self.cell_range (self.centers, self.radii)
+        keys, owner = _box_cells (self.lo, self.hi)
+
+        order = np.argsort (keys, kind = 'stable')
+        self.items: np.ndarray = owner[order]
+        self.cell_keys, self.cell_start = np.unique (keys[order], return_index = True)
+        self.cell_end: np.ndarray = np.append (self.cell_start[1:], len (order))
+
+    # Re-read moving obstacle centers, rebuilding only if one changed cells
+    def refit (self) -> None:
+        if len (self.moving) == 0:
+            return
+
+        self.centers[self.moving] = as_points ([self.obstacles[i].center for i in self.moving])
+        self._refit_cells ()
+
+    def _refit_cells (self) -> None:
+        lo, hi = self.cell_range (self.centers[self.moving], self.radii[self.moving])
+        if (lo != self.lo[self.moving]).any () or (hi != self.hi[self.moving]).any ():
+            self.rebuild ()
+
+    # Move every obstacle to time t and refit
+    def update (self, t: float) -> None:
+        if len (self.moving) == 0:
+            return
+        if self.motions is None or len (self.moving) < self.per_object_below:
+            for i in self.moving:
+                self.obstacles[i].update (t)
+            self.refit ()
+            return
+
+        # All motions in one batch, then only the Obstacle objects that exist are moved to match
+        self.centers[self.moving] = self.motions.at (t)
+        self._refit_cells ()
+
+        if isinstance (self.obstacles, ObstacleTable):
+            built = [i for i in self.obstacles._built if self.obstacles.kind[i] != 0]
+        else:
+            built = self.moving.tolist ()
+        for i, c in zip (built, self.centers[built].tolist ()):
+            self.obstacles[i].center = Vec3D (*c)
+
+    # Candidate (query id, obstacle id) pairs for queries covering the given packed cell keys
+    def _candidates (self, keys: np.ndarray, query: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        pos = np.minimum (np.searchsorted (self.cell_keys, keys), len (self.cell_keys) - 1)
+        hit = self.cell_keys[pos] == keys
+        start = self.cell_start[pos]
+        count = np.where (hit, self.cell_end[pos] - start, 0)
+
+        run, flat = expand_runs (start, count)
+        return query[run], self.items[flat]
+
+    # (N,) bool, whether each point lies inside any obstacle
+    def points_obstructed (self, points) -> np.ndarray:
+        p = as_points (points)
+        out = np.zeros (len (p), dtype = bool)
+        if len (self) == 0 or len (p) == 0:
+            return out
+
+        if len (self) < self.brute_force_below:
+            d = p[:, None, :] - self.centers[None, :, :]
+            return (np.einsum ('nkj,nkj->nk', d, d) <= self.radii ** 2).any (axis = 1)
+
+        keys = _pack_cells (np.floor (p / self.cell_size).astype (np.int64))
+        qi, obs = self._candidates (keys, np.arange (len (p)))
+        d = p[qi] - self.centers[obs]
+        inside = np.einsum ('ij,ij->i', d, d) <= self.radii[obs] ** 2
+        out[qi[inside]] = True
+        return out
+
+    # Obstacle ids binned in any cell of the box [lo, hi], None if the box is too large to be worth it
+    def _box_items (self, lo: list[int], hi: list[int]) -> np.ndarray | None:
+        if (hi[0] - lo[0] + 1) * (hi[1] - lo[1] + 1) * (hi[2] - lo[2] + 1) > len (self.cell_keys):
+            return None
+
+        keys = [_pack_cell (x, y, z)
+                for x in range (lo[0], hi[0] + 1)
+                for y in range (lo[1], hi[1] + 1)
+                for z in range (lo[2], hi[2] + 1)]
+        pos = np.searchsorted (self.cell_keys, keys).tolist ()
+
+        found = [self.items[self.cell_start[p]:self.cell_end[p]]
+                 for key, p in zip (keys, pos)
+                 if p < len (self.cell_keys) and self.cell_keys[p] == key]
+        if not found:
+            return np.empty (0, dtype = np.intp)
+        return found[0] if len (found) == 1 else np.unique (np.concatenate (found))
+
+    def point_is_obstructed (self, point) -> bool:
+        p = as_array (point)
+        if len (self) < self.brute_force_below:
+            obs = slice (None)
+        else:
+            cell = [math.floor (v / self.cell_size) for v in p.tolist ()]
+            obs = self._box_items (cell, cell)
+
+        d = self.centers[obs] - p
+        return bool ((np.einsum ('kj,kj->k', d, d) <= self.radii[obs] ** 2).any ())
+
+    # (M,) bool, whether each segment starts[i] -> ends[i] hits any obstacle
+    # Either end may be a single point, which is broadcast against the other
+    def segments_obstructed (self, starts, ends) -> np.ndarray:
+        a, b = np.broadcast_arrays (as_points (starts), as_points (ends))
+        out = np.zeros (len (a), dtype = bool)
+        if len (self) == 0 or len (a) == 0:
+            return out
+
+        if len (self) < self.brute_force_below:
+            return segments_intersect_spheres (a, b, self.centers, self.radii)
+
+        lo, hi = self.cell_range (np.minimum (a, b), 0)
+        hi = np.maximum (hi, np.floor (np.maximum (a, b) / self.cell_size).astype (np.int64))
+        span = (hi - lo + 1).prod (axis = 1)
+
+        # Segments covering more cells than are occupied are cheaper to brute force
+        far = span > len (self.cell_keys)
+        if far.any ():
+            out[far] = segments_intersect_spheres (a[far], b[far], self.centers, self.radii)
+
+        near = np.flatnonzero (~far)
+        if len (near):
+            keys, box = _box_cells (lo[near], hi[near])
+            seg, obs = self._candidates (keys, near[box])
+
+            # A sphere spanning several of a segment's cells is only tested once
+            pair = np.unique (seg * len (self) + obs)
+            seg, obs = pair // len (self), pair % len (self)
+            hit = segment_sphere_pairs (a[seg], b[seg], self.centers[obs], self.radii[obs])
+            out[seg[hit]] = True
+
+        return out
+
+    def segment_is_obstructed (self, a, b) -> bool:
+        a, b = as_array (a), as_array (b)
+        obs = None
+        if len (self) >= self.brute_force_below:
+            s = self.cell_size
+            lo = [math.floor (min (u, v) / s) for u, v in zip (a.tolist (), b.tolist ())]
+            hi = [math.floor (max (u, v) / s) for u, v in zip (a.tolist (), b.tolist ())]
+            obs = self._box_items (lo, hi)
+
+        if obs is None:
+            return segment_intersects_spheres (a, b, self.centers, self.radii)
+        return segment_intersects_spheres (a, b, self.centers[obs], self.radii[obs])
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import os
+import numpy as np
+from .geometry import as_array, as_points
+
+
+# Bump when planner or sampler changes would make stored paths stale
+CACHE_VERSION = 1
+
+
+def plan_key (kind: str, *parts) -> str:
+    """Hex digest over every input of a plan.
+
+    Arrays and points are hashed by their float64 bytes, so any change to an
+    endpoint, obstacle, bound or parameter gives a different key.
+    """
+    h = hashlib.sha256 (f'{kind}:{CACHE_VERSION}'.encode ())
+    for part in parts:
+        if isinstance (part, np.ndarray) or hasattr (part, 'to_array'):
+            a = np.ascontiguousarray (as_array (part) if hasattr (part, 'to_array') else part,
+                                      dtype = np.float64)
+            h.update (b'a' + str (a.shape).encode () + a.tobytes ())
+        else:
+            h.update (b'v' + repr (part).encode ())
+        h.update (b'|')
+    return h.hexdigest ()
+
+
+class PlanCache:
+    """Planned waypoint positions keyed by plan_key.
+
+    An in-memory LRU of up to `capacity` entries sits in front of an optional
+    directory of .npy files that survives restarts. Disk hits are promoted
+    into memory and writes go to both tiers; files are written to a temporary
+    name and renamed so a crash never leaves a partial entry. The directory
+    holds at most `max_files` entries, dropping the least recently used by
+    mtime, or grows until `clear` with max_files None. Returned arrays are
+    read-only since every caller holding a key shares them.
+    """
+
+    def __init__ (self, capacity: int = 128, directory: str | os.PathLike | None = None,
+                  max_files: int | None = 4096):
+        self.capacity = capacity
+        self.max_files = max_files
+        self.memory: OrderedDict[str, np.ndarray] = OrderedDict ()
+        self.directory = Path (directory) if directory is not None else None
+        self.files = 0
+        if self.directory is not None:
+            self.directory.mkdir (parents = True, exist_ok = True)
+            self.files = len (self._entries ())
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__ (self) -> int:
+        return len (self.memory)
+
+    def _file (self, key: str) -> Path:
+        return self.directory / f'{key}.npy'
+
+    # Stored entries, skipping files other processes are still writing
+    def _entries (self) -> list[Path]:
+        return [f for f in self.directory.glob ('*.npy') if not f.name.endswith ('.tmp.npy')]
+
+    def get (self, key: str) -> np.ndarray | None:
+        if key in self.memory:
+            self.memory.move_to_end (key)
+            self.hits += 1
+            return self.memory[key]
+
+        if self.directory is not None and self._file (key).exists ():
+            positions = np.load (self._file (key))
+            os.utime (self._file (key))      # mtime orders disk eviction
+            self._remember (key, positions)
+            self.hits += 1
+            return positions
+
+        self.misses += 1
+        return None
+
+    def put (self, key: str, positions) -> None:
+        # Copied so the caller's array stays writable and later writes to it don't reach the cache
+        positions = np.array (as_points (positions))
+        self._remember (key, positions)
+
+        if self.directory is not None:
+            tmp = self.directory / f'{key}.{os.getpid ()}.tmp.npy'
+            np.save (tmp, positions)
+            if not self._file (key).exists ():
+                self.files += 1
+            os.replace (tmp, self._file (key))
+            if self.max_files is not None and self.files > self.max_files:
+                self._evict ()
+
+    # Drop the least recently used files down to max_files
+    def _evict (self) -> None:
+        files = []
+        for f in self._entries ():
+            try:
+                files.append ((f.stat ().st_mtime, f))
+            except FileNotFoundError:       # removed by another process
+                pass
+        files.sort ()
+        for _, f in files[:max (0, len (files) - self.max_files)]:
+            f.unlink (missing_ok = True)
+        self.files = min (len (files), self.max_files)
+
+    def _remember (self, key: str, positions: np.ndarray) -> None:
+        positions.setflags (write = False)
+        self.memory[key] = positions
+        self.memory.move_to_end (key)
+        while len (self.memory) > self.capacity:
+            self.memory.popitem (last = False)
+
+    def clear (self) -> None:
+        self.memory.clear ()
+        if self.directory is not None:
+            for f in self.directory.glob ('*.npy'):
+                f.unlink ()
+            self.files = 0
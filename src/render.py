@@ -0,0 +1,97 @@
+from collections import deque
+from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+from matplotlib.colors import LightSource, to_rgba
+from .obstacle import ObstacleField
+from .waypoint import WaypointPath
+import numpy as np
+import time
+
+
+def unit_sphere_faces (resolution: int = 20) -> np.ndarray:
+    """(F, 4, 3) quads of a unit sphere on a resolution x resolution lat/long grid."""
+    u = np.linspace (0, 2 * np.pi, resolution)
+    v = np.linspace (0, np.pi, resolution)
+    grid = np.stack ([np.outer (np.cos (u), np.sin (v)),
+                      np.outer (np.sin (u), np.sin (v)),
+                      np.outer (np.ones_like (u), np.cos (v))], axis = -1)
+
+    # Corners of each grid cell, in the same winding plot_surface uses
+    return np.stack ([grid[:-1, :-1], grid[1:, :-1], grid[1:, 1:], grid[:-1, 1:]],
+                     axis = 2).reshape (-1, 4, 3)
+
+
+class SceneView:
+    """3D scene whose artists are created once and updated in place.
+
+    Obstacles share one unit-sphere mesh, shaded once, that is scaled and
+    moved into a single polygon collection holding every sphere. Centers and
+    radii are read straight from the obstacle field's arrays, so a frame costs
+    one broadcast array op however many obstacles there are. The path, drone
+    and target markers keep their artists across path swaps. `draw` only
+    syncs artists, so callers can step the simulation faster than they draw;
+    it also keeps a moving average of the achieved frame rate.
+    """
+
+    def __init__ (self, ax, field: ObstacleField, path: WaypointPath,
+                  resolution: int = 20, fps_window: int = 30):
+        self.ax = ax
+        self.field = field
+        self.faces = unit_sphere_faces (resolution)
+
+        # Lighting doesn't change as spheres move, so shade the mesh once
+        corners = self.faces.mean (axis = 1)
+        normals = corners / np.linalg.norm (corners, axis = 1, keepdims = True)
+        shade = LightSource (azdeg = 225, altdeg = 19.4712).shade_normals (normals, fraction = 1.0)
+        colors = np.tile (to_rgba ('red', alpha = 0.6), (len (self.faces), 1))
+        colors[:, :3] *= shade[:, None]
+
+        self.moving = len (field.moving) > 0
+        self.spheres = Poly3DCollection (self.sphere_verts (), facecolors = np.tile (colors, (len (field), 1)),
+                                         linewidths = 0)
+        ax.add_collection3d (self.spheres)
+        ax.scatter ([], [], [], color = 'red', s = 100, label = 'Obstacle')
+
+        # Markers on a line artist, which unlike a scatter can be moved through public API
+        self.path_points, = ax.plot ([], [], [], linestyle = 'none', marker = 'o', color = 'steelblue',
+                                     ms = 3, label = 'Path')
+        self.drone_point, = ax.plot ([], [], [], 'bo', ms = 8, label = 'Drone')
+        self.target_point, = ax.plot ([], [], [], 'go', ms = 6, label = 'Waypoint')
+        self.fps_text = ax.text2D (0.02, 0.98, '', transform = ax.transAxes, va = 'top')
+        self.set_path (path)
+
+        # A fixed corner, 'best' placement rescans every artist on each draw
+        ax.legend (loc = 'upper right')
+
+        # Fit the view to everything drawn so far
+        pts = np.concatenate ([path.positions, self.sphere_verts ().reshape (-1, 3)])
+        ax.auto_scale_xyz (pts[:, 0], pts[:, 1], pts[:, 2])
+
+        self.frame_times: deque[float] = deque (maxlen = fps_window)
+
+    # (K * F, 4, 3) quads of every obstacle at its current center
+    def sphere_verts (self) -> np.ndarray:
+        field = self.field
+        verts = self.faces * field.radii[:, None, None, None] + field.centers[:, None, None, :]
+        return verts.reshape (-1, 4, 3)
+
+    def set_path (self, path: WaypointPath) -> None:
+        pts = path.positions
+        self.path_points.set_data_3d (pts[:, 0], pts[:, 1], pts[:, 2])
+
+    # Frames per second over the last fps_window draws
+    @property
+    def fps (self) -> float:
+        if len (self.frame_times) < 2:
+            return 0.0
+        return (len (self.frame_times) - 1) / (self.frame_times[-1] - self.frame_times[0])
+
+    # Push current state into the artists, spheres are only re-placed if something can move
+    def draw (self, drone_pos, target_pos, all_obstacles: bool = False) -> None:
+        if all_obstacles or self.moving:
+            self.spheres.set_verts (self.sphere_verts ())
+
+        self.drone_point.set_data_3d ([drone_pos.x], [drone_pos.y], [drone_pos.z])
+        self.target_point.set_data_3d ([target_pos.x], [target_pos.y], [target_pos.z])
+
+        self.frame_times.append (time.perf_counter ())
+        self.fps_text.set_text (f'{self.fps:.0f} FPS')
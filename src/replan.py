@@ -0,0 +1,411 @@
+from .geometry import Vec3D, VoxelGrid, ArrayKDTree, as_array
+from .obstacle import Obstacle, ObstacleField, ObstacleTable, MotionTable
+from .waypoint import WaypointPath
+from .scene import Scene
+from .RRT import interpolate_polyline, smooth_path
+from .stats import Stats
+import heapq
+import math
+import numpy as np
+import random
+import time
+
+
+class ThreatDetector:
+    """Space-time threat check for the rest of a path against obstacle motion.
+
+    Each waypoint gets an arrival window from the distance still to fly and
+    the drone's expected speed, give or take `spread`. A moving obstacle
+    threatens the path only if it can be on a waypoint while the drone gets
+    there: its position at the middle of the window, padded by how far it can
+    drift in half the window, must reach the waypoint. Candidate waypoints come
+    from one batched query of every obstacle's swept bounding sphere against a
+    KD tree over the path, built once per path, and waypoints the drone can't
+    reach within `horizon` seconds are left to later checks.
+    """
+
+    def __init__ (self, obstacles: list[Obstacle], speed: float,
+                  spread: float = 0.25, horizon: float = 2.0, margin: float = 0.0):
+        assert 0 <= spread < 1, "Spread must be in [0, 1)"
+        self.obstacles: list[Obstacle] = obstacles
+        self.speed: float = speed
+        self.spread: float = spread
+        self.horizon: float = horizon
+        self.margin: float = margin
+        self.path: WaypointPath | None = None
+
+        # Every obstacle's motion in one table, row k is obstacle k
+        table = obstacles if isinstance (obstacles, ObstacleTable) else ObstacleTable.from_obstacles (obstacles)
+        self.motions: MotionTable = MotionTable (table, np.arange (len (table)))
+        self.radii: np.ndarray = np.asarray (table.radii, dtype = np.float64)
+
+        # Swept bounding spheres never change, static obstacles sweep only themselves
+        self.sweep_centers, sweep_radii = self.motions.sweep ()
+        self.sweep_radii = sweep_radii + self.radii + margin
+
+    # Build the waypoint index and arc length to each waypoint for a new path
+    def _index (self, wp_path: WaypointPath) -> None:
+        if wp_path is self.path:
+            return
+        self.path = wp_path
+        self.tree = ArrayKDTree (wp_path.positions)
+        self.indices = wp_path.indices
+        self.along = np.concatenate (([0.0], np.cumsum (np.linalg.norm (np.diff (wp_path.positions, axis = 0), axis = 1))))
+
+    def first_threat (self, wp_path: WaypointPath, from_index: int, pos, t: float) -> float:
+        """Earliest time the drone can reach a threatened waypoint, inf if none is."""
+        self._index (wp_path)
+        remaining = np.flatnonzero (self.indices >= from_index)
+        if len (remaining) == 0:
+            return math.inf
+
+        first = remaining[0]
+        lead = float (np.linalg.norm (wp_path.positions[first] - as_array (pos))) - self.along[first]
+        fast = self.speed * (1 + self.spread)
+        slow = self.speed * (1 - self.spread)
+
+        # Waypoints inside a swept sphere that the drone can reach within the horizon
+        owner, rows = self.tree.query_radius_pairs (self.sweep_centers, self.sweep_radii)
+        keep = (self.indices[rows] >= from_index) & (self.along[rows] <= self.horizon * fast - lead)
+        owner, rows = owner[keep], rows[keep]
+        if len (rows) == 0:
+            return math.inf
+
+        dist = lead + self.along[rows]
+        early, late = t + dist / fast, t + dist / slow
+        threat = np.ones (len (rows), dtype = bool)
+
+        # Moving obstacles must also be near the waypoint while the drone is, all pairs in one batch
+        sel = np.flatnonzero (self.motions.kind[owner] != 0)
+        if len (sel):
+            k = owner[sel]
+            centers = self.motions.locate (k, 0.5 * (early[sel] + late[sel]))
+            d = np.linalg.norm (wp_path.positions[rows[sel]] - centers, axis = 1)
+            drift = 0.5 * self.motions.max_speed[k] * (late[sel] - early[sel])
+            threat[sel] = d <= self.radii[k] + self.margin + drift
+
+        return float (early[threat].min ()) if threat.any () else math.inf
+
+
+class IncrementalReplanner:
+    """RRT* tree kept between replans and repaired in place, RRTX-style.
+
+    The tree is rooted at the goal and stores cost-to-goal, so the drone's
+    moving position never invalidates it: each cycle the drone is attached as
+    the start through its cheapest collision-free neighbor. On every replan
+    only nodes near obstacles that moved since the last cycle are rechecked.
+    Nodes now inside an obstacle are dropped, subtrees hanging from blocked
+    edges are orphaned, and orphans are reattached cheapest-first over the
+    surviving tree, like a D* repair. A small growth budget then extends the
+    tree if the start still can't connect, so latency follows how much of the
+    world changed rather than the size of the tree. Dropped nodes leave the
+    spatial index at once, and once more than half the rows are dropped or
+    orphaned the tree is compacted down to its attached nodes, so it stays
+    bounded across cycles and nearest queries only ever see attached nodes.
+    With `stats`, each cycle counts the nodes it rechecked, dropped, orphaned
+    and grew, and times the update, repair and growth phases.
+    """
+
+    def __init__ (self, goal: Vec3D, step_size: float, radius: float,
+                  bl_bound: Vec3D, tr_bound: Vec3D, max_step: float,
+                  max_iter: int = 1000, grow_iter: int = 200, seed: int | None = None,
+                  smooth: bool = False, stats: Stats | None = None):
+        self.goal: np.ndarray = as_array (goal)
+        self.step_size: float = step_size
+        self.radius: float = radius
+        self.bl_bound: np.ndarray = as_array (bl_bound)
+        self.tr_bound: np.ndarray = as_array (tr_bound)
+        self.max_step: float = max_step
+        self.max_iter: int = max_iter       # growth budget for the first plan
+        self.grow_iter: int = grow_iter     # growth budget for later cycles
+        self.rng: random.Random = random.Random (seed)
+        self.smooth: bool = smooth          # shortcut and refit the route read off the tree
+        self.stats: Stats | None = stats
+
+        # Longest edge the tree can hold, bounds how far a moved obstacle can reach
+        self.max_edge: float = max (step_size, radius)
+
+        # Node i: position row i of index, parent (-1 for root / orphan), cost-to-goal (inf if orphaned)
+        self.index: VoxelGrid = VoxelGrid (self.max_edge)
+        self.index.insert (self.goal)
+        self.parent: list[int] = [-1]
+        self.cost: list[float] = [0.0]
+        self.children: list[set[int]] = [set ()]
+        self.alive: list[bool] = [True]
+        self._linked: np.ndarray = np.ones (16, dtype = bool)    # alive and attached to the goal
+
+        self.centers: np.ndarray | None = None
+        self.radii: np.ndarray | None = None
+
+    def __len__ (self) -> int:
+        return len (self.parent)
+
+    @property
+    def linked (self) -> np.ndarray:
+        return self._linked[:len (self)]
+
+    def pos (self, i: int) -> np.ndarray:
+        return self.index.points.data[i]
+
+    # Nodes attached to the goal within r of p
+    def _connected_near (self, p: np.ndarray, r: float) -> list[int]:
+        return [i for i in self.index.within_radius (p, r).tolist ()
+                if self.alive[i] and self.cost[i] < math.inf]
+
+    def _add_node (self, p: np.ndarray) -> int:
+        i = self.index.insert (p)
+        self.parent.append (-1)
+        self.cost.append (math.inf)
+        self.children.append (set ())
+        self.alive.append (True)
+        if i == len (self._linked):
+            self._linked = np.concatenate ((self._linked, np.zeros (len (self._linked), dtype = bool)))
+        self._linked[i] = False
+        return i
+
+    # Attach i under p with cost c and shift the costs of i's subtree to match
+    def _attach (self, i: int, p: int, c: float) -> None:
+        if self.parent[i] >= 0:
+            self.children[self.parent[i]].discard (i)
+        self.parent[i] = p
+        self.children[p].add (i)
+
+        delta = c - self.cost[i]
+        self.cost[i] = c
+        self._linked[i] = c < math.inf
+        if delta == -math.inf or math.isnan (delta):
+            return
+
+        stack = list (self.children[i])
+        while stack:
+            j = stack.pop ()
+            self.cost[j] += delta
+            stack.extend (self.children[j])
+
+    # Detach the subtrees rooted at `roots`, returns every orphaned node
+    def _orphan (self, roots) -> list[int]:
+        orphans = []
+        stack = list (roots)
+        while stack:
+            i = stack.pop ()
+            if self.parent[i] >= 0:
+                self.children[self.parent[i]].discard (i)
+                self.parent[i] = -1
+            self.cost[i] = math.inf
+            self._linked[i] = False
+            orphans.append (i)
+            stack.extend (self.children[i])
+            self.children[i] = set ()
+        return list (dict.fromkeys (orphans))
+
+    # Cheapest collision-free (parent, cost) for p among attached nodes within r
+    def _best_parent (self, p: np.ndarray, candidates: list[int], field: ObstacleField):
+        if not candidates:
+            return -1, math.inf
+
+        pts = self.index.points.data[candidates]
+        costs = np.array ([self.cost[c] for c in candidates]) + np.linalg.norm (pts - p, axis = 1)
+        costs[field.segments_obstructed (pts, p)] = math.inf
+
+        j = int (np.argmin (costs))
+        return (candidates[j], float (costs[j])) if costs[j] < math.inf else (-1, math.inf)
+
+    # Recheck what moved obstacles can touch, drop and orphan invalid parts, then repair
+    def update_obstacles (self, field: ObstacleField) -> None:
+        if self.centers is None or len (field) != len (self.centers):
+            candidates = [i for i in range (len (self)) if self.alive[i]]
+        else:
+            moved = np.flatnonzero ((field.centers != self.centers).any (axis = 1) |
+                                    (field.radii != self.radii))
+            found = set ()
+            for k in moved.tolist ():
+                reach = max (field.radii[k], self.radii[k]) + self.max_edge
+                found.update (self.index.within_radius (self.centers[k], reach).tolist ())
+                found.update (self.index.within_radius (field.centers[k], reach).tolist ())
+            candidates = sorted (i for i in found if self.alive[i])
+
+        self.centers = field.centers.copy ()
+        self.radii = field.radii.copy ()
+        if self.stats is not None:
+            self.stats.count ('replan.checked', len (candidates))
+        if not candidates:
+            return
+
+        # Nodes inside an obstacle are dropped for good (the goal is always kept)
+        pts = self.index.points.data[candidates]
+        inside = field.points_obstructed (pts)
+        dead = [i for i, hit in zip (candidates, inside) if hit and i != 0]
+
+        # Edges from candidates to their parents, any edge through a sphere has its child in range
+        linked = [i for i in candidates if self.parent[i] >= 0]
+        blocked = []
+        if linked:
+            parents = self.index.points.data[[self.parent[i] for i in linked]]
+            hit = field.segments_obstructed (self.index.points.data[linked], parents)
+            blocked = [i for i, h in zip (linked, hit) if h]
+
+        orphans = self._orphan (dead + blocked)
+        for i in dead:
+            self.alive[i] = False
+            self.index.remove (i)
+        if self.stats is not None:
+            self.stats.count ('replan.dead', len (dead))
+            self.stats.count ('replan.orphaned', len (orphans))
+            t = time.perf_counter ()
+
+        # Orphans left over from earlier cycles near moved obstacles get another try
+        retry = [i for i in candidates if self.alive[i] and self.cost[i] == math.inf]
+        self.repair (sorted (set (retry) | {i for i in orphans if self.alive[i]}), field)
+        if self.stats is not None:
+            self.stats.add_time ('replan.repair', time.perf_counter () - t)
+
+        if len (self) - int (self.linked.sum ()) > max (256, len (self) // 2):
+            self.compact ()
+            if self.stats is not None:
+                self.stats.count ('replan.compactions')
+
+    # Rebuild the tree from its attached nodes only, dropping dead rows and orphans for good
+    def compact (self) -> None:
+        keep = np.flatnonzero (self.linked)
+        remap = np.full (len (self), -1, dtype = np.intp)
+        remap[keep] = np.arange (len (keep))
+
+        # The goal is always attached, so it stays node 0
+        self.index = VoxelGrid (self.max_edge, self.index.points.data[keep])
+        self.parent = [int (remap[self.parent[i]]) if self.parent[i] >= 0 else -1 for i in keep.tolist ()]
+        self.cost = [self.cost[i] for i in keep.tolist ()]
+        self.children = [{int (remap[j]) for j in self.children[i] if remap[j] >= 0} for i in keep.tolist ()]
+        self.alive = [True] * len (keep)
+        self._linked = np.ones (max (16, len (keep)), dtype = bool)
+
+    # Reattach orphans cheapest-first, each reattached node can adopt its orphan neighbors
+    def repair (self, orphans: list[int], field: ObstacleField) -> None:
+        heap = []
+        for i in orphans:
+            p = self.pos (i)
+            parent, c = self._best_parent (p, self._connected_near (p, self.radius), field)
+            if parent >= 0:
+                heapq.heappush (heap, (c, i, parent))
+
+        while heap:
+            c, i, parent = heapq.heappop (heap)
+            if self.cost[i] < math.inf or not self.alive[parent] or self.cost[parent] == math.inf:
+                continue
+            self._attach (i, parent, c)
+
+            p = self.pos (i)
+            near = [j for j in self.index.within_radius (p, self.radius).tolist ()
+                    if self.alive[j] and self.cost[j] == math.inf]
+            if near:
+                pts = self.index.points.data[near]
+                free = ~field.segments_obstructed (pts, p)
+                dist = np.linalg.norm (pts - p, axis = 1)
+                for j, ok, d in zip (near, free, dist.tolist ()):
+                    if ok:
+                        heapq.heappush (heap, (c + d, j, i))
+
+    # RRT* growth from the goal side, sampling the start with probability start_bias
+    # Returns early once a new node can see the start
+    def grow (self, iters: int, start: np.ndarray, field: ObstacleField, start_bias: float = 0.1) -> None:
+        if self.stats is None:
+            self._grow (iters, start, field, start_bias)
+            return
+        t, n = time.perf_counter (), len (self)
+        iterations = self._grow (iters, start, field, start_bias)
+        self.stats.add_time ('replan.grow', time.perf_counter () - t)
+        self.stats.count ('replan.grow_iterations', iterations)
+        self.stats.count ('replan.grown', len (self) - n)
+
+    # grow () body, returns the iterations it took
+    def _grow (self, iters: int, start: np.ndarray, field: ObstacleField, start_bias: float) -> int:
+        for it in range (iters):
+            if self.rng.random () < start_bias:
+                sample = start
+            else:
+                sample = np.array ([self.rng.uniform (lo, hi) for lo, hi in
+                                    zip (self.bl_bound.tolist (), self.tr_bound.tolist ())])
+
+            nearest = self.index.nearest (sample, self.linked)
+
+            from_pos = self.pos (nearest)
+            direction = sample - from_pos
+            dist = float (np.linalg.norm (direction))
+            if dist == 0:
+                continue
+            new_pos = from_pos + direction * (min (dist, self.step_size) / dist)
+            if field.point_is_obstructed (new_pos) or field.segment_is_obstructed (from_pos, new_pos):
+                continue
+
+            # Choose parent with lowest cost among the adaptive neighbourhood
+            n = len (self)
+            r = min (self.radius, self.step_size * math.sqrt (math.log (n + 1) / (n + 1)))
+            near = self._connected_near (new_pos, r)
+            if nearest not in near:
+                near.append (nearest)
+            parent, c = self._best_parent (new_pos, near, field)
+            if parent < 0:
+                continue
+
+            i = self._add_node (new_pos)
+            self._attach (i, parent, c)
+
+            # Orphans the tree has grown back to are reattached along with their neighbors
+            lost = [j for j in self.index.within_radius (new_pos, self.radius).tolist ()
+                    if self.alive[j] and self.cost[j] == math.inf]
+            if lost:
+                self.repair (lost, field)
+
+            # Rewire
+            rewire = [j for j in self.index.within_radius (new_pos, r).tolist ()
+                      if self.alive[j] and j != i and j != parent]
+            if rewire:
+                pts = self.index.points.data[rewire]
+                free = ~field.segments_obstructed (pts, new_pos)
+                dist = np.linalg.norm (pts - new_pos, axis = 1)
+                for j, ok, d in zip (rewire, free, dist.tolist ()):
+                    if ok and c + d < self.cost[j]:
+                        self._attach (j, i, c + d)
+
+            if np.linalg.norm (new_pos - start) < self.radius and not field.segment_is_obstructed (new_pos, start):
+                return it + 1
+        return iters
+
+    # Path from start to goal through the repaired tree, None if the start can't connect
+    def replan (self, start: Vec3D, field: ObstacleField) -> WaypointPath | None:
+        start = as_array (start)
+        first = self.centers is None
+        if self.stats is not None:
+            self.stats.count ('replan.cycles')
+            t = time.perf_counter ()
+        self.update_obstacles (field)
+        if self.stats is not None:
+            self.stats.add_time ('replan.update', time.perf_counter () - t)
+
+        parent, _ = self._best_parent (start, self._connected_near (start, self.radius), field)
+        if parent < 0:
+            self.grow (self.max_iter if first else self.grow_iter, start, field)
+            parent, _ = self._best_parent (start, self._connected_near (start, self.radius), field)
+        if parent < 0:
+            return None
+
+        vertices = [start]
+        while parent >= 0:
+            vertices.append (self.pos (parent))
+            parent = self.parent[parent]
+
+        if self.smooth:
+            return WaypointPath.from_array (self.max_step, smooth_path (vertices, field, self.max_step))
+        return WaypointPath.from_array (self.max_step, interpolate_polyline (vertices, self.max_step))
+
+
+def replanner_for (scene: Scene, seed: int | None = None, stats: Stats | None = None) -> IncrementalReplanner:
+    """Incremental replanner towards the scene's last control point, `seed` overriding rrt_seed."""
+    bl, tr = scene.bounds
+    return IncrementalReplanner (goal = scene.control_points[-1],
+                                 step_size = scene.rrt_step_size,
+                                 radius    = scene.rrt_radius,
+                                 bl_bound  = bl, tr_bound = tr,
+                                 max_step  = scene.bezier_max_step,
+                                 seed      = scene.run_seed (seed),
+                                 smooth    = scene.rrt_smooth,
+                                 stats     = stats)
@@ -0,0 +1,225 @@
+from multiprocessing import shared_memory
+import multiprocessing
+import math
+import queue
+import time
+import numpy as np
+from .geometry import as_array
+from .obstacle import ObstacleField
+from .waypoint import WaypointPath
+from .scene import Scene
+from .stats import Stats
+from .replan import ThreatDetector, replanner_for
+
+
+class WorldBuffer:
+    """Shared-memory snapshot of obstacle spheres and the drone's progress.
+
+    One float64 block laid out as
+        [seq, count, path id, from index, t, x, y, z, centers (capacity x 3), radii (capacity)]
+    guarded by a sequence lock: the writer makes seq odd while writing and even
+    when done, and readers retry until they copy a stable, even-seq block. A
+    reader backs off between retries and gives up after `retries`, so a writer
+    that died mid-write can't pin it.
+    """
+
+    HEADER = 8
+
+    def __init__ (self, capacity: int, name: str | None = None):
+        self.capacity = capacity
+        size = 8 * (self.HEADER + 4 * max (capacity, 1))
+        if name is None:
+            self.shm = shared_memory.SharedMemory (create = True, size = size)
+        else:
+            try:
+                self.shm = shared_memory.SharedMemory (name = name, track = False)
+            except TypeError:
+                self.shm = shared_memory.SharedMemory (name = name)
+        self.owner = name is None
+
+        self.block = np.ndarray ((size // 8,), dtype = np.float64, buffer = self.shm.buf)
+        if self.owner:
+            self.block[:] = 0
+
+    # Spawned processes re-attach by name instead of copying the buffer
+    def __getstate__ (self):
+        return (self.capacity, self.shm.name)
+
+    def __setstate__ (self, state):
+        self.__init__ (state[0], state[1])
+
+    def publish (self, centers: np.ndarray, radii: np.ndarray, pos, path_id: int,
+                 from_index: int, t: float) -> None:
+        k = len (radii)
+        assert k <= self.capacity, "More obstacles than the buffer was sized for"
+
+        b, h, cap = self.block, self.HEADER, self.capacity
+        b[0] += 1
+        b[1] = k
+        b[2] = path_id
+        b[3] = from_index
+        b[4] = t
+        b[5:8] = as_array (pos)
+        b[h:h + 3 * k] = centers.ravel ()
+        b[h + 3 * cap:h + 3 * cap + k] = radii
+        b[0] += 1
+
+    # Returns (centers, radii, pos, path id, from index, t), copied out of shared memory,
+    # or None if no stable block could be read
+    def read (self, retries: int = 100):
+        b, h, cap = self.block, self.HEADER, self.capacity
+        for attempt in range (retries):
+            seq = b[0]
+            if seq % 2 == 0:
+                k = int (b[1])
+                path_id, from_index, t = int (b[2]), int (b[3]), float (b[4])
+                pos = b[5:8].copy ()
+                centers = b[h:h + 3 * k].reshape (k, 3).copy ()
+                radii = b[h + 3 * cap:h + 3 * cap + k].copy ()
+
+                if b[0] == seq:
+                    return centers, radii, pos, path_id, from_index, t
+
+            # Yield first, then sleep briefly, so a stalled writer doesn't cost a whole core
+            time.sleep (0 if attempt < 10 else 1e-4)
+        return None
+
+    def close (self) -> None:
+        del self.block
+        self.shm.close ()
+        if self.owner:
+            self.shm.unlink ()
+
+
+def _replan_main (scene: Scene, world: WorldBuffer, initial: np.ndarray,
+                  control, results, stop, report) -> None:
+    # Stats can't be shared across processes, so the worker keeps its own and reports them on stop
+    stats = Stats () if report is not None else None
+    replanner = replanner_for (scene, stats = stats)
+    threats = ThreatDetector (scene.obstacles, speed = scene.bezier_max_step * 1.5,
+                              horizon = 2 * scene.replan_interval)
+    paths = {0: WaypointPath.from_array (scene.bezier_max_step, initial)}
+    generation = 0
+
+    while not stop.wait (scene.replan_interval):
+        # Paths the main process installed itself, e.g. after a reset
+        try:
+            while True:
+                path_id, positions = control.get_nowait ()
+                paths = {path_id: WaypointPath.from_array (scene.bezier_max_step, positions)}
+        except queue.Empty:
+            pass
+
+        # The writer is stalled mid-publish, try again next cycle
+        snapshot = world.read ()
+        if snapshot is None:
+            continue
+        centers, radii, pos, current, from_index, t = snapshot
+        field = ObstacleField.from_arrays (centers, radii)
+
+        # Only replan if an obstacle can reach the remaining path when the drone does
+        path = paths.get (current)
+        threat = math.inf if path is None else threats.first_threat (path, from_index, pos, t)
+        if threat == math.inf:
+            continue
+        detected = time.time ()
+
+        # Only swap if the new path stays clear until at least the next check
+        new_path = replanner.replan (pos, field)
+        plan_time = time.time () - detected
+        if new_path is None or threats.first_threat (new_path, 0, pos, t) <= threat + scene.replan_interval:
+            continue
+
+        generation += 1
+        paths = {current: path, generation: new_path}
+
+        # Discard if main process hasn't consumed the previous one yet
+        try:
+            results.put_nowait ((generation, current, new_path.positions, detected, plan_time))
+        except queue.Full:
+            pass
+
+    if stats is not None:
+        report.put ((stats.counters, stats.timers))
+
+
+class ReplanProcess:
+    """Runs the incremental replanner in its own process.
+
+    The main loop publishes obstacle spheres and drone progress into a
+    WorldBuffer and polls for finished paths, which come back as position
+    arrays. Neither call blocks, so planning never stalls rendering or
+    control. With `stats`, each swap records how long planning took and the
+    wall time from detecting the threat to the swap, and the replanner's own
+    counters and timers are merged in on close. Paths planned by the worker
+    get positive ids, the initial path is 0 and paths installed through
+    `reset` get negative ids; results planned against a path that is no
+    longer current are dropped.
+    """
+
+    def __init__ (self, scene: Scene, initial_path: WaypointPath, stats: Stats | None = None):
+        # The platform's default start method; the scene and WorldBuffer pickle for spawn
+        ctx = multiprocessing.get_context ()
+
+        self.scene = scene
+        self.stats = stats
+        self.world = WorldBuffer (len (scene.obstacles))
+        self.control = ctx.Queue ()
+        self.results = ctx.Queue (maxsize = 1)
+        self.stop = ctx.Event ()
+        self.report = ctx.Queue () if stats is not None else None
+        self.current = 0
+        self.resets = 0
+
+        self.process = ctx.Process (target = _replan_main, daemon = True,
+                                    args = (scene, self.world, initial_path.positions,
+                                            self.control, self.results, self.stop, self.report))
+
+    def start (self) -> None:
+        self.process.start ()
+
+    def publish (self, field: ObstacleField, pos, from_index: int, t: float) -> None:
+        self.world.publish (field.centers, field.radii, pos, self.current, from_index, t)
+
+    # Newly planned path if one is ready, else None
+    def poll (self) -> WaypointPath | None:
+        while True:
+            try:
+                generation, base, positions, detected, plan_time = self.results.get_nowait ()
+            except queue.Empty:
+                return None
+            if base == self.current:
+                self.current = generation
+                if self.stats is not None:
+                    latency = time.time () - detected
+                    self.stats.count ('replan.swaps')
+                    self.stats.observe ('replan.plan', plan_time)
+                    self.stats.observe ('replan.threat_to_swap', latency)
+                    self.stats.event ('replan.swap', generation = generation, waypoints = len (positions),
+                                      plan_s = plan_time, threat_to_swap_s = latency)
+                return WaypointPath.from_array (self.scene.bezier_max_step, positions)
+
+    # Install a path planned elsewhere, e.g. after the scene is reset
+    def reset (self, path: WaypointPath) -> None:
+        self.resets += 1
+        self.current = -self.resets
+        self.control.put ((self.current, path.positions))
+
+    def close (self) -> None:
+        self.stop.set ()
+        if self.process.pid is not None:    # closed before start
+            # Drained before joining, a worker can't exit while its queue is unflushed
+            if self.report is not None:
+                try:
+                    counters, timers = self.report.get (timeout = 1.0)
+                except queue.Empty:
+                    pass
+                else:
+                    for name, n in counters.items ():
+                        self.stats.count (name, n)
+                    for name, seconds in timers.items ():
+                        self.stats.add_time (name, seconds)
+            self.process.join (timeout = 1.0)
+            if self.process.is_alive ():
+                self.process.terminate ()
+        self.world.close ()
@@ -1,10 +1,14 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import json
-from .geometry import Vec3D
-from .obstacle import Obstacle, LinearMotion, CircularMotion
+import os
+import numpy as np
+from .geometry import Vec3D, as_points
+from .obstacle import Obstacle, ObstacleField, LinearMotion, CircularMotion
 from .bezier import BezierSpline
-from .waypoint import WaypointPath, merge_waypoint_paths
+from .waypoint import WaypointPath, StreamingPath, merge_waypoint_paths
 from .RRT import RRT
+from .plan_cache import PlanCache, plan_key
+from .stats import Stats
 
 
 @dataclass
@@ -17,9 +21,25 @@ class Scene:
     rrt_radius: float = 2.0
     rrt_seed: int | None = None
     replan_interval: float = 0.0    # seconds between replans; 0 = disabled
+    rrt_workers: int | None = None  # processes for gap patching; None = one per CPU, 1 = serial
+    rrt_planner: str = 'rrt*'       # gap planner, one of RRT.PLANNERS
+    rrt_goal_bias: float = 0.1      # goal sampling probability for 'goal_bias' and 'informed'
+    rrt_refine_iter: int = 200      # iterations 'informed' spends shortening its first path
+    rrt_smooth: bool = True         # shortcut and refit RRT patches as C1 curves, see RRT.smooth_path
+    compiled_path: np.ndarray | None = field (default = None, repr = False)   # built path stored in a .scene
+    compiled_path_key: str | None = field (default = None, repr = False)      # path_key it was built for
+    obstacle_field: ObstacleField = field (init = False, repr = False)
+
+    def __post_init__ (self):
+        # Broadphase over obstacles, call obstacle_field.update (t) to move them
+        self.obstacle_field = ObstacleField (self.obstacles)
 
     @classmethod
     def from_file (cls, path: str) -> 'Scene':
+        if path.endswith ('.scene'):
+            from .scene_bin import load_compiled
+            return load_compiled (path)
+
         with open (path) as f:
             d = json.load (f)
 
@@ -57,33 +77,252 @@ class Scene:
             rrt_radius      = d.get ('rrt_radius',      2.0),
             rrt_seed        = d.get ('rrt_seed',        None),
             replan_interval = d.get ('replan_interval', 0.0),
+            rrt_workers     = d.get ('rrt_workers',     None),
+            rrt_planner     = d.get ('rrt_planner',     'rrt*'),
+            rrt_goal_bias   = d.get ('rrt_goal_bias',   0.1),
+            rrt_refine_iter = d.get ('rrt_refine_iter', 200),
+            rrt_smooth      = d.get ('rrt_smooth',      True),
         )
 
+    # Inverse of from_file
+    def to_dict (self) -> dict:
+        def vec (v): return [v.x, v.y, v.z]
+
+        def motion_dict (m):
+            if isinstance (m, LinearMotion):
+                return {'type': 'linear', 'points': [vec (p) for p in m.points],
+                        'speed': m.speed, 'loop': m.loop}
+            if isinstance (m, CircularMotion):
+                return {'type': 'circular', 'orbit_center': vec (m.orbit_center),
+                        'orbit_radius': m.orbit_radius, 'axis': m.axis,
+                        'speed': m.speed, 'phase': m.phase}
+            raise ValueError (f"Unknown motion type: {type (m).__name__}")
+
+        obstacles = []
+        for obs in self.obstacles:
+            o = {'center': vec (obs.center), 'radius': obs.radius}
+            if obs.motion is not None:
+                o['motion'] = motion_dict (obs.motion)
+            obstacles.append (o)
+
+        return {
+            'control_points':  [vec (p) for p in self.control_points],
+            'obstacles':       obstacles,
+            'bounds':          {'min': vec (self.bounds[0]), 'max': vec (self.bounds[1])},
+            'bezier_max_step': self.bezier_max_step,
+            'rrt_step_size':   self.rrt_step_size,
+            'rrt_radius':      self.rrt_radius,
+            'rrt_seed':        self.rrt_seed,
+            'replan_interval': self.replan_interval,
+            'rrt_workers':     self.rrt_workers,
+            'rrt_planner':     self.rrt_planner,
+            'rrt_goal_bias':   self.rrt_goal_bias,
+            'rrt_refine_iter': self.rrt_refine_iter,
+            'rrt_smooth':      self.rrt_smooth,
+        }
+
+    def to_file (self, path: str) -> None:
+        with open (path, 'w') as f:
+            json.dump (self.to_dict (), f, indent = 4)
+
     @property
     def start (self) -> Vec3D:
         return self.control_points[0]
 
-    def build_path (self) -> WaypointPath:
+    # rrt_seed, unless a run overrides it without touching the scene
+    def run_seed (self, seed: int | None = None) -> int | None:
+        return self.rrt_seed if seed is None else seed
+
+    # Independent RRT seed per gap, derived from rrt_seed so results don't depend on scheduling
+    def gap_seeds (self, count: int, seed: int | None = None) -> list[int | None]:
+        return [self.gap_seed (i, seed = seed) for i in range (count)]
+
+    # Seed of gap i alone, the same as SeedSequence.spawn's i-th child, so streamed gaps are seeded like built ones
+    # Further key parts pick a grandchild, as EditablePath does per (segment, run), so its gaps differ
+    def gap_seed (self, i: int, *key: int, seed: int | None = None) -> int | None:
+        seed = self.run_seed (seed)
+        if seed is None:
+            return None
+        return int (np.random.SeedSequence (seed, spawn_key = (i, *key)).generate_state (1)[0])
+
+    # RRT planner settings, in the order gap tuples and cache keys carry them
+    def planner_config (self) -> tuple:
+        return (self.rrt_planner, self.rrt_goal_bias, self.rrt_refine_iter, self.rrt_smooth)
+
+    # Everything plan_gap needs to patch one gap
+    def gap (self, start: np.ndarray, goal: np.ndarray, field: ObstacleField, seed: int | None) -> tuple:
+        bl, tr = self.bounds
+        return (start, goal, bl.to_array (), tr.to_array (),
+                self.rrt_step_size, self.rrt_radius, self.bezier_max_step, field, seed,
+                *self.planner_config ())
+
+    # Cache key of the full built path, over everything build_path reads
+    def path_key (self, field: ObstacleField, seed: int | None = None) -> str:
         bl, tr = self.bounds
+        return plan_key ('path', as_points (self.control_points), field.centers, field.radii, bl, tr,
+                         self.bezier_max_step, self.rrt_step_size, self.rrt_radius, self.run_seed (seed),
+                         *self.planner_config ())
+
+    # `seed` overrides rrt_seed for this build only, `stats` collects each gap's RRT counters and timers
+    def build_path (self, cache: PlanCache | None = None, seed: int | None = None,
+                    stats: Stats | None = None) -> WaypointPath:
+        # Unseeded plans differ run to run, so there is nothing to reuse
+        seed = self.run_seed (seed)
+        if seed is None:
+            cache = None
+
+        # A path compiled into the scene file holds as long as nothing it was built from changed
+        if self.compiled_path is not None and seed is not None:
+            if self.path_key (self.obstacle_field, seed) == self.compiled_path_key:
+                return WaypointPath.from_array (self.bezier_max_step, self.compiled_path)
+
+        if cache is not None:
+            positions = cache.get (self.path_key (self.obstacle_field, seed))
+            if positions is not None:
+                return WaypointPath.from_array (self.bezier_max_step, positions)
+
+        field = self.obstacle_field.snapshot ()
+
         bezier = BezierSpline (self.control_points, max_step = self.bezier_max_step)
-        segments = bezier.split_by_obstacles (self.obstacles)
+        segments = bezier.split_by_obstacles (self.obstacle_field)
 
-        patches = []
-        for i in range (len (segments) - 1):
+        # Gaps are independent, so they can be planned concurrently
+        gaps, keys, patches = [], [], []
+        for i, gap_seed in enumerate (self.gap_seeds (len (segments) - 1, seed)):
             start = segments[i].points[-1].pos
             goal  = segments[i + 1].points[0].pos
-            print(f"RRT: {start} -> {goal}")
-            rrt = RRT (start = start, goal = goal,
-                       step_size = self.rrt_step_size,
-                       radius = self.rrt_radius,
-                       bl_bound = bl, tr_bound = tr,
-                       obstacles = self.obstacles,
-                       seed = self.rrt_seed)
-            patches.append (rrt.get_waypoint_path (max_step = self.bezier_max_step))
+            gap = self.gap (start.to_array (), goal.to_array (), field, gap_seed)
+
+            key = gap_key (gap) if cache is not None else None
+            cached = cache.get (key) if cache is not None else None
+            print(f"RRT: {start} -> {goal}" + (" (cached)" if cached is not None else ""))
+
+            gaps.append (gap)
+            keys.append (key)
+            patches.append (None if cached is None else WaypointPath.from_array (self.bezier_max_step, cached))
+
+        pending = [i for i, patch in enumerate (patches) if patch is None]
+        workers = min (self.rrt_workers or os.cpu_count () or 1, len (pending))
+        # Stats live in this process, so instrumented builds plan their gaps here
+        if workers > 1 and stats is None:
+            # Imported here so single-gap and cached builds skip the multiprocessing import cost
+            # The platform's default start method is used; entry points guard on __main__
+            # Each worker gets the settings and field once, tasks carry only endpoints and seed
+            # The field goes through shared memory, spawn would otherwise block writing large initargs
+            from concurrent.futures import ProcessPoolExecutor
+            from .replan_process import WorldBuffer
+            world = WorldBuffer (len (field))
+            world.publish (field.centers, field.radii, (0, 0, 0), 0, 0, 0.0)
+            settings = gaps[pending[0]][2:7] + (field.cell_size,) + gaps[pending[0]][9:]
+            try:
+                with ProcessPoolExecutor (max_workers = workers, initializer = _init_gap_worker,
+                                          initargs = (world, settings)) as pool:
+                    planned = list (pool.map (_plan_pooled_gap, [(gaps[i][0], gaps[i][1], gaps[i][8])
+                                                                 for i in pending]))
+            finally:
+                world.close ()
+        else:
+            planned = [plan_gap (gaps[i], stats) for i in pending]
+
+        for i, patch in zip (pending, planned):
+            patches[i] = patch
+            if cache is not None:
+                cache.put (keys[i], patch.positions)
 
         if not patches:
             return segments[0]
 
         interleaved = [x for pair in zip (segments, patches) for x in pair]
         interleaved.append (segments[-1])
-        return merge_waypoint_paths (interleaved)
+        path = merge_waypoint_paths (interleaved)
+
+        if cache is not None:
+            cache.put (self.path_key (field, seed), path.positions)
+        return path
+
+    def stream_path (self, lookahead: int = 256, cache: PlanCache | None = None,
+                     seed: int | None = None, stats: Stats | None = None) -> StreamingPath:
+        """Path built one spline segment at a time as the follower gets near it.
+
+        Each segment is split against the obstacle field as it stands when the
+        segment enters the look-ahead window, and gaps are patched by RRT then,
+        so memory stays bounded by the window however long the route is.
+        `seed` overrides rrt_seed and `stats` collects RRT counters, as in build_path.
+
+        This is not the same path build_path returns. Each segment is sampled
+        evenly on its own, so every segment join is a waypoint, while
+        build_path spaces samples evenly along the whole spline. Waypoints,
+        and with them gap endpoints and gap keys, differ, so the two share no
+        cache entries. The nth gap still gets the nth seed, and both routes
+        follow the same spline within one max_step.
+        """
+        return StreamingPath (self.bezier_max_step, self.path_chunks (cache, seed, stats), lookahead)
+
+    # Free spline runs and RRT patches in path order, planned lazily for stream_path
+    def path_chunks (self, cache: PlanCache | None = None, seed: int | None = None,
+                     stats: Stats | None = None):
+        seed = self.run_seed (seed)
+        if seed is None:
+            cache = None
+
+        field = self.obstacle_field
+        bezier = BezierSpline (self.control_points, max_step = self.bezier_max_step, lazy = True)
+        last_free, blocked, gaps = None, False, 0
+
+        for positions in bezier.iter_positions ():
+            free = ~field.points_obstructed (positions)
+            edges = np.flatnonzero (np.diff (np.concatenate (([False], free, [False])).astype (np.int8)))
+
+            for start, end in zip (edges[::2], edges[1::2]):
+                # Like build_path, a route that starts blocked just begins at its first free run
+                if (start > 0 or blocked) and last_free is not None:
+                    gap = self.gap (last_free, positions[start], field, self.gap_seed (gaps, seed = seed))
+                    gaps += 1
+
+                    key = gap_key (gap) if cache is not None else None
+                    patch = cache.get (key) if cache is not None else None
+                    print(f"RRT: {Vec3D.from_array (gap[0])} -> {Vec3D.from_array (gap[1])}"
+                          + (" (cached)" if patch is not None else ""))
+                    if patch is None:
+                        patch = plan_gap (gap, stats).positions
+                        if cache is not None:
+                            cache.put (key, patch)
+                    yield patch
+
+                yield positions[start:end]
+                last_free = positions[end - 1]
+            blocked = not free[-1]
+
+
+def gap_key (gap) -> str:
+    field = gap[7]
+    return plan_key ('rrt', *gap[:7], field.centers, field.radii, *gap[8:])
+
+# Settings and field shared by every gap a pool worker plans, set once per worker
+_worker_gap: tuple | None = None
+
+# `settings` is a gap tuple's bounds through max_step, the field's cell size, then planner_config
+def _init_gap_worker (world, settings: tuple) -> None:
+    global _worker_gap
+    # Not closed here, a forked worker holds the parent's buffer itself
+    centers, radii = world.read ()[:2]
+    field = ObstacleField.from_arrays (centers, radii, settings[5])
+    _worker_gap = (*settings[:5], field, *settings[6:])
+
+# Plan one gap from its (start, goal, seed) and the worker's shared gap settings
+def _plan_pooled_gap (task) -> WaypointPath:
+    start, goal, seed = task
+    return plan_gap ((start, goal, *_worker_gap[:6], seed, *_worker_gap[6:]))
+
+# Plan one gap
+def plan_gap (gap, stats: Stats | None = None) -> WaypointPath:
+    start, goal, bl, tr, step_size, radius, max_step, field, seed, planner, goal_bias, refine_iter, smooth = gap
+    rrt = RRT (start = start, goal = goal,
+               step_size = step_size,
+               radius = radius,
+               bl_bound = bl, tr_bound = tr,
+               obstacles = field,
+               seed = seed,
+               planner = planner, goal_bias = goal_bias, refine_iter = refine_iter,
+               stats = stats)
+    return rrt.get_waypoint_path (max_step = max_step, smooth = smooth)
@@ -0,0 +1,148 @@
+"""Compiled binary scenes that open with a memory map.
+
+    python -m src.scene_bin scenes/*.json [--no-path]
+
+A .scene file is an 8-byte magic, a little-endian uint64 header length, a
+JSON header and then raw arrays, each starting on a 64-byte boundary. The
+header holds the scene parameters and, for every array, its dtype, shape
+and offset. Loading maps the file once and hands out read-only views into
+it, so nothing is parsed or copied per obstacle. The obstacle broadphase and,
+optionally, the built waypoint path are stored too.
+"""
+from contextlib import redirect_stdout
+from pathlib import Path
+import argparse
+import io
+import json
+import numpy as np
+from .geometry import Vec3D, as_points
+from .obstacle import ObstacleField, ObstacleTable
+from .scene import Scene
+
+MAGIC = b'BZSCENE1'
+ALIGN = 64
+
+
+def _pad (n: int) -> int:
+    return -n % ALIGN
+
+
+def compile_scene (scene: Scene, path: str, include_path: bool = True) -> None:
+    """Write `scene` as a .scene file, with its built path if include_path is set and rrt_seed is fixed."""
+    table = ObstacleTable.from_obstacles (scene.obstacles)
+    field = ObstacleField (table)
+
+    arrays = {'control_points': as_points (scene.control_points), **table.arrays}
+    grid = field.grid_arrays ()
+    arrays.update ({'grid_' + name: a for name, a in grid.items () if name != 'cell_size'})
+
+    header = {
+        'bounds':          [scene.bounds[0].to_tuple (), scene.bounds[1].to_tuple ()],
+        'bezier_max_step': scene.bezier_max_step,
+        'rrt_step_size':   scene.rrt_step_size,
+        'rrt_radius':      scene.rrt_radius,
+        'rrt_seed':        scene.rrt_seed,
+        'replan_interval': scene.replan_interval,
+        'rrt_workers':     scene.rrt_workers,
+        'rrt_planner':     scene.rrt_planner,
+        'rrt_goal_bias':   scene.rrt_goal_bias,
+        'rrt_refine_iter': scene.rrt_refine_iter,
+        'rrt_smooth':      scene.rrt_smooth,
+        'cell_size':       grid['cell_size'],
+        'path_key':        None,
+    }
+
+    # Unseeded paths differ every build, so there is no single path worth storing
+    if include_path and scene.rrt_seed is not None:
+        arrays['path'] = scene.build_path ().positions
+        header['path_key'] = scene.path_key (scene.obstacle_field)
+
+    # Header length depends on the offsets it lists, so lay the arrays out relative to its end first
+    layout, offset = {}, 0
+    for name, a in arrays.items ():
+        a = np.ascontiguousarray (a)
+        arrays[name] = a
+        layout[name] = {'dtype': a.dtype.str, 'shape': list (a.shape), 'offset': offset}
+        offset += a.nbytes + _pad (a.nbytes)
+    header['arrays'] = layout
+
+    # Shift offsets past the header, growing the reserved space until the header fits in it
+    relative = {name: entry['offset'] for name, entry in layout.items ()}
+    start = len (MAGIC) + 8 + len (json.dumps (header).encode ())
+    while True:
+        start += _pad (start)
+        for name, entry in layout.items ():
+            entry['offset'] = start + relative[name]
+        blob = json.dumps (header).encode ()
+        if len (MAGIC) + 8 + len (blob) <= start:
+            break
+        start += ALIGN
+    blob += b' ' * (start - len (MAGIC) - 8 - len (blob))
+
+    with open (path, 'wb') as f:
+        f.write (MAGIC)
+        f.write (np.uint64 (len (blob)).tobytes ())
+        f.write (blob)
+        for name, a in arrays.items ():
+            assert f.tell () == layout[name]['offset']
+            f.write (a.tobytes ())
+            f.write (b'\0' * _pad (a.nbytes))
+
+
+def load_compiled (path: str) -> Scene:
+    """Open a .scene file; obstacle arrays, broadphase and path are views into one memory map."""
+    with open (path, 'rb') as f:
+        if f.read (len (MAGIC)) != MAGIC:
+            raise ValueError (f"{path} is not a compiled scene")
+        size = int (np.frombuffer (f.read (8), dtype = np.uint64)[0])
+        header = json.loads (f.read (size))
+
+    buf = np.memmap (path, dtype = np.uint8, mode = 'r')
+    arrays = {}
+    for name, entry in header['arrays'].items ():
+        dtype = np.dtype (entry['dtype'])
+        count = int (np.prod (entry['shape'], dtype = np.int64))
+        start = entry['offset']
+        arrays[name] = buf[start:start + count * dtype.itemsize].view (dtype).reshape (entry['shape'])
+
+    grid = {name[len ('grid_'):]: arrays.pop (name) for name in list (arrays) if name.startswith ('grid_')}
+    grid['cell_size'] = header['cell_size']
+    control_points = arrays.pop ('control_points')
+    compiled_path = arrays.pop ('path', None)
+
+    return Scene (
+        control_points    = [Vec3D (*p) for p in control_points.tolist ()],
+        obstacles         = ObstacleTable (arrays, grid),
+        bounds            = (Vec3D (*header['bounds'][0]), Vec3D (*header['bounds'][1])),
+        bezier_max_step   = header['bezier_max_step'],
+        rrt_step_size     = header['rrt_step_size'],
+        rrt_radius        = header['rrt_radius'],
+        rrt_seed          = header['rrt_seed'],
+        replan_interval   = header['replan_interval'],
+        rrt_workers       = header['rrt_workers'],
+        rrt_planner       = header.get ('rrt_planner', 'rrt*'),
+        rrt_goal_bias     = header.get ('rrt_goal_bias', 0.1),
+        rrt_refine_iter   = header.get ('rrt_refine_iter', 200),
+        rrt_smooth        = header.get ('rrt_smooth', True),
+        compiled_path     = compiled_path,
+        compiled_path_key = header['path_key'],
+    )
+
+
+def main ():
+    parser = argparse.ArgumentParser (description = __doc__.splitlines ()[0])
+    parser.add_argument ('scenes', nargs = '+', help = 'JSON scenes to compile')
+    parser.add_argument ('-o', '--out-dir', help = 'directory for .scene files, defaults to beside each input')
+    parser.add_argument ('--no-path', action = 'store_true', help = "don't store the built path")
+    args = parser.parse_args ()
+
+    for src in map (Path, args.scenes):
+        dst = (Path (args.out_dir) if args.out_dir else src.parent) / (src.stem + '.scene')
+        # build_path reports every RRT gap, which is just noise here
+        with redirect_stdout (io.StringIO ()):
+            compile_scene (Scene.from_file (str (src)), str (dst), include_path = not args.no_path)
+        print (f"{src} -> {dst} ({dst.stat ().st_size / 1e6:.2f} MB)")
+
+
+if __name__ == '__main__':
+    main ()
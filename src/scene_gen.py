@@ -0,0 +1,140 @@
+"""Procedural scenes for profiling and scaling tests.
+
+    python -m src.scene_gen --obstacles 10000 --seed 1 -o scenes/gen_10k.json
+"""
+import argparse
+import numpy as np
+from .geometry import Vec3D
+from .obstacle import Obstacle, LinearMotion, CircularMotion
+from .scene import Scene
+
+
+# Number of spheres with radii uniform in radius_range that cover `density` of the bounds' volume
+def obstacles_for_density (density: float, bounds, radius_range: tuple[float, float]) -> int:
+    lo, hi = radius_range
+    mean_r3 = (hi ** 4 - lo ** 4) / (4 * (hi - lo)) if hi > lo else lo ** 3
+    volume = float (np.prod (np.asarray (bounds[1]) - np.asarray (bounds[0])))
+    return int (round (density * volume / (4 / 3 * np.pi * mean_r3)))
+
+
+def random_control_points (count: int, lo: np.ndarray, hi: np.ndarray,
+                           rng: np.random.Generator) -> np.ndarray:
+    # Wander from near one corner of the bounds towards the opposite one
+    margin = 0.1 * (hi - lo)
+    start, goal = lo + margin, hi - margin
+    t = np.linspace (0, 1, count)[:, None]
+    jitter = rng.normal (scale = 0.15, size = (count, 3)) * (hi - lo)
+    jitter[[0, -1]] = 0
+    return np.clip (start + t * (goal - start) + jitter, lo, hi)
+
+
+def generate_scene (control_points: int = 8, obstacles: int | None = 100,
+                    density: float | None = None,
+                    motion_mix: tuple[float, float, float] = (0.6, 0.2, 0.2),
+                    bounds: tuple = ((0, 0, 0), (100, 100, 100)),
+                    radius_range: tuple[float, float] = (0.5, 2.0),
+                    clearance: float = 1.0, seed: int | None = None, max_attempts: int = 100,
+                    **scene_kwargs) -> Scene:
+    """Random but valid Scene, the same for the same arguments and seed.
+
+    `density`, the fraction of the bounds covered by obstacle volume, replaces
+    `obstacles` if given. `motion_mix` weights static, LinearMotion and
+    CircularMotion obstacles. Control points are rounded up to the even count
+    of at least 6 that BezierSpline needs, and no obstacle's swept volume
+    comes within `clearance` of the start or goal; an obstacle that still
+    does after `max_attempts` placements raises ValueError. Extra keyword
+    arguments are passed to Scene.
+    """
+    rng = np.random.default_rng (seed)
+    lo, hi = np.asarray (bounds[0], dtype = float), np.asarray (bounds[1], dtype = float)
+    span = hi - lo
+
+    count = max (6, control_points + control_points % 2)
+    cps = random_control_points (count, lo, hi, rng)
+
+    if density is not None:
+        obstacles = obstacles_for_density (density, (lo, hi), radius_range)
+
+    kind = rng.choice (3, size = obstacles, p = np.asarray (motion_mix) / np.sum (motion_mix))
+    radii = rng.uniform (*radius_range, size = obstacles)
+    centers = np.empty ((obstacles, 3))
+    reach = np.zeros (obstacles)
+
+    # Linear: a bounce or cycle along a random segment; circular: a random orbit
+    travel = rng.normal (size = (obstacles, 3))
+    travel *= (rng.uniform (0.02, 0.1, size = obstacles) * span.min ())[:, None] / np.linalg.norm (travel, axis = 1, keepdims = True)
+    orbit_r = rng.uniform (0.01, 0.05, size = obstacles) * span.min ()
+    axes = rng.normal (size = (obstacles, 3))
+    axes /= np.linalg.norm (axes, axis = 1, keepdims = True)
+    speeds = rng.uniform (0.5, 3.0, size = obstacles)
+    phases = rng.uniform (0, 2 * np.pi, size = obstacles)
+    loops = rng.choice (['bounce', 'cycle'], size = obstacles)
+
+    reach[kind == 1] = 0.5 * np.linalg.norm (travel[kind == 1], axis = 1)
+    reach[kind == 2] = orbit_r[kind == 2]
+
+    # Resample whatever sweeps over the start or goal, centers are each sweep's middle
+    todo = np.arange (obstacles)
+    for _ in range (max_attempts):
+        centers[todo] = rng.uniform (lo, hi, size = (len (todo), 3))
+        limit = (reach + radii + clearance)[todo, None]
+        d = np.linalg.norm (centers[todo, None, :] - cps[[0, -1]][None], axis = 2)
+        todo = todo[(d <= limit).any (axis = 1)]
+        if len (todo) == 0:
+            break
+    else:
+        worst = float ((reach + radii)[todo].max ())
+        raise ValueError (f"Could not place {len (todo)} obstacles clear of the start and goal in "
+                          f"{max_attempts} attempts: bounds {lo.tolist ()} to {hi.tolist ()} leave no room "
+                          f"for a sweep of {worst:.2f} plus clearance {clearance}")
+
+    obs = []
+    for i in range (obstacles):
+        c = centers[i]
+        if kind[i] == 1:
+            motion = LinearMotion ([Vec3D (*(c - 0.5 * travel[i])), Vec3D (*(c + 0.5 * travel[i]))],
+                                   speed = float (speeds[i]), loop = str (loops[i]))
+        elif kind[i] == 2:
+            motion = CircularMotion (Vec3D (*c), float (orbit_r[i]), axes[i].tolist (),
+                                     speed = float (speeds[i]), phase = float (phases[i]))
+        else:
+            motion = None
+
+        center = motion.position (0) if motion is not None else Vec3D (*c)
+        obs.append (Obstacle (center, float (radii[i]), motion))
+
+    scene_kwargs.setdefault ('rrt_seed', seed)
+    return Scene (control_points = [Vec3D (*p) for p in cps.tolist ()],
+                  obstacles      = obs,
+                  bounds         = (Vec3D (*lo.tolist ()), Vec3D (*hi.tolist ())),
+                  **scene_kwargs)
+
+
+def main ():
+    parser = argparse.ArgumentParser (description = __doc__.splitlines ()[0])
+    parser.add_argument ('-o', '--out', required = True, help = 'scene JSON to write')
+    parser.add_argument ('--control-points', type = int, default = 8)
+    count = parser.add_mutually_exclusive_group ()
+    count.add_argument ('--obstacles', type = int, default = 100)
+    count.add_argument ('--density', type = float, help = 'fraction of the bounds covered by obstacles')
+    parser.add_argument ('--motion-mix', type = float, nargs = 3, default = (0.6, 0.2, 0.2),
+                         metavar = ('STATIC', 'LINEAR', 'CIRCULAR'))
+    parser.add_argument ('--bounds', type = float, nargs = 6, default = (0, 0, 0, 100, 100, 100),
+                         metavar = ('X0', 'Y0', 'Z0', 'X1', 'Y1', 'Z1'))
+    parser.add_argument ('--radius', type = float, nargs = 2, default = (0.5, 2.0), metavar = ('MIN', 'MAX'))
+    parser.add_argument ('--seed', type = int, default = 0)
+    args = parser.parse_args ()
+
+    scene = generate_scene (control_points = args.control_points,
+                            obstacles      = args.obstacles,
+                            density        = args.density,
+                            motion_mix     = tuple (args.motion_mix),
+                            bounds         = (args.bounds[:3], args.bounds[3:]),
+                            radius_range   = tuple (args.radius),
+                            seed           = args.seed)
+    scene.to_file (args.out)
+    print (f"Wrote {args.out}: {len (scene.control_points)} control points, {len (scene.obstacles)} obstacles")
+
+
+if __name__ == '__main__':
+    main ()
@@ -0,0 +1,91 @@
+from dataclasses import dataclass, field
+import math
+import numpy as np
+import time
+from .clock import SimClock
+from .drone import Drone
+from .replan import ThreatDetector, replanner_for
+from .scene import Scene
+from .stats import Stats
+
+
+@dataclass
+class SimResult:
+    times:          np.ndarray      # (T,)
+    positions:      np.ndarray      # (T, 3) drone position after each tick
+    targets:        np.ndarray      # (T, 3) waypoint steered towards
+    target_indices: np.ndarray      # (T,)
+    replans:        list[float] = field (default_factory = list)   # sim times of path swaps
+
+
+def run_headless (scene: Scene, duration: float, dt: float = 0.01,
+                  seed: int | None = None, stats: Stats | None = None,
+                  stream: int | None = None) -> SimResult:
+    """Fly the scene on a fixed timestep with no plotting.
+
+    Obstacles, the drone's PIDs and replanning all read a SimClock, and
+    replanning runs inline every replan_interval of sim time, so a scene and
+    seed always produce bit-identical results and the run is only bounded by
+    CPU speed. `seed` overrides the scene's rrt_seed. `stats` collects drone
+    tick latency, the RRT and replanner counters and, for each replan,
+    planning time and the wall time from detecting a threat to swapping
+    paths. With `stream` set the path comes from Scene.stream_path with that
+    many waypoints of look-ahead; gaps are then planned as they come into
+    view instead of being replanned.
+    """
+    clock = SimClock (dt)
+    obstacles = scene.obstacle_field
+    obstacles.update (clock.now ())
+
+    path  = (scene.build_path (seed = seed, stats = stats) if stream is None else
+             scene.stream_path (stream, seed = seed, stats = stats))
+    replanner = replanner_for (scene, seed, stats)
+    drone = Drone (pos = scene.start.get_copy (), look_r = scene.bezier_max_step * 1.5,
+                   clock = clock, stats = stats)
+    drone.set_path (path)
+    threats = ThreatDetector (scene.obstacles, speed = drone.look_r,
+                              horizon = 2 * scene.replan_interval)
+
+    steps = int (round (duration / dt))
+    replan_ticks = int (round (scene.replan_interval / dt)) if scene.replan_interval > 0 else 0
+    result = SimResult (times          = np.empty (steps),
+                        positions      = np.empty ((steps, 3)),
+                        targets        = np.empty ((steps, 3)),
+                        target_indices = np.empty (steps, dtype = np.intp))
+
+    for i in range (steps):
+        t = clock.now ()
+        obstacles.update (t)
+
+        # Only replan if an obstacle can reach the remaining path when the drone does
+        if replan_ticks and stream is None and i > 0 and i % replan_ticks == 0:
+            threat = threats.first_threat (path, drone.prev_waypoint.index, drone.pos, t)
+            if threat < math.inf:
+                detected = time.perf_counter ()
+                new_path = replanner.replan (drone.pos.get_copy (), obstacles.snapshot ())
+                plan_time = time.perf_counter () - detected
+
+                # Only swap if the new path stays clear until at least the next check
+                if new_path is not None and threats.first_threat (new_path, 0, drone.pos, t) > threat + scene.replan_interval:
+                    path = new_path
+                    drone.update_path (path)
+                    result.replans.append (t)
+                    if stats is not None:
+                        latency = time.perf_counter () - detected
+                        stats.count ('replan.swaps')
+                        stats.observe ('replan.plan', plan_time)
+                        stats.observe ('replan.threat_to_swap', latency)
+                        stats.event ('replan.swap', sim_time = t, waypoints = len (path),
+                                     plan_s = plan_time, threat_to_swap_s = latency)
+                elif stats is not None:
+                    stats.count ('replan.rejected')
+
+        target = drone.follow_path ()
+
+        result.times[i] = t
+        result.positions[i] = drone.pos.to_tuple ()
+        result.targets[i] = target.pos.to_tuple ()
+        result.target_indices[i] = target.index
+        clock.advance ()
+
+    return result
@@ -0,0 +1,100 @@
+from bisect import bisect_left
+from typing import TextIO
+import json
+import math
+import time
+
+
+class Histogram:
+    """Latency histogram over half-octave buckets from 1 us, plus exact count, sum, min and max."""
+
+    EDGES = [1e-6 * 2 ** (i / 2) for i in range (48)]     # 1 us .. ~12 s
+
+    def __init__ (self):
+        self.buckets = [0] * (len (self.EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe (self, value: float) -> None:
+        self.buckets[bisect_left (self.EDGES, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min (self.min, value)
+        self.max = max (self.max, value)
+
+    # Upper edge of the bucket holding quantile q, clamped to the observed max
+    def quantile (self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate (self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min (self.EDGES[i] if i < len (self.EDGES) else self.max, self.max)
+        return self.max
+
+    def summary (self) -> dict:
+        return {
+            'count': self.count,
+            'mean':  self.total / self.count if self.count else 0.0,
+            'min':   self.min if self.count else 0.0,
+            'p50':   self.quantile (0.5),
+            'p90':   self.quantile (0.9),
+            'p99':   self.quantile (0.99),
+            'max':   self.max,
+        }
+
+
+class Stats:
+    """Opt-in counters, phase timers and latency histograms, with an optional JSONL trace.
+
+    Components take a `stats` argument that defaults to None; with None they
+    skip all bookkeeping beyond a few local counters, so instrumentation
+    costs next to nothing unless asked for. Counters and timers accumulate
+    across runs under dotted names like 'rrt.nearest'. Trace events are
+    written one JSON object per line as they happen.
+    """
+
+    def __init__ (self, trace: str | TextIO | None = None):
+        self.counters: dict[str, int] = {}
+        self.timers: dict[str, float] = {}
+        self.histograms: dict[str, Histogram] = {}
+
+        self._owns_trace = isinstance (trace, str)
+        self.trace: TextIO | None = open (trace, 'w') if self._owns_trace else trace
+
+    def count (self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get (name, 0) + n
+
+    def add_time (self, name: str, seconds: float) -> None:
+        self.timers[name] = self.timers.get (name, 0.0) + seconds
+
+    def observe (self, name: str, value: float) -> None:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram ()
+        self.histograms[name].observe (value)
+
+    def event (self, kind: str, **fields) -> None:
+        if self.trace is not None:
+            self.trace.write (json.dumps ({'event': kind, 'time': time.time (), **fields}) + '\n')
+
+    def snapshot (self) -> dict:
+        return {
+            'counters':   dict (self.counters),
+            'timers':     dict (self.timers),
+            'histograms': {name: h.summary () for name, h in self.histograms.items ()},
+        }
+
+    # Write a final snapshot to the trace and close it if it was opened here
+    def close (self) -> None:
+        if self.trace is None:
+            return
+        self.event ('snapshot', **self.snapshot ())
+        if self._owns_trace:
+            self.trace.close ()
+        else:
+            self.trace.flush ()
+        self.trace = None
@@ -0,0 +1,134 @@
+from matplotlib.animation import FuncAnimation
+import matplotlib.pyplot as plt
+import numpy as np
+import time
+from .drone import Drone
+from .geometry import Vec3D
+from .plan_cache import PlanCache
+from .render import SceneView
+from .replan_process import ReplanProcess
+from .scene import Scene
+from .stats import Stats
+
+
+# Simulation steps every SIM_INTERVAL ms, the view redraws every RENDER_INTERVAL ms
+SIM_INTERVAL    = 10
+RENDER_INTERVAL = 33
+
+
+def set_axes_equal (ax):
+    x_limits = ax.get_xlim3d ()
+    y_limits = ax.get_ylim3d ()
+    z_limits = ax.get_zlim3d ()
+    x_range, x_mid = abs (x_limits[1] - x_limits[0]), np.mean (x_limits)
+    y_range, y_mid = abs (y_limits[1] - y_limits[0]), np.mean (y_limits)
+    z_range, z_mid = abs (z_limits[1] - z_limits[0]), np.mean (z_limits)
+    r = 0.5 * max (x_range, y_range, z_range)
+    ax.set_xlim3d ([x_mid - r, x_mid + r])
+    ax.set_ylim3d ([y_mid - r, y_mid + r])
+    ax.set_zlim3d ([z_mid - r, z_mid + r])
+
+
+class Viewer:
+    """Interactive window flying a scene in wall-clock time; press 'r' to reset.
+
+    Replanning runs in its own process so planning never stalls animation.
+    Call `show` to open the window, or drive `step` and `update` directly.
+    `stats` collects drone tick latency, RRT counters for each build and replanner swaps.
+    """
+
+    def __init__ (self, scene: Scene, plan_cache: PlanCache | None = None, stats: Stats | None = None):
+        self.scene = scene
+        self.plan_cache = plan_cache
+        self.stats = stats
+
+        # Path and Drone
+        path = scene.build_path (plan_cache, stats = stats)
+        self.drone = Drone (pos = scene.start, look_r = scene.bezier_max_step * 1.5, stats = stats)
+        self.drone.set_path (path)
+        self.waypoint = self.drone.prev_waypoint
+
+        # Replanner, only when it can ever run so static scenes skip the process and shared memory
+        self.replanner: ReplanProcess | None = None
+        if scene.replan_interval > 0:
+            self.replanner = ReplanProcess (scene, path, stats)
+            self.replanner.start ()
+
+        # Plotting
+        self.fig = plt.figure ()
+        self.ax  = plt.axes (projection = '3d')
+        self.view = SceneView (self.ax, scene.obstacle_field, path)
+        self.fig.canvas.mpl_connect ('key_press_event', self.reset_scene)
+
+        self.t0 = time.time ()
+
+    # Reset
+    def reset_scene (self, event = None):
+        if event is not None and event.key != 'r':
+            return
+
+        scene, drone = self.scene, self.drone
+        self.t0 = time.time ()
+
+        # Reset obstacles
+        scene.obstacle_field.update (0)
+
+        # Re-build initial path
+        new_path = scene.build_path (self.plan_cache, stats = self.stats)
+        if self.replanner is not None:
+            self.replanner.reset (new_path)
+
+        # Reset drone
+        drone.pos = scene.start.get_copy ()
+        drone.vel = Vec3D (0, 0, 0)
+        drone.accel = Vec3D (0, 0, 0)
+        drone.prev_time = None
+        drone.set_path (new_path)
+        self.waypoint = drone.prev_waypoint
+
+        # Update visuals
+        self.view.set_path (new_path)
+        self.view.draw (drone.pos, self.waypoint.pos, all_obstacles = True)
+
+    # Simulation
+    def step (self):
+        t = time.time () - self.t0
+        field, drone = self.scene.obstacle_field, self.drone
+
+        # Move obstacles
+        field.update (t)
+
+        # Share world state with the replanner and swap to its path when available
+        if self.replanner is not None:
+            from_index = drone.prev_waypoint.index if drone.prev_waypoint is not None else 0
+            self.replanner.publish (field, drone.pos, from_index, t)
+
+            new_path = self.replanner.poll ()
+            if new_path is not None:
+                drone.update_path (new_path)
+                self.view.set_path (new_path)
+
+        self.waypoint = drone.follow_path ()
+
+    # Animation
+    def update (self, _ = None):
+        self.view.draw (self.drone.pos, self.waypoint.pos)
+
+    def show (self):
+        sim_timer = self.fig.canvas.new_timer (interval = SIM_INTERVAL)
+        sim_timer.add_callback (self.step)
+        sim_timer.start ()
+
+        # Held until show returns, an unreferenced animation stops
+        ani = FuncAnimation (self.fig, self.update, interval = RENDER_INTERVAL, cache_frame_data = False)
+        self.ax.set_box_aspect ([1, 1, 1])
+        set_axes_equal (self.ax)
+        try:
+            plt.show ()
+        finally:
+            sim_timer.stop ()
+            self.close ()
+
+    def close (self):
+        if self.replanner is not None:
+            self.replanner.close ()
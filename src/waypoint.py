@@ -13,25 +13,116 @@ class Waypoint (Locatable):
         return self.pos
 
 class WaypointPath:
-    def __init__ (self, max_step: float, points: list[Waypoint]):
+    # Either `points` or a (N, 3) `positions` array may back the path. Array-backed
+    # paths only build Waypoint objects when `points` is first read, with
+    # indices index_offset .. index_offset + N - 1. `positions` is cached, so
+    # call `invalidate` after changing the points list or a Waypoint in place.
+    def __init__ (self, max_step: float, points: list[Waypoint] = None,
+                  positions: np.ndarray = None, index_offset: int = 0):
         self.max_step: float = max_step
-        self.points: list[Waypoint] = points
+        self._points: list[Waypoint] | None = points if positions is None else None
+        self._positions: np.ndarray | None = None if positions is None else as_points (positions)
+        self._index_offset: int = index_offset
+
+        if self._points is None and self._positions is None:
+            self._points = []
+
+    @classmethod
+    def from_array (cls, max_step: float, positions, index_offset: int = 0) -> 'WaypointPath':
+        return cls (max_step, positions = positions, index_offset = index_offset)
+
+    @property
+    def points (self) -> list[Waypoint]:
+        if self._points is None:
+            self._points = [Waypoint (Vec3D (x, y, z), self._index_offset + i)
+                            for i, (x, y, z) in enumerate (self._positions.tolist ())]
+        return self._points
+
+    @points.setter
+    def points (self, points: list[Waypoint]) -> None:
+        self._points = points
+        self._positions = None
+
+    # (N, 3) positions, built from `points` on first read after an invalidate
+    @property
+    def positions (self) -> np.ndarray:
+        if self._positions is None:
+            self._positions = as_points (self._points)
+        return self._positions
+
+    # Drop cached positions so the next read rebuilds them from `points`; a no-op until
+    # `points` has been read, as nothing can have changed them
+    def invalidate (self) -> None:
+        if self._points is not None:
+            self._positions = None
+
+    # Waypoint indices, aligned with `positions`
+    @property
+    def indices (self) -> np.ndarray:
+        if self._points is None:
+            return np.arange (self._index_offset, self._index_offset + len (self._positions))
+        return np.fromiter ((wp.index for wp in self._points), dtype = np.intp,
+                            count = len (self._points))
+
+    def __len__ (self) -> int:
+        return len (self._points) if self._points is not None else len (self._positions)
 
     def deep_copy (self):
+        if self._points is None:
+            return WaypointPath.from_array (self.max_step, self._positions.copy (),
+                                            self._index_offset)
         copied_points = [Waypoint (wp.get_pos ().get_copy (), wp.index)
                          for wp in self.points]
         return WaypointPath (self.max_step, copied_points)
-    
+
 # Merges waypoint paths
 def merge_waypoint_paths (paths: list[WaypointPath]) -> WaypointPath:
-    all_points = []
-    for path in paths:
-        path = path.deep_copy ()
-        all_points.extend (path.points)
-
-    # Reassign indices in order
-    for i, waypoint in enumerate (all_points):
-        waypoint.index = i
+    # Concatenating positions copies them, and indices are reassigned in order
+    positions = np.concatenate ([path.positions for path in paths])
 
     # Use the largest max step
-    return WaypointPath (max (path.max_step for path in paths), all_points)
\ No newline at end of file
+    return WaypointPath.from_array (max (path.max_step for path in paths), positions)
+
+
+class StreamingPath:
+    """Waypoints produced on demand from an iterator of (N, 3) position chunks.
+
+    Only a window of at least `lookahead` waypoints from the consumer's
+    progress on is held. `advance` drops what has been passed and pulls more
+    chunks once progress is past the window's middle, so memory is bounded
+    by the window plus one chunk however long the route is. Indices keep
+    counting across the whole stream.
+    """
+
+    def __init__ (self, max_step: float, chunks, lookahead: int = 256):
+        self.max_step: float = max_step
+        self.chunks = iter (chunks)
+        self.lookahead: int = lookahead
+        self.buffer: np.ndarray = np.empty ((0, 3))
+        self.offset: int = 0            # index of buffer[0]
+        self.exhausted: bool = False
+        self.fill ()
+
+    def fill (self) -> None:
+        pieces = [self.buffer]
+        count = len (self.buffer)
+        while count < self.lookahead:
+            chunk = next (self.chunks, None)
+            if chunk is None:
+                self.exhausted = True
+                break
+            pieces.append (as_points (chunk))
+            count += len (pieces[-1])
+        self.buffer = np.concatenate (pieces) if len (pieces) > 1 else self.buffer
+
+    # Slide the window to start at waypoint `index`, True if it moved
+    def advance (self, index: int) -> bool:
+        if self.exhausted or index - self.offset < self.lookahead // 2:
+            return False
+        self.buffer = self.buffer[index - self.offset:]
+        self.offset = index
+        self.fill ()
+        return True
+
+    def window (self) -> WaypointPath:
+        return WaypointPath.from_array (self.max_step, self.buffer, self.offset)